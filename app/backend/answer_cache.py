@@ -0,0 +1,118 @@
+"""
+Cache de respostas do chat. A chave é a pergunta normalizada mais uma impressão
+digital do contexto usado para respondê-la; paráfrases são encontradas por
+similaridade de cosseno entre vetores da pergunta.
+"""
+import hashlib
+import math
+import threading
+import time
+from collections import Counter, OrderedDict
+
+from backend.retrieval import tokenize
+
+
+def normalize_question(question):
+    return " ".join(tokenize(question))
+
+
+def fingerprint(*parts):
+    digest = hashlib.sha1()
+    for part in parts:
+        digest.update(str(part).encode("utf-8"))
+        digest.update(b"\x00")
+    return digest.hexdigest()
+
+
+def local_embedding(question):
+    """Vetor esparso de termos e bigramas (sem dependências externas)"""
+    tokens = tokenize(question)
+    terms = Counter(tokens)
+    terms.update(f"{a}_{b}" for a, b in zip(tokens, tokens[1:]))
+    return dict(terms)
+
+
+def cosine(a, b):
+    if isinstance(a, dict):
+        dot = sum(weight * b.get(term, 0.0) for term, weight in a.items())
+        norm_a = math.sqrt(sum(w * w for w in a.values()))
+        norm_b = math.sqrt(sum(w * w for w in b.values()))
+    else:
+        dot = sum(x * y for x, y in zip(a, b))
+        norm_a = math.sqrt(sum(x * x for x in a))
+        norm_b = math.sqrt(sum(y * y for y in b))
+    return dot / (norm_a * norm_b) if norm_a and norm_b else 0.0
+
+
+class AnswerCache:
+    """
+    LRU com TTL. 'embed' transforma a pergunta em vetor (denso ou esparso); quando
+    não informado usa local_embedding. Uma entrada só é reaproveitada para o mesmo
+    fingerprint de contexto e similaridade >= threshold.
+    """
+
+    def __init__(self, maxsize=512, ttl=3600, threshold=0.92, embed=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.threshold = threshold
+        self.embed = embed or local_embedding
+        self.uses_endpoint = embed is not None
+        self._entries = OrderedDict()   # (fingerprint, pergunta normalizada) -> (expira_em, vetor, resposta)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _vector(self, question):
+        try:
+            return self.embed(question)
+        except Exception as e:
+            print(f"⚠️ Erro ao gerar embedding, usando vetor local: {e}")
+            return local_embedding(question)
+
+    def lookup(self, question, context_fingerprint):
+        key = (context_fingerprint, normalize_question(question))
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[2]
+            candidates = [(k, e) for k, e in self._entries.items() if k[0] == context_fingerprint and e[0] > now]
+
+        if candidates:
+            vector = self._vector(question)
+            best_key, best_score = None, 0.0
+            for k, (_, other, _) in candidates:
+                if type(other) is not type(vector):
+                    continue
+                score = cosine(vector, other)
+                if score > best_score:
+                    best_key, best_score = k, score
+            if best_key is not None and best_score >= self.threshold:
+                with self._lock:
+                    entry = self._entries.get(best_key)
+                    if entry:
+                        self._entries.move_to_end(best_key)
+                        self.hits += 1
+                        return entry[2]
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def store(self, question, context_fingerprint, answer):
+        key = (context_fingerprint, normalize_question(question))
+        vector = self._vector(question)
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, vector, answer)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
@@ -0,0 +1,153 @@
+"""
+Armazenamento temporário de blobs (áudios do chat) compartilhado entre os workers
+do uvicorn. Clipes pequenos ficam em /dev/shm (tmpfs, em memória); clipes maiores
+vão para o disco. Cada área tem orçamento de bytes e todos os blobs expiram por TTL.
+"""
+import os
+import re
+import tempfile
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+
+BLOB_ID_RE = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+
+def _usable_dir(path):
+    try:
+        path.mkdir(parents=True, exist_ok=True)
+        return os.access(path, os.W_OK)
+    except OSError:
+        return False
+
+
+class BlobTooLarge(ValueError):
+    """Gravação incremental passou do limite de bytes"""
+
+
+class _LimitedWriter:
+    """Arquivo que recusa gravar além de max_bytes (corpo de requisição sem tamanho conhecido)"""
+
+    def __init__(self, f, max_bytes):
+        self._f = f
+        self.max_bytes = max_bytes
+        self.size = 0
+
+    def write(self, data):
+        self.size += len(data)
+        if self.max_bytes is not None and self.size > self.max_bytes:
+            raise BlobTooLarge(f"blob larger than {self.max_bytes} bytes")
+        return self._f.write(data)
+
+
+class BlobStore:
+
+    def __init__(self, name="contract-app-blobs", memory_max_bytes=64 * 1024 * 1024,
+                 disk_max_bytes=512 * 1024 * 1024, spill_bytes=2 * 1024 * 1024, ttl=600,
+                 disk_dir=None, memory_dir=None):
+        self.ttl = ttl
+        self.spill_bytes = spill_bytes
+        self.disk_dir = Path(disk_dir) if disk_dir else Path(tempfile.gettempdir()) / name
+        self.disk_dir.mkdir(parents=True, exist_ok=True)
+        shm = Path(memory_dir) if memory_dir else Path("/dev/shm") / name
+        self.memory_dir = shm if _usable_dir(shm) else None
+        self.budgets = {self.disk_dir: disk_max_bytes}
+        if self.memory_dir:
+            self.budgets[self.memory_dir] = memory_max_bytes
+
+    @staticmethod
+    def new_id():
+        return f"{int(time.time())}_{uuid.uuid4().hex[:8]}"
+
+    def put(self, data, blob_id=None):
+        """Grava os bytes e retorna o id do blob"""
+        return self.put_chunks([data], size_hint=len(data), blob_id=blob_id)
+
+    def put_chunks(self, chunks, size_hint=None, blob_id=None):
+        """Grava um blob a partir de blocos (sem juntar tudo em memória)"""
+        blob_id = blob_id or self.new_id()
+        if not BLOB_ID_RE.match(blob_id):
+            raise ValueError("invalid blob id")
+        small = size_hint is not None and size_hint <= self.spill_bytes
+        directory = self.memory_dir if (small and self.memory_dir) else self.disk_dir
+        temp_path = directory / f".{blob_id}.part"
+        with open(temp_path, "wb") as f:
+            for chunk in chunks:
+                f.write(chunk)
+        os.replace(temp_path, directory / blob_id)
+        self.evict(directory)
+        return blob_id
+
+    @contextmanager
+    def writer(self, blob_id=None, max_bytes=None):
+        """
+        Gravação incremental em disco (tamanho desconhecido): 'with store.writer() as (blob_id, f)'.
+        O blob só fica visível quando o bloco termina sem erro; f.write levanta BlobTooLarge
+        ao passar de max_bytes (padrão: o orçamento do disco, acima dele o blob seria removido).
+        """
+        blob_id = blob_id or self.new_id()
+        if not BLOB_ID_RE.match(blob_id):
+            raise ValueError("invalid blob id")
+        if max_bytes is None:
+            max_bytes = self.budgets[self.disk_dir]
+        temp_path = self.disk_dir / f".{blob_id}.part"
+        try:
+            with open(temp_path, "wb") as f:
+                yield blob_id, _LimitedWriter(f, max_bytes)
+            os.replace(temp_path, self.disk_dir / blob_id)
+        finally:
+            temp_path.unlink(missing_ok=True)
+        self.evict(self.disk_dir)
+
+    def path(self, blob_id):
+        """Caminho do blob ainda válido (em qualquer worker) ou None"""
+        if not BLOB_ID_RE.match(blob_id or ""):
+            return None
+        for directory in self.budgets:
+            path = directory / blob_id
+            try:
+                if time.time() - path.stat().st_mtime <= self.ttl:
+                    return path
+                path.unlink()
+            except FileNotFoundError:
+                continue
+        return None
+
+    def get(self, blob_id):
+        path = self.path(blob_id)
+        return path.read_bytes() if path else None
+
+    def delete(self, blob_id):
+        path = self.path(blob_id)
+        if path:
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+
+    def evict(self, directory=None):
+        """Remove expirados e, se passar do orçamento, os mais antigos"""
+        for current in ([directory] if directory else list(self.budgets)):
+            now = time.time()
+            entries, total = [], 0
+            for path in current.iterdir():
+                try:
+                    stat = path.stat()
+                except FileNotFoundError:
+                    continue
+                if path.name.startswith("."):
+                    # Gravações interrompidas há mais de um TTL
+                    if now - stat.st_mtime > self.ttl:
+                        path.unlink(missing_ok=True)
+                    continue
+                if now - stat.st_mtime > self.ttl:
+                    path.unlink(missing_ok=True)
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+                total += stat.st_size
+            for _, size, path in sorted(entries):
+                if total <= self.budgets[current]:
+                    break
+                path.unlink(missing_ok=True)
+                total -= size
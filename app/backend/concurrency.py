@@ -0,0 +1,102 @@
+"""
+Execução de chamadas bloqueantes (SQL Warehouse, Files API, serving endpoints, Jobs API)
+fora do event loop do uvicorn, com limite de concorrência por dependência.
+"""
+import asyncio
+import contextvars
+import functools
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from backend import metrics
+
+# Máximo de chamadas simultâneas por dependência externa
+CONCURRENCY_LIMITS = {
+    "warehouse": int(os.getenv("WAREHOUSE_CONCURRENCY", "8")),
+    "files":     int(os.getenv("FILES_CONCURRENCY", "8")),
+    "serving":   int(os.getenv("SERVING_CONCURRENCY", "8")),
+    "jobs":      int(os.getenv("JOBS_CONCURRENCY", "2")),
+}
+
+# O pool comporta todas as dependências ao mesmo tempo, assim uma não esgota as threads da outra
+executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("BLOCKING_IO_THREADS", str(sum(CONCURRENCY_LIMITS.values()) + 4))),
+    thread_name_prefix="blocking-io",
+)
+
+_semaphores = {}
+
+
+def _semaphore(dependency):
+    if dependency not in _semaphores:
+        _semaphores[dependency] = asyncio.Semaphore(CONCURRENCY_LIMITS.get(dependency, 4))
+    return _semaphores[dependency]
+
+
+async def run_blocking(dependency, func, *args, **kwargs):
+    """Executa func(*args, **kwargs) no pool de threads respeitando o limite da dependência"""
+    queued_at = time.perf_counter()
+    async with _semaphore(dependency):
+        started_at = time.perf_counter()
+        metrics.DEPENDENCY_WAIT.observe(started_at - queued_at, dependency=dependency)
+        metrics.DEPENDENCY_IN_FLIGHT.inc(dependency=dependency)
+        try:
+            loop = asyncio.get_running_loop()
+            ctx = contextvars.copy_context()
+            call = functools.partial(ctx.run, func, *args, **kwargs)
+            return await loop.run_in_executor(executor, call)
+        finally:
+            metrics.DEPENDENCY_IN_FLIGHT.dec(dependency=dependency)
+            elapsed = time.perf_counter() - started_at
+            metrics.DEPENDENCY_LATENCY.observe(elapsed, dependency=dependency)
+            metrics.add_timing(dependency, elapsed)
+
+
+async def iterate_blocking(dependency, make_iterator, *args, **kwargs):
+    """
+    Consome um iterador bloqueante (ex.: resposta em streaming de um endpoint) item a item
+    no pool de threads, ocupando uma vaga da dependência até o fim. Se o consumidor parar
+    antes (cliente desconectou), o iterador é fechado para liberar a conexão de origem.
+    """
+    sentinel = object()
+    queued_at = time.perf_counter()
+    async with _semaphore(dependency):
+        started_at = time.perf_counter()
+        metrics.DEPENDENCY_WAIT.observe(started_at - queued_at, dependency=dependency)
+        metrics.DEPENDENCY_IN_FLIGHT.inc(dependency=dependency)
+        ctx = contextvars.copy_context()
+        pending, iterator = None, None
+        try:
+            pending = executor.submit(ctx.run, make_iterator, *args, **kwargs)
+            iterator = await asyncio.wrap_future(pending)
+            while True:
+                pending = executor.submit(ctx.run, next, iterator, sentinel)
+                item = await asyncio.wrap_future(pending)
+                if item is sentinel:
+                    break
+                yield item
+        finally:
+            # Sem await aqui: na desconexão do cliente a task já está cancelada e um await
+            # seria cancelado também (métricas e fechamento nunca aconteceriam)
+            metrics.DEPENDENCY_IN_FLIGHT.dec(dependency=dependency)
+            elapsed = time.perf_counter() - started_at
+            metrics.DEPENDENCY_LATENCY.observe(elapsed, dependency=dependency)
+            metrics.add_timing(dependency, elapsed)
+            if pending is not None:
+                pending.add_done_callback(lambda done: executor.submit(_close_iterator, done, iterator))
+
+
+def _close_iterator(done, iterator):
+    """Fecha o iterador depois que a chamada em andamento termina (fechar durante next() levanta ValueError)"""
+    if iterator is None:
+        # Cancelado enquanto o iterador ainda era criado
+        if done.cancelled() or done.exception() is not None:
+            return
+        iterator = done.result()
+    close = getattr(iterator, "close", None)
+    if close is not None:
+        try:
+            close()
+        except Exception as e:
+            print(f"⚠️ Erro ao fechar o iterador: {e}")
@@ -0,0 +1,136 @@
+"""
+Recursos compartilhados por worker: token OAuth em cache, pool de conexões
+com o SQL Warehouse e sessão HTTP reutilizada para a Files API.
+"""
+import queue
+import threading
+import time
+from contextlib import contextmanager
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+class TokenCache:
+    """
+    Guarda o token obtido por 'mint' e renova antes de expirar. 'mint' retorna o token ou
+    (token, expira_em em time.time()); com a expiração informada o token vale até 'margin'
+    segundos antes dela (no máximo 'ttl'), senão vale 'ttl' segundos. Com 'store'
+    (backend/shared_cache.py) o token também é compartilhado com os outros workers.
+    """
+
+    def __init__(self, mint, ttl=2700, store=None, key="token", margin=60):
+        self._mint = mint
+        self.ttl = ttl
+        self.margin = margin
+        self._store = store
+        self._key = key
+        self._token = None
+        self._expires_at = 0.0
+        self._lock = threading.Lock()
+
+    def get(self):
+        if self._token and time.monotonic() < self._expires_at:
+            return self._token
+        with self._lock:
+            # Outra thread pode ter renovado enquanto esperávamos o lock
+            if self._token and time.monotonic() < self._expires_at:
+                return self._token
+            shared = self._store.get(self._key) if self._store is not None else None
+            if shared is not None:
+                # (token, expira_em em time.time()): vale o tempo restante, não um novo ttl
+                token, expires_at = shared
+                self._token = token
+                self._expires_at = time.monotonic() + (expires_at - time.time())
+                return token
+            minted = self._mint()
+            token, expires_at = minted if isinstance(minted, tuple) else (minted, None)
+            if token:
+                lifetime = self.ttl if expires_at is None else min(self.ttl, expires_at - time.time() - self.margin)
+                # Já vencendo (lifetime <= 0): usa nesta chamada, mas não guarda
+                if lifetime > 0:
+                    self._token = token
+                    self._expires_at = time.monotonic() + lifetime
+                    if self._store is not None:
+                        self._store.set(self._key, (token, time.time() + lifetime), lifetime)
+            return token
+
+    def remaining(self):
+        """Segundos de validade restantes do token em cache (0 sem token)"""
+        if not self._token:
+            return 0.0
+        return max(0.0, self._expires_at - time.monotonic())
+
+    def invalidate(self):
+        with self._lock:
+            self._token = None
+            self._expires_at = 0.0
+            # Token recusado (401): os outros workers também não devem reutilizá-lo
+            if self._store is not None:
+                self._store.pop(self._key)
+
+
+class ConnectionPool:
+    """
+    Pool simples de conexões DB-API. Conexões ociosas são reaproveitadas (LIFO),
+    recicladas após 'max_age' segundos e descartadas quando uma query falha. 'max_age'
+    pode ser uma função, avaliada ao abrir cada conexão (ex.: validade do token usado).
+    """
+
+    def __init__(self, connect, max_size=4, max_age=2700):
+        self._connect = connect
+        self.max_size = max_size
+        self.max_age = max_age
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(max_size)
+
+    def _acquire(self):
+        while True:
+            try:
+                expires_at, conn = self._idle.get_nowait()
+            except queue.Empty:
+                conn = self._connect()
+                max_age = self.max_age() if callable(self.max_age) else self.max_age
+                return time.monotonic() + max_age, conn
+            if time.monotonic() < expires_at:
+                return expires_at, conn
+            self._close(conn)
+
+    @staticmethod
+    def _close(conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    @contextmanager
+    def connection(self):
+        self._slots.acquire()
+        try:
+            expires_at, conn = self._acquire()
+            try:
+                yield conn
+            except Exception:
+                self._close(conn)
+                raise
+            else:
+                self._idle.put((expires_at, conn))
+        finally:
+            self._slots.release()
+
+    def close_all(self):
+        while True:
+            try:
+                _, conn = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            self._close(conn)
+
+
+def make_http_session(pool_size=8):
+    """requests.Session com pool de conexões keep-alive do tamanho indicado"""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
@@ -1,20 +1,46 @@
-from fastapi import FastAPI, File, UploadFile
-from fastapi.responses import Response, FileResponse
+import time
+module_load_started = time.perf_counter()
+
+from fastapi import FastAPI, Request
+from fastapi.responses import Response, FileResponse, StreamingResponse, JSONResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
 from dotenv import load_dotenv
 
 from pydantic import BaseModel
-from databricks.sdk import WorkspaceClient
-from databricks.sdk.service.serving import ChatMessage, ChatMessageRole
 from typing import Optional
-import pandas as pd
+from urllib.parse import unquote_plus
+from contextlib import asynccontextmanager
 import os, requests, re, io
 import base64
-import databricks.sql as dbsql
+import asyncio
+import json
+from datetime import date
+import tempfile
+import threading
+
+from backend.retrieval import BM25Index
+from backend.answer_cache import AnswerCache, fingerprint
+from backend.concurrency import run_blocking, iterate_blocking, CONCURRENCY_LIMITS
+from backend.connections import TokenCache, ConnectionPool, make_http_session
+from backend.pdf_cache import PdfDiskCache, CHUNK_SIZE, parse_range, iter_file, etag_matches, if_range_allows
+from backend.uploads import receive_uploads
+from backend.blob_store import BlobStore, BlobTooLarge
+from backend.transcription import make_transcriber, make_segmenter
+from backend.warehouse import StatementReader
+from backend.runs import RunCoordinator, RunStartLock
+from backend.queries import QueryRegistry
+from backend.shared_cache import make_shared_cache, shared_directory
+from backend.startup import lazy_import, preload, record, TIMINGS
+from backend import metrics
 
-import mlflow
-import mlflow.deployments
+# Módulos pesados (SDK Databricks, mlflow, pandas): importados no primeiro uso ou pelo aquecimento (warm_up)
+pd                 = lazy_import("pandas")
+dbsql              = lazy_import("databricks.sql")
+mlflow_deployments = lazy_import("mlflow.deployments")
+sdk                = lazy_import("databricks.sdk")
+serving            = lazy_import("databricks.sdk.service.serving")
+sql_service        = lazy_import("databricks.sdk.service.sql")
 
 class ChatRequest(BaseModel):
     text: str
@@ -24,8 +50,25 @@ class ChatRequestAudio(BaseModel):
      audio: str
      chat_history: list
 
+class BatchRequest(BaseModel):
+    ids: list
+    fields: list = ["metadata", "summary", "clauses"]
+
+
+@asynccontextmanager
+async def lifespan(app):
+    # O uvicorn já aceita requisições enquanto os clientes são criados em segundo plano
+    task = asyncio.create_task(warm_up()) if startup_warmup else None
+    startup_state["ready"] = not startup_warmup
+    # Com cache compartilhado cada worker publica as suas métricas (agregadas em /api/metrics)
+    publisher = asyncio.create_task(publish_metrics_loop()) if shared_cache.shared else None
+    yield
+    for background in (task, publisher):
+        if background is not None and not background.done():
+            background.cancel()
+
 
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 # Configure CORS - allow localhost for development and Databricks Apps for production
 app.add_middleware(
@@ -36,6 +79,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Latência por rota, requisições em andamento e Server-Timing com o header X-Profile (ver /api/metrics)
+app.add_middleware(metrics.MetricsMiddleware)
+
 # Load all env variables
 load_dotenv()
 server_hostname = os.getenv("DATABRICKS_HOST")
@@ -49,6 +95,58 @@ schema          = os.getenv("DATABASE")
 extract_job_id  = os.getenv("EXTRACT_JOB_ID")
 dashboard_id    = os.getenv("DASHBOARD_ID", "")
 
+# Cache de metadados por documento (segundos / quantidade de documentos)
+pdf_info_cache_ttl   = int(os.getenv("PDF_INFO_CACHE_TTL", "300"))
+pdf_info_cache_size  = int(os.getenv("PDF_INFO_CACHE_SIZE", "256"))
+track_version_ttl    = int(os.getenv("TRACK_VERSION_CHECK_SECONDS", "30"))
+
+# Cache local dos PDFs visualizados (diretório e tamanho máximo em bytes)
+pdf_cache_dir        = os.getenv("PDF_CACHE_DIR")
+pdf_cache_max_bytes  = int(os.getenv("PDF_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+
+# Token OAuth é renovado antes de expirar (tokens M2M duram 1h); conexões do pool seguem a mesma idade
+sql_token_ttl        = int(os.getenv("SQL_TOKEN_TTL_SECONDS", "2700"))
+warehouse_pool_size  = int(os.getenv("WAREHOUSE_POOL_SIZE", "4"))
+
+# Cache de respostas do chat (paráfrases reconhecidas por similaridade >= threshold)
+answer_cache_size      = int(os.getenv("ANSWER_CACHE_SIZE", "512"))
+answer_cache_ttl       = int(os.getenv("ANSWER_CACHE_TTL", "3600"))
+answer_cache_threshold = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.92"))
+embedding_endpoint     = os.getenv("EMBEDDING_ENDPOINT", "")
+
+# Áudios temporários: orçamento em memória (/dev/shm), em disco, limite para ir ao disco e TTL
+audio_memory_max_bytes = int(os.getenv("AUDIO_MEMORY_MAX_BYTES", str(64 * 1024 * 1024)))
+audio_disk_max_bytes   = int(os.getenv("AUDIO_DISK_MAX_BYTES", str(512 * 1024 * 1024)))
+audio_spill_bytes      = int(os.getenv("AUDIO_SPILL_BYTES", str(2 * 1024 * 1024)))
+audio_ttl              = int(os.getenv("AUDIO_TTL_SECONDS", "600"))
+
+# Transcrição: 'endpoint' (AUDIO_ENDPOINT), 'local' (faster-whisper em CPU) ou 'auto'
+transcribe_backend     = os.getenv("TRANSCRIBE_BACKEND", "auto")
+local_whisper_model    = os.getenv("LOCAL_WHISPER_MODEL", "tiny")
+audio_segment_bytes    = int(os.getenv("AUDIO_SEGMENT_BYTES", str(256 * 1024)))
+
+# Tamanho máximo de página aceito por /api/data
+max_page_size        = int(os.getenv("DATA_MAX_PAGE_SIZE", "1000"))
+
+# Job de extração: intervalo do poller de execuções e janela para agrupar pedidos em uma execução
+extract_poll_seconds     = float(os.getenv("EXTRACT_POLL_SECONDS", "10"))
+extract_coalesce_seconds = float(os.getenv("EXTRACT_COALESCE_SECONDS", "2"))
+
+# Cache compartilhado entre workers (python -m backend.serve): 'auto', 'sqlite' (/dev/shm) ou 'local'
+shared_cache_backend     = os.getenv("SHARED_CACHE", "auto")
+shared_cache_max_entries = int(os.getenv("SHARED_CACHE_MAX_ENTRIES", "10000"))
+metrics_publish_seconds  = float(os.getenv("METRICS_PUBLISH_SECONDS", "5"))
+
+# Máximo de documentos por chamada de /api/batch
+batch_max_documents  = int(os.getenv("BATCH_MAX_DOCUMENTS", "200"))
+
+# Seleção de contexto do chat (nº de contratos e orçamento aproximado de tokens)
+chat_top_k           = int(os.getenv("CHAT_TOP_K", "5"))
+chat_context_tokens  = int(os.getenv("CHAT_CONTEXT_TOKENS", "6000"))
+
+# Aquecimento em segundo plano ao iniciar (clientes, token, warehouse e índice de contratos)
+startup_warmup       = os.getenv("STARTUP_WARMUP", "true").lower() not in ("0", "false", "no")
+
 # Build dashboard URL using DATABRICKS_HOST (auto-injected by Databricks Apps) and DASHBOARD_ID
 if dashboard_id and server_hostname:
     dashboard_url = f"{server_hostname}/dashboardsv3/{dashboard_id}/published"
@@ -68,13 +166,22 @@ def get_workspace_client():
             import logging
             logging.getLogger("databricks.sdk").setLevel(logging.ERROR)
             
-            workspace_client = WorkspaceClient()
+            workspace_client = sdk.WorkspaceClient()
             print(f"🚀 Initialized WorkspaceClient (OAuth M2M)")
         except Exception as e:
             print(f"⚠️ Warning during WorkspaceClient initialization: {e}")
-            workspace_client = WorkspaceClient()
+            workspace_client = sdk.WorkspaceClient()
     return workspace_client
 
+# Cliente MLflow dos agent endpoints, criado uma vez por worker
+deploy_client = None
+
+def get_deploy_client():
+    global deploy_client
+    if deploy_client is None:
+        deploy_client = mlflow_deployments.get_deploy_client("databricks")
+    return deploy_client
+
 print(f"🚀 Running in Databricks Apps - OAuth M2M authentication")
 
 # Detect the correct path for static files
@@ -107,13 +214,37 @@ else:
     # Set a default for current_dir to avoid errors
     current_dir = Path(__file__).parent.parent
 
-# Helper function to get SQL connection token (not needed - using WorkspaceClient SQL API)
+# Helper function to get SQL connection token (cached - see sql_token_cache)
 def get_sql_token():
     """Get token for SQL Warehouse connection - using OAuth M2M via WorkspaceClient"""
+    return sql_token_cache.get()
+
+def mint_sql_token():
+    """
+    Obtém um novo token do WorkspaceClient (chamado apenas quando o cache expira). Com OAuth
+    retorna (token, expira_em) a partir do Token do SDK, para o cache não passar da expiração.
+    """
     try:
         client = get_workspace_client()
+
+        # OAuth (M2M no Databricks Apps): o Token do SDK informa quando expira
+        if hasattr(client, 'config') and hasattr(client.config, 'oauth_token'):
+            try:
+                oauth = client.config.oauth_token()
+            except ValueError:
+                oauth = None  # autenticação sem OAuth (ex.: PAT)
+            if oauth is not None and oauth.access_token:
+                if oauth.expiry is not None:
+                    return oauth.access_token, oauth.expiry.timestamp()
+                return oauth.access_token
+
+        # Preferred: let the SDK authenticate and return the Authorization header
+        if hasattr(client, 'config') and hasattr(client.config, 'authenticate'):
+            auth_header = client.config.authenticate().get('Authorization', '')
+            if auth_header.startswith('Bearer '):
+                return auth_header[len('Bearer '):]
         
-        # Try multiple ways to get the token
+        # Fallback: try multiple ways to get the token
         # Method 1: Try api_client.token()
         if hasattr(client.api_client, 'token'):
             token = client.api_client.token()
@@ -145,36 +276,92 @@ def get_sql_token():
         print(f"❌ Erro ao obter token: {e}")
         return None
 
-# Dicionário global para armazenar áudios temporários
-temp_audio_storage = {}
+# Resultados de consultas e tokens compartilhados pelos workers (em processo no desenvolvimento local)
+shared_cache = make_shared_cache(shared_cache_backend, maxsize=shared_cache_max_entries)
 
-# =======================================================================
-def transcribe_audio(audio_data, audio_id):
-    """
-    Nota: A transcrição de áudio requer que o endpoint Databricks consiga acessar
-    o arquivo via URL pública. Em ambiente local (localhost), isso não é possível.
-    
-    Soluções:
-    1. Deploy em produção com URL pública
-    2. Usar ngrok/tunneling para expor localhost
-    3. Upload para S3/Azure Blob e usar URL pública
-    """
-    # Limpar áudio do cache
-    if audio_id in temp_audio_storage:
-        del temp_audio_storage[audio_id]
+sql_token_cache = TokenCache(mint_sql_token, ttl=sql_token_ttl, store=shared_cache.namespace("token", sql_token_ttl),
+                             key="sql")
+
+def connect_warehouse():
+    token = get_sql_token()
     
-    return "🎤 A transcrição de áudio não está disponível em ambiente local. O endpoint Databricks precisa de uma URL pública acessível. Por favor, use o chat de texto para fazer suas perguntas."
+    if token:
+        return dbsql.connect(
+            server_hostname=server_hostname,
+            http_path=http_path,
+            access_token=token
+        )
+    return dbsql.connect(
+        server_hostname=server_hostname,
+        http_path=http_path
+    )
+
+# Conexões com o SQL Warehouse (databricks-sql-connector) e sessão HTTP da Files API, compartilhadas pelo worker
+# Cada conexão guarda o token usado ao abrir: é reciclada quando ele vence
+warehouse_pool = ConnectionPool(connect_warehouse, max_size=warehouse_pool_size,
+                                max_age=lambda: sql_token_cache.remaining() or sql_token_ttl)
+files_session = make_http_session(CONCURRENCY_LIMITS["files"])
+
+# Resultados do Statement Execution API (Arrow por links externos, ou JSON inline sem pyarrow)
+statement_reader = StatementReader(
+    get_workspace_client,
+    http_path.split('/')[-1] if http_path else None,
+    catalog,
+    schema,
+    http_session=make_http_session(CONCURRENCY_LIMITS["warehouse"]),
+)
+
+# Statements nomeadas e parametrizadas (texto estável para o cache de resultados do warehouse)
+queries = QueryRegistry(catalog, schema)
+
+# Armazenamento de áudios temporários, compartilhado entre workers e com limite de bytes/TTL
+audio_store = BlobStore(
+    name="contract-app-audio",
+    memory_max_bytes=audio_memory_max_bytes,
+    disk_max_bytes=audio_disk_max_bytes,
+    spill_bytes=audio_spill_bytes,
+    ttl=audio_ttl
+)
 
 # =======================================================================
-def get_direct_llm_answer(message, info):
-    """Chama o agent endpoint usando MLflow deployments client"""
+AUDIO_UNAVAILABLE_MESSAGE = "🎤 A transcrição de áudio não está disponível: configure AUDIO_ENDPOINT ou instale um modelo local (faster-whisper). Por favor, use o chat de texto para fazer suas perguntas."
+
+AUDIO_FAILED_MESSAGE = "⚠️ Não foi possível transcrever o áudio. Verifique se AUDIO_ENDPOINT é um endpoint de transcrição (Whisper) ou use o chat de texto."
+
+transcriber = make_transcriber(transcribe_backend, audio_endpoint, get_workspace_client, local_whisper_model)
+
+def transcribe_audio(audio_id, content_type="audio/mpeg"):
+    """Transcreve, segmento a segmento, um áudio já armazenado e o remove do armazenamento"""
+    try:
+        if transcriber is None:
+            return AUDIO_UNAVAILABLE_MESSAGE
+
+        audio = audio_store.get(audio_id)
+        if not audio:
+            return ""
+
+        segmenter = make_segmenter(content_type, audio_segment_bytes)
+        segments = segmenter.feed(audio) + segmenter.flush()
+        texts = [transcriber.transcribe(segment, content_type).strip() for segment in segments]
+        return " ".join(text for text in texts if text)
+    except Exception as e:
+        # Endpoint fora do ar ou que não transcreve áudio: mensagem amigável em vez de HTTP 500
+        print(f"❌ Erro ao transcrever áudio: {e}")
+        return AUDIO_FAILED_MESSAGE
+    finally:
+        # Limpar áudio do cache
+        audio_store.delete(audio_id)
+
+# =======================================================================
+def build_llm_query(message, info):
+    """Monta o payload do agent endpoint com o contexto dos contratos"""
     # Converter info para string se for pandas Series
     info_str = str(info) if not isinstance(info, str) else info
     
     system_content = f"""Você é um assistente jurídico especializado em análise de contratos.
 
 Use as seguintes informações como fonte de dados para responder à pergunta do usuário:
-{info_str[:2000]}
+{info_str}
 
 Regras:
 - Sempre responda em Português
@@ -184,20 +371,24 @@ Regras:
 - Se os dados não forem suficientes para responder, mencione isso"""
 
     # Formato correto para agent endpoints (espera 'input' como array)
-    client = mlflow.deployments.get_deploy_client("databricks")
-    
-    query = {
+    return {
         "input": [
             {"role": "system", "content": system_content},
             {"role": "user", "content": message}
         ]
     }
+
+def get_direct_llm_answer(message, info):
+    """Chama o agent endpoint usando MLflow deployments client"""
+    client = get_deploy_client()
+    query = build_llm_query(message, info)
     
     try:
-        response = client.predict(
-            endpoint=agent_endpoint,
-            inputs=query
-        )
+        with metrics.span("serving_predict"):
+            response = client.predict(
+                endpoint=agent_endpoint,
+                inputs=query
+            )
         
         print(f"🔍 Resposta do endpoint: {response}")
         
@@ -229,36 +420,56 @@ Regras:
         print(f"❌ Erro ao chamar agent endpoint: {e}")
         return f"⚠️ Erro ao processar sua pergunta: {str(e)}"
 
+# =======================================================================
+def stream_direct_llm_answer(message, info):
+    """Versão em streaming de get_direct_llm_answer: gera os trechos de texto conforme chegam"""
+    client = get_deploy_client()
+    query = build_llm_query(message, info)
+
+    with metrics.span("serving_predict_stream"):
+        for chunk in client.predict_stream(endpoint=agent_endpoint, inputs=query):
+            text = extract_stream_delta(chunk)
+            if text:
+                yield text
+
+def extract_stream_delta(chunk):
+    """Texto incremental de um evento de streaming (formato agent/responses ou chat completions)"""
+    if not isinstance(chunk, dict):
+        return None
+    # Agent endpoints: {"type": "response.output_text.delta", "delta": "..."}
+    if chunk.get("type") == "response.output_text.delta":
+        return chunk.get("delta")
+    # Chat completions: {"choices": [{"delta": {"content": "..."}}]}
+    choices = chunk.get("choices") or []
+    if choices:
+        delta = choices[0].get("delta") or {}
+        return delta.get("content")
+    return None
+
 # =======================================================================
 def get_genie_answer(message):
-    # Get token for SQL connection
-    token = get_sql_token()
-    
-    if token:
-        conn = dbsql.connect(
-            server_hostname=server_hostname,
-            http_path=http_path,
-            access_token=token
-        )
-    else:
-        conn = dbsql.connect(
-            server_hostname=server_hostname,
-            http_path=http_path
-        )
-    
-    cursor = conn.cursor()
-    query = f"""select {catalog}.{schema}.chat_genie("{message}", "no relevant history") as genie_result """
-    cursor.execute(query)
-    results = cursor.fetchall()
-
-    columns = [desc[0] for desc in cursor.description]
-    df = pd.DataFrame(results, columns=columns)
-    data = df.to_dict(orient='records')[0]['genie_result']
-    
-    cursor.close()
-    conn.close()   
+    # Genie consulta as tabelas de contratos: a resposta vale enquanto contract_track não mudar
+    context_fingerprint = fingerprint("genie", check_track_version())
+    cached = answer_cache.lookup(message, context_fingerprint)
+    metrics.record_cache("answer_genie", cached is not None)
+    if cached is not None:
+        return cached
+
+    with warehouse_pool.connection() as conn, metrics.span("sql_connector_execute"):
+        cursor = conn.cursor()
+        start = time.perf_counter()
+        cursor.execute(queries.sql("chat_genie"), {"message": message})
+        results = cursor.fetchall()
+        metrics.QUERY_LATENCY.observe(time.perf_counter() - start, query="chat_genie")
+
+        columns = [desc[0] for desc in cursor.description]
+        df = pd.DataFrame(results, columns=columns)
+        data = df.to_dict(orient='records')[0]['genie_result']
+        
+        cursor.close()
 
     formatted = query_model_format(data)
+    answer_cache.store(message, context_fingerprint, formatted)
 
     return formatted
 
@@ -284,123 +495,336 @@ def query_model_format(text_to_format):
         }
     ]
 
-    messages = [ChatMessage.from_dict(message) for message in messages]
-    response = get_workspace_client().serving_endpoints.query(
-        name=llm_endpoint,
-        messages=messages,
-        max_tokens=500
-    )
+    messages = [serving.ChatMessage.from_dict(message) for message in messages]
+    with metrics.span("serving_query"):
+        response = get_workspace_client().serving_endpoints.query(
+            name=llm_endpoint,
+            messages=messages,
+            max_tokens=500
+        )
     return response.choices[0].message.content   
 
 
 # =======================================================================
-def get_all_pdf_volume():
-    print(f"🔑 Obtendo token SQL...")
-    token = get_sql_token()
-    print(f"🔑 Token obtido: {'✅ Sim' if token else '❌ Não'}")
-    
-    # Use WorkspaceClient SQL execution instead of databricks-sql-connector
-    # This works better with OAuth M2M in Databricks Apps
+# Colunas de contract_track aceitas em /api/data?sort=..., com o valor usado para nulos no keyset
+# (qualificadas com 't.' porque o SELECT reaproveita os mesmos nomes para os valores formatados)
+TRACK_SORT_KEYS = {
+    "upload_time":    ("COALESCE(t.upload_time, TIMESTAMP'1970-01-01')", "TIMESTAMP"),
+    "processed_time": ("COALESCE(t.processed_time, TIMESTAMP'1970-01-01')", "TIMESTAMP"),
+    "file_name":      ("COALESCE(t.file_name, '')", "STRING"),
+    "size":           ("COALESCE(t.size, 0)", "BIGINT"),
+}
+
+def encode_cursor(sort_value, file_path):
+    raw = json.dumps([sort_value, file_path]).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+def decode_cursor(cursor):
+    try:
+        sort_value, file_path = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        return str(sort_value), str(file_path)
+    except Exception:
+        raise ValueError("invalid cursor")
+
+def build_track_query(sort="upload_time", order="desc", limit=None, cursor=None, processed=None,
+                      file_type=None, date_from=None, date_to=None, name_prefix=None):
+    """
+    Monta a consulta de contract_track com filtros, ordenação e paginação keyset
+    (sort_key, file_path) aplicados no próprio warehouse.
+    """
+    if sort not in TRACK_SORT_KEYS:
+        raise ValueError(f"invalid sort key: {sort}")
+    if order not in ("asc", "desc"):
+        raise ValueError(f"invalid order: {order}")
+
+    sort_expr, sort_type = TRACK_SORT_KEYS[sort]
+    conditions, parameters = [], []
+
+    def param(name, value, type_=None):
+        parameters.append(sql_service.StatementParameterListItem(name=name, value=value, type=type_))
+        return f":{name}"
+
+    if processed:
+        conditions.append(f"t.processed = {param('processed', processed.upper())}")
+    if file_type:
+        conditions.append(f"t.type = {param('type', file_type.lower())}")
+    if date_from:
+        conditions.append(f"t.upload_time >= {param('date_from', date_from, 'DATE')}")
+    if date_to:
+        conditions.append(f"t.upload_time < DATE_ADD({param('date_to', date_to, 'DATE')}, 1)")
+    if name_prefix:
+        conditions.append(f"STARTSWITH(t.file_name, {param('name_prefix', name_prefix)})")
+    if cursor:
+        after_value, after_path = decode_cursor(cursor)
+        op = "<" if order == "desc" else ">"
+        value = param("after_value", after_value, sort_type)
+        path = param("after_path", after_path)
+        conditions.append(f"({sort_expr} {op} {value} OR ({sort_expr} = {value} AND t.file_path {op} {path}))")
+
     query = f"""SELECT file_name, 
                        file_path,
                        type, 
                        FORMAT_NUMBER(ROUND(size / 1024, 2), 0) AS size,
                        CASE WHEN processed = 'S' THEN '✅' ELSE '❌' END AS processed,
                        COALESCE(DATE_FORMAT(upload_time, 'dd/MM/yyyy'), '-') AS upload_time,
-                       COALESCE(DATE_FORMAT(processed_time, 'dd/MM/yyyy'), '-') AS processed_time
-                  FROM {catalog}.{schema}.contract_track
-                 ORDER BY upload_time DESC, processed_time DESC"""
-    
+                       COALESCE(DATE_FORMAT(processed_time, 'dd/MM/yyyy'), '-') AS processed_time,
+                       CAST({sort_expr} AS STRING) AS sort_value
+                  FROM {catalog}.{schema}.contract_track t"""
+    if conditions:
+        query += "\n                 WHERE " + "\n                   AND ".join(conditions)
+    query += f"\n                 ORDER BY {sort_expr} {order.upper()}, t.file_path {order.upper()}"
+    if limit:
+        # Uma linha a mais indica se existe próxima página
+        query += f"\n                 LIMIT {int(limit) + 1}"
+    return query, parameters
+
+def get_all_pdf_volume(**filters):
+    """Executa a listagem de contract_track e retorna os lotes de registros (todos os blocos do resultado)"""
+    query, parameters = build_track_query(**filters)
     print(f"📝 Executando query via WorkspaceClient SQL...")
-    
-    client = get_workspace_client()
-    
-    # Extract warehouse_id from http_path
-    warehouse_id = http_path.split('/')[-1]
-    print(f"🏭 Warehouse ID: {warehouse_id}")
-    
-    # Execute SQL statement
-    from databricks.sdk.service.sql import StatementParameterListItem
-    
+    return query_batches("track_page", query, parameters or None)
+
+async def next_batch(batches):
+    """Primeiro lote de um iterate_blocking (lista vazia se o resultado não tiver linhas)"""
     try:
-        response = client.statement_execution.execute_statement(
-            warehouse_id=warehouse_id,
-            statement=query,
-            catalog=catalog,
-            schema=schema
-        )
-        
-        print(f"✅ Query executada com sucesso")
-        
+        return await batches.__anext__()
+    except StopAsyncIteration:
+        return []
+
+def stream_json_records(first, batches, fields, headers=None):
+    """
+    Envia lotes de registros como um array JSON em streaming, sem montar o resultado inteiro
+    em memória. 'first' já foi lido pelo endpoint (erros da query viram resposta normal).
+    """
+    async def body():
+        yield b"["
+        separator = b""
+        batch = first
+        while True:
+            if batch:
+                chunk = ",".join(json.dumps({f: row.get(f) for f in fields}, ensure_ascii=False) for row in batch)
+                yield separator + chunk.encode("utf-8")
+                separator = b","
+            try:
+                batch = await batches.__anext__()
+            except StopAsyncIteration:
+                break
+        yield b"]"
+
+    return StreamingResponse(body(), media_type="application/json", headers=headers)
+
+# =======================================================================
+pdf_info_cache = shared_cache.namespace("pdf_info", ttl=pdf_info_cache_ttl, maxsize=pdf_info_cache_size)
+
+def embed_question(text):
+    """Embedding da pergunta pelo serving endpoint configurado em EMBEDDING_ENDPOINT"""
+    with metrics.span("serving_query_embedding"):
+        response = get_workspace_client().serving_endpoints.query(name=embedding_endpoint, input=[text])
+    return response.data[0].embedding
+
+answer_cache = AnswerCache(
+    maxsize=answer_cache_size,
+    ttl=answer_cache_ttl,
+    threshold=answer_cache_threshold,
+    embed=embed_question if embedding_endpoint else None
+)
+
+# Última versão conhecida de contract_track (MAX(processed_time)) usada para invalidar o cache
+track_version = {"value": None, "checked_at": 0.0}
+track_version_lock = threading.Lock()
+
+
+# =======================================================================
+def run_statement(query, parameters=None):
+    """Executa uma query no SQL Warehouse via WorkspaceClient e retorna um DataFrame (todos os blocos)"""
+    result = statement_reader.execute(query, parameters=parameters)
+    return pd.DataFrame(result.fetch_all(), columns=result.columns)
+
+def run_query(name, **values):
+    """Executa uma statement registrada em backend/queries.py e retorna um DataFrame"""
+    start = time.perf_counter()
+    try:
+        return run_statement(*queries.bind(name, **values))
+    finally:
+        metrics.QUERY_LATENCY.observe(time.perf_counter() - start, query=name)
+
+def query_batches(name, query=None, parameters=None, **values):
+    """
+    Lotes de registros de uma statement registrada (ou de 'query' montada dinamicamente,
+    medida com o nome informado). A execução só começa no primeiro next().
+    """
+    start = time.perf_counter()
+    try:
+        if query is None:
+            query, parameters = queries.bind(name, **values)
+        yield from statement_reader.execute(query, parameters=parameters).batches()
+    finally:
+        metrics.QUERY_LATENCY.observe(time.perf_counter() - start, query=name)
+
+# =======================================================================
+def normalize_pdf_name(pdf: Optional[str] = ""):
+    """Normaliza o parâmetro 'pdf' (URL-encoded, com ou sem diretório) para o nome do arquivo"""
+    name = unquote_plus(pdf or "").strip()
+    return name.rsplit("/", 1)[-1]
+
+def pdf_volume_path(name):
+    """Caminho completo do arquivo como gravado em contract_extract.path"""
+    return f"dbfs:{volume_path}/{name}"
+
+# =======================================================================
+def check_track_version():
+    """
+    Verifica (no máximo a cada TRACK_VERSION_CHECK_SECONDS) se contract_track.processed_time
+    mudou. Quando um documento é (re)processado, o cache de documentos é invalidado.
+    """
+    now = time.monotonic()
+    with track_version_lock:
+        if now - track_version["checked_at"] < track_version_ttl:
+            return track_version["value"]
+        track_version["checked_at"] = now
+
+    try:
+        df = run_query("track_version")
+        version = df["version"].iloc[0] if not df.empty else None
     except Exception as e:
-        print(f"❌ Erro ao executar query: {e}")
-        return pd.DataFrame()
-    
-    # Parse results
-    if response.result and response.result.data_array:
-        columns = [col.name for col in response.manifest.schema.columns]
-        data = response.result.data_array
-        df = pd.DataFrame(data, columns=columns)
-        print(f"✅ Resultados: {len(df)} linhas")
-    else:
-        print("⚠️ Nenhum resultado retornado")
-        df = pd.DataFrame()
-    
-    return df
+        print(f"⚠️ Erro ao verificar versão de contract_track: {e}")
+        return track_version["value"]
+
+    with track_version_lock:
+        if version != track_version["value"]:
+            if track_version["value"] is not None:
+                print(f"♻️ contract_track alterada ({track_version['value']} → {version}), limpando cache")
+            pdf_info_cache.clear()
+            answer_cache.clear()
+            track_version["value"] = version
+    return version
 
 # =======================================================================
 def get_all_pdf_info(pdf: Optional[str] = ""):
     # Use WorkspaceClient SQL execution instead of databricks-sql-connector
-    query = f"""SELECT path, 
-                      REPLACE(path, 'dbfs:', '') as volume,
-                      SUBSTRING_INDEX(path, '/', -1) as pdf,
-                      tipo_contrato,
-                      nome_contrato,
-                      contratante,
-                      contratado,
-                      FORMAT_NUMBER(valor_total, 2) as valor_total,
-                      moeda,
-                      DATE_FORMAT(data_assinatura, 'dd/MM/yyyy') as data_assinatura,
-                      DATE_FORMAT(data_inicio_vigencia, 'dd/MM/yyyy') as data_inicio_vigencia,
-                      DATE_FORMAT(data_fim_vigencia, 'dd/MM/yyyy') as data_fim_vigencia,
-                      prazo_vigencia,
-                      objeto_contrato,
-                      forma_pagamento,
-                      condicoes_pagamento,
-                      clausula_rescisao,
-                      FORMAT_NUMBER(multa_rescisao, 2) as multa_rescisao,
-                      garantias,
-                      confidencialidade,
-                      foro,
-                      observacoes,
-                      summarize
-                 FROM {catalog}.{schema}.contract_extract
-                 WHERE 1=1"""
-    
-    if pdf != "":
-        query += f" AND path LIKE CONCAT('%', REPLACE(REPLACE('{pdf}', '%20', ' '),'+', ' '), '%')"
+    if normalize_pdf_name(pdf) != "":
+        return get_pdf_info(pdf)
 
-    client = get_workspace_client()
-    warehouse_id = http_path.split('/')[-1]
-    
-    response = client.statement_execution.execute_statement(
-        warehouse_id=warehouse_id,
-        statement=query,
-        catalog=catalog,
-        schema=schema
-    )
-    
-    # Parse results
-    if response.result and response.result.data_array:
-        columns = [col.name for col in response.manifest.schema.columns]
-        data = response.result.data_array
-        df = pd.DataFrame(data, columns=columns)
-    else:
-        df = pd.DataFrame()
+    return run_query("all_pdf_info")
 
+# =======================================================================
+def get_pdf_info(pdf: str):
+    """
+    Busca os dados de um único documento: primeiro no cache (chave = nome normalizado),
+    depois com uma consulta pontual por igualdade em contract_extract.path.
+    """
+    name = normalize_pdf_name(pdf)
+    check_track_version()
+
+    # O cache guarda registros (não DataFrames): serializar um DataFrame custa ~40x mais no cache compartilhado
+    cached = pdf_info_cache.get(name)
+    metrics.record_cache("pdf_info", bool(cached))
+    if cached:
+        return pd.DataFrame(cached)
+
+    df = run_query("pdf_info", path=pdf_volume_path(name))
+    # Documento não encontrado não é guardado (registros vazios perderiam as colunas do DataFrame)
+    if not df.empty:
+        pdf_info_cache.set(name, df.to_dict(orient="records"))
     return df
 
 
+# =======================================================================
+# Índice de contratos para o chat, alimentado pelo contexto pré-renderizado em contract_context
+# (gravado pelo job de extração) e atualizado via Change Data Feed de contract_track
+contract_index = BM25Index()
+contract_index_state = {"version": None, "cdf_version": None, "loaded": False}
+contract_index_lock = threading.Lock()
+
+def get_track_table_version():
+    df = run_query("track_history")
+    return int(df["version"].iloc[0]) if not df.empty else None
+
+def load_contract_contexts(paths=None):
+    """Carrega {path: context} de contract_context (todos ou apenas os paths informados)"""
+    if paths is None:
+        df = run_query("contract_contexts")
+    elif not paths:
+        return {}
+    else:
+        df = run_query("contract_contexts_by_path", paths=paths)
+    return dict(zip(df["path"], df["context"])) if not df.empty else {}
+
+def changed_track_paths(since_version):
+    """Documentos marcados como processados em contract_track após since_version (Change Data Feed)"""
+    df = run_query("track_changes", start_version=int(since_version) + 1)
+    if df.empty:
+        return [], since_version
+    latest = max(int(v) for v in df["_commit_version"])
+    changed = df[df["_change_type"].isin(["insert", "update_postimage"]) & (df["processed"] == "S")]
+    return sorted(set(changed["file_path"])), latest
+
+def refresh_contract_index():
+    """
+    Primeira chamada: carrega todo o contract_context. Depois, sempre que contract_track muda,
+    lê apenas as alterações pelo Change Data Feed e busca o contexto dos documentos afetados.
+    """
+    version = check_track_version()
+    with contract_index_lock:
+        if contract_index_state["loaded"] and version == contract_index_state["version"]:
+            return
+
+        try:
+            if contract_index_state["loaded"]:
+                paths, cdf_version = changed_track_paths(contract_index_state["cdf_version"])
+                contexts = load_contract_contexts(paths)
+            else:
+                cdf_version = get_track_table_version()
+                contexts = load_contract_contexts()
+        except Exception as e:
+            print(f"⚠️ Erro ao atualizar índice de contratos: {e}")
+            # Histórico indisponível (ex.: VACUUM): recarrega tudo na próxima vez
+            contract_index_state["loaded"] = False
+            return
+
+        for path, context in contexts.items():
+            contract_index.upsert(path, context, context)
+
+        contract_index_state["version"] = version
+        contract_index_state["cdf_version"] = cdf_version
+        contract_index_state["loaded"] = True
+        print(f"🔎 Índice de contratos atualizado: +{len(contexts)} documentos, {len(contract_index)} no total")
+
+# =======================================================================
+# Aquecimento em segundo plano (disparado pelo lifespan, não bloqueia o início do servidor)
+# =======================================================================
+startup_state = {"ready": False, "errors": {}}
+
+def warm_workspace_client():
+    get_workspace_client()
+    sql_token_cache.get()
+
+async def warm_step(name, dependency, func, *args):
+    start = time.perf_counter()
+    try:
+        await run_blocking(dependency, func, *args)
+    except Exception as e:
+        startup_state["errors"][name] = str(e)
+        print(f"⚠️ Aquecimento '{name}' falhou: {e}")
+    finally:
+        record(f"warmup {name}", time.perf_counter() - start)
+
+async def warm_up():
+    """Cria os clientes e importa os módulos pesados antes da primeira requisição que precisar deles"""
+    start = time.perf_counter()
+    await asyncio.gather(
+        warm_step("workspace_client", "warehouse", warm_workspace_client),
+        warm_step("deploy_client", "serving", get_deploy_client),
+        warm_step("modules", "warehouse", preload, pd, serving),
+    )
+    # Statement trivial liga o warehouse (se estiver parado) e aquece a sessão do Statement Execution API
+    await warm_step("warehouse", "warehouse", run_query, "ping")
+    await warm_step("contract_index", "warehouse", refresh_contract_index)
+
+    record("warmup", time.perf_counter() - start)
+    startup_state["ready"] = True
+    print("🔥 Aquecimento concluído: " + ", ".join(f"{step}={seconds:.3f}s" for step, seconds in TIMINGS.items()))
+
 # =======================================================================
 # Health check endpoint
 # =======================================================================
@@ -412,9 +836,38 @@ async def health_check():
         "status": "healthy",
         "app": "contract-extract",
         "catalog": catalog,
-        "schema": schema
+        "schema": schema,
+        # Tempos de import e de aquecimento (segundos); ready=False enquanto o aquecimento roda
+        "startup": {"ready": startup_state["ready"], "timings": TIMINGS, "errors": startup_state["errors"]}
     }
 
+# =======================================================================
+# Snapshots das métricas de cada worker, por pid; somem 3 publicações após o worker parar
+metrics_store = shared_cache.namespace("metrics", ttl=max(metrics_publish_seconds * 3, 1))
+
+def publish_metrics():
+    metrics_store.set(str(os.getpid()), metrics.snapshot())
+
+async def publish_metrics_loop():
+    while True:
+        try:
+            publish_metrics()
+        except Exception as e:
+            print(f"⚠️ Erro ao publicar métricas: {e}")
+        await asyncio.sleep(metrics_publish_seconds)
+
+@app.get("/api/metrics")
+async def get_metrics():
+    """
+    Métricas no formato de exposição do Prometheus. Com cache compartilhado (vários workers)
+    contadores e histogramas são a soma de todos os workers e gauges têm o label 'worker'.
+    """
+    if not shared_cache.shared:
+        return Response(content=metrics.render(), media_type="text/plain; version=0.0.4")
+    publish_metrics()
+    snapshots = dict(metrics_store.items())
+    return Response(content=metrics.render(snapshots), media_type="text/plain; version=0.0.4")
+
 # =======================================================================
 # Root endpoint - serve React app
 # =======================================================================
@@ -429,32 +882,98 @@ async def serve_frontend():
     return {"error": "Frontend not found", "static_dir": str(static_dir) if static_dir else "None"}
 
 # =======================================================================
+# =======================================================================
+async def get_chat_context(message):
+    await run_blocking("warehouse", refresh_contract_index)
+
+    # Preparar contexto: apenas os contratos mais relevantes para a pergunta, dentro do orçamento de tokens
+    selected = contract_index.select_context(message, top_k=chat_top_k, token_budget=chat_context_tokens)
+    if selected:
+        return "\n\n".join(selected)
+    return "Nenhum contrato encontrado no banco de dados."
+
+async def lookup_cached_answer(message, context_fingerprint):
+    if answer_cache.uses_endpoint:
+        cached = await run_blocking("serving", answer_cache.lookup, message, context_fingerprint)
+    else:
+        cached = answer_cache.lookup(message, context_fingerprint)
+    metrics.record_cache("answer", cached is not None)
+    return cached
+
+def store_answer(message, context_fingerprint, result):
+    # Respostas de erro não são guardadas
+    if result and not result.startswith("⚠️"):
+        answer_cache.store(message, context_fingerprint, result)
+
+async def answer_question(message):
+    """Contexto relevante + cache de respostas + agent endpoint"""
+    context = await get_chat_context(message)
+    context_fingerprint = fingerprint(context)
+
+    result = await lookup_cached_answer(message, context_fingerprint)
+    if result is None:
+        # Usar diretamente o LLM endpoint ao invés de tentar o agent endpoint primeiro
+        result = await run_blocking("serving", get_direct_llm_answer, message, context)
+        await run_blocking("serving", store_answer, message, context_fingerprint, result)
+    return result
+
+def sse_event(data, event=None):
+    payload = f"data: {json.dumps(data, ensure_ascii=False)}\n\n"
+    return f"event: {event}\n{payload}" if event else payload
+
 # =======================================================================
 @app.post("/chat/")
 async def chat_endpoint(chat_request: ChatRequest):
     message = chat_request.text
     chat_history = chat_request.chat_history
     
-    #result = get_genie_answer(message) # Caso queira chamar o Genie API, descomentar
-    pdf_info = get_all_pdf_info()
-    
-    # Preparar contexto: usar o DataFrame inteiro ou coluna específica se existir
-    if not pdf_info.empty:
-        if 'summarize' in pdf_info.columns:
-            # Concatenar todos os resumos em um texto
-            context = "\n\n".join(pdf_info['summarize'].dropna().tolist())
-        else:
-            # Usar o DataFrame inteiro convertido para string
-            context = pdf_info.to_string(max_rows=20)
-    else:
-        context = "Nenhum contrato encontrado no banco de dados."
-    
-    # Usar diretamente o LLM endpoint ao invés de tentar o agent endpoint primeiro
-    result = get_direct_llm_answer(message, context)
+    #result = await run_blocking("warehouse", get_genie_answer, message) # Caso queira chamar o Genie API, descomentar
+    result = await answer_question(message)
     chat_history.append([message, result])
 
     return {"response": result, "chat_history": chat_history}
 
+# =======================================================================
+@app.post("/chat/stream")
+async def chat_stream_endpoint(chat_request: ChatRequest, request: Request):
+    """
+    Igual ao /chat/, mas envia a resposta como server-sent events à medida que o
+    endpoint gera os tokens. A geração é interrompida se o cliente desconectar.
+    """
+    message = chat_request.text
+    chat_history = chat_request.chat_history
+    context = await get_chat_context(message)
+    context_fingerprint = fingerprint(context)
+    cached = await lookup_cached_answer(message, context_fingerprint)
+
+    async def events():
+        if cached is not None:
+            chat_history.append([message, cached])
+            yield sse_event({"delta": cached})
+            yield sse_event({"response": cached, "chat_history": chat_history}, event="done")
+            return
+
+        parts = []
+        try:
+            async for text in iterate_blocking("serving", stream_direct_llm_answer, message, context):
+                if await request.is_disconnected():
+                    print("🔌 Cliente desconectou, cancelando geração")
+                    return
+                parts.append(text)
+                yield sse_event({"delta": text})
+        except Exception as e:
+            print(f"❌ Erro no streaming do agent endpoint: {e}")
+            yield sse_event({"error": f"⚠️ Erro ao processar sua pergunta: {str(e)}"}, event="error")
+            return
+
+        result = "".join(parts)
+        await run_blocking("serving", store_answer, message, context_fingerprint, result)
+        chat_history.append([message, result])
+        yield sse_event({"response": result, "chat_history": chat_history}, event="done")
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
 # =======================================================================
 @app.get("/api/config")
 async def get_config():
@@ -468,12 +987,12 @@ async def get_config():
 # =======================================================================
 @app.get("/api/temp_audio/{audio_id}")
 async def serve_temp_audio(audio_id: str):
-    """Serve áudio temporário armazenado em memória"""
-    if audio_id not in temp_audio_storage:
+    """Serve áudio temporário (de qualquer worker)"""
+    audio_path = audio_store.path(audio_id)
+    if audio_path is None:
         return Response(status_code=404, content="Audio not found")
     
-    audio_bytes = temp_audio_storage[audio_id]
-    return Response(content=audio_bytes, media_type="audio/mpeg")
+    return FileResponse(str(audio_path), media_type="audio/mpeg")
 
 # =======================================================================
 @app.post("/chat_audio/")
@@ -481,66 +1000,171 @@ async def chat_audio_endpoint(chat_request: ChatRequestAudio):
     audio = chat_request.audio
     chat_history = chat_request.chat_history
 
-    # Extrair base64 do áudio
-    audio_data = audio.split(",")[-1]
+    # Extrair base64 do áudio (data URL: "data:audio/mpeg;base64,...")
+    header, _, audio_data = audio.rpartition(",")
+    content_type = header[len("data:"):].split(";")[0] if header.startswith("data:") else "audio/mpeg"
     audio_bytes = base64.b64decode(audio_data)
     
-    # Gerar ID único para o áudio
-    import time
-    import uuid
-    audio_id = f"{int(time.time())}_{uuid.uuid4().hex[:8]}"
-    
-    # Armazenar áudio temporariamente
-    temp_audio_storage[audio_id] = audio_bytes
+    # Armazenar áudio temporariamente (gera um ID único)
+    audio_id = audio_store.put(audio_bytes)
     
-    # Transcrever usando URL temporária
-    transcription = transcribe_audio(audio_data, audio_id)
+    # Transcrever
+    transcription = await run_blocking("serving", transcribe_audio, audio_id, content_type)
 
     return {"response": transcription, "chat_history": chat_history}
 
 
 # =======================================================================
-@app.post("/api/upload")
-async def upload_file(file: UploadFile = File(...)):
-    
-    # Read file into bytes
-    file_bytes = file.file.read()
-    binary_data = io.BytesIO(file_bytes)
+@app.post("/chat_audio/stream")
+async def chat_audio_stream_endpoint(request: Request, chat_history: str = "[]"):
+    """
+    Recebe o áudio binário em streaming (sem base64; Content-Type audio/mpeg ou audio/wav),
+    transcreve cada segmento assim que ele chega e responde a pergunta transcrita.
+    """
+    try:
+        history = json.loads(chat_history)
+    except ValueError:
+        return JSONResponse({"error": "chat_history must be a JSON list"}, status_code=400)
+
+    if transcriber is None:
+        return {"transcription": "", "response": AUDIO_UNAVAILABLE_MESSAGE, "chat_history": history}
+
+    too_large = JSONResponse({"error": f"audio larger than {audio_disk_max_bytes} bytes"}, status_code=413)
+    content_length = request.headers.get("content-length", "")
+    if content_length.isdigit() and int(content_length) > audio_disk_max_bytes:
+        return too_large
 
-    # Specify volume path and upload
-    file_path = f"{volume_path}/{file.filename}"
+    content_type = request.headers.get("content-type", "audio/mpeg")
+    segmenter = make_segmenter(content_type, audio_segment_bytes)
+    pending = []
 
+    def transcribe_segment(segment):
+        pending.append(asyncio.create_task(run_blocking("serving", transcriber.transcribe, segment, content_type)))
+
+    # O índice de contratos é atualizado enquanto o áudio ainda está chegando
+    warmup = asyncio.create_task(run_blocking("warehouse", refresh_contract_index))
+
+    try:
+        # Corpo sem Content-Length (chunked): o limite é verificado enquanto o áudio chega
+        with audio_store.writer(max_bytes=audio_disk_max_bytes) as (audio_id, f):
+            async for chunk in request.stream():
+                f.write(chunk)
+                for segment in segmenter.feed(chunk):
+                    transcribe_segment(segment)
+            for segment in segmenter.flush():
+                transcribe_segment(segment)
+    except BlobTooLarge:
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, warmup, return_exceptions=True)
+        return too_large
+
+    texts = await asyncio.gather(*pending, return_exceptions=True)
+    await asyncio.gather(warmup, return_exceptions=True)
+    for text in texts:
+        if isinstance(text, Exception):
+            print(f"❌ Erro ao transcrever segmento: {text}")
+    transcription = " ".join(text.strip() for text in texts if isinstance(text, str) and text.strip())
+    audio_store.delete(audio_id)
+
+    if not transcription:
+        return {"transcription": "", "response": AUDIO_FAILED_MESSAGE, "chat_history": history}
+
+    result = await answer_question(transcription)
+    history.append([transcription, result])
+    return {"transcription": transcription, "response": result, "chat_history": history}
+
+# =======================================================================
+def upload_to_volume(file_path, binary_data):
+    with metrics.span("files_upload"):
+        get_workspace_client().files.upload(file_path, binary_data, overwrite=True)
+
+def upload_part_to_volume(part):
+    file_path = f"{volume_path}/{part.filename}"
     print(file_path)
-    get_workspace_client().files.upload(file_path, binary_data, overwrite=True)
+    with part.open() as f:
+        upload_to_volume(file_path, f)
+
+def find_known_hashes(hashes):
+    """Retorna {file_hash: file_name} dos hashes que já existem em contract_track"""
+    if not hashes:
+        return {}
+    df = run_query("known_hashes", hashes=hashes)
+    if df.empty:
+        return {}
+    return dict(zip(df["file_hash"], df["file_name"]))
 
-    return {"filename": file.filename}
+@app.post("/api/upload")
+async def upload_file(request: Request):
+    """
+    Recebe um ou mais arquivos (campos 'file' ou 'files') em streaming, calculando o MD5
+    durante a leitura. Arquivos cujo conteúdo já está em contract_track não são enviados ao volume.
+    """
+    try:
+        parts = await receive_uploads(request)
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+
+    if not parts:
+        return JSONResponse({"error": "No file received"}, status_code=400)
+
+    try:
+        try:
+            known = await run_blocking("warehouse", find_known_hashes, sorted({part.md5 for part in parts}))
+        except Exception as e:
+            print(f"⚠️ Não foi possível verificar duplicados: {e}")
+            known = {}
+
+        results = []
+        pending = []
+        seen = {}
+        for part in parts:
+            result = {"filename": part.filename, "md5": part.md5, "size": part.size}
+            duplicate_of = known.get(part.md5) or seen.get(part.md5)
+            if duplicate_of:
+                print(f"♻️ {part.filename} ignorado: mesmo conteúdo de {duplicate_of}")
+                result.update(status="duplicate", duplicate_of=duplicate_of)
+            else:
+                seen[part.md5] = part.filename
+                result["status"] = "uploaded"
+                pending.append(part)
+            results.append(result)
+
+        await asyncio.gather(*(run_blocking("files", upload_part_to_volume, part) for part in pending))
+    finally:
+        for part in parts:
+            part.discard()
+
+    # Duplicados não são erro: cada arquivo informa "uploaded" ou "duplicate" (com duplicate_of)
+    return JSONResponse({"filename": results[0]["filename"], "files": results})
     
 # =======================================================================
 @app.get("/api/data")
-async def get_extract_data():
+async def get_extract_data(limit: Optional[int] = None, cursor: Optional[str] = None,
+                           sort: str = "upload_time", order: str = "desc",
+                           processed: Optional[str] = None, type: Optional[str] = None,
+                           date_from: Optional[date] = None, date_to: Optional[date] = None,
+                           name_prefix: Optional[str] = None):
+    """
+    Lista contract_track. Sem 'limit' retorna tudo (compatível com o frontend atual);
+    com 'limit' retorna uma página e o cursor da próxima no header X-Next-Cursor.
+    """
+    if limit is not None and not 1 <= limit <= max_page_size:
+        return JSONResponse({"error": f"limit must be between 1 and {max_page_size}"}, status_code=400)
+
+    filters = dict(sort=sort, order=order.lower(), limit=limit, cursor=cursor, processed=processed,
+                   file_type=type, date_from=date_from.isoformat() if date_from else None,
+                   date_to=date_to.isoformat() if date_to else None, name_prefix=name_prefix)
     try:
-        print("📊 Chamando get_all_pdf_volume()...")
-        response = get_all_pdf_volume()
-        print(f"✅ Query retornou {len(response)} linhas")
-        
-        # Verificar se o DataFrame está vazio ou não tem colunas
-        if response.empty:
-            print("⚠️ Nenhum dado encontrado na tabela contract_track")
-            return []
-        
-        # Verificar se as colunas esperadas existem
-        expected_cols = ["file_name","type","size","processed","file_path","upload_time","processed_time"]
-        missing_cols = [col for col in expected_cols if col not in response.columns]
-        
-        if missing_cols:
-            print(f"⚠️ Colunas faltando: {missing_cols}")
-            print(f"📋 Colunas disponíveis: {list(response.columns)}")
-            return []
-        
-        df = response.loc[:, expected_cols]
-        df_dict = df.to_dict(orient='records')
-        print(f"✅ Retornando {len(df_dict)} registros")
-        return df_dict
+        build_track_query(**filters)
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+
+    expected_cols = ["file_name","type","size","processed","file_path","upload_time","processed_time"]
+    print("📊 Chamando get_all_pdf_volume()...")
+    batches = iterate_blocking("warehouse", get_all_pdf_volume, **filters)
+    try:
+        first = await next_batch(batches)
     except Exception as e:
         import traceback
         print(f"❌ ERRO em /api/data: {str(e)}")
@@ -548,58 +1172,252 @@ async def get_extract_data():
         # Retorna array vazio ao invés de erro para não quebrar o frontend
         return []
 
+    if not first:
+        print("⚠️ Nenhum dado encontrado na tabela contract_track")
+        return []
+
+    # Verificar se as colunas esperadas existem
+    missing_cols = [col for col in expected_cols if col not in first[0]]
+    if missing_cols:
+        print(f"⚠️ Colunas faltando: {missing_cols}")
+        print(f"📋 Colunas disponíveis: {list(first[0])}")
+        await batches.aclose()
+        return []
+
+    if limit is None:
+        # Lista completa: os lotes seguem direto para a resposta
+        return stream_json_records(first, batches, expected_cols)
+
+    # Página: no máximo limit + 1 linhas
+    rows = first + [row async for batch in batches for row in batch]
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1]["sort_value"], rows[-1]["file_path"])
+
+    print(f"✅ Retornando {len(rows)} registros")
+    headers = {"X-Next-Cursor": next_cursor} if next_cursor else None
+    return JSONResponse([{col: row[col] for col in expected_cols} for row in rows], headers=headers)
+
 
 # =======================================================================
+ALL_DATA_COLUMNS = ["tipo_contrato", "nome_contrato", "contratante", "contratado", "valor_total", "moeda",
+                    "data_assinatura", "data_inicio_vigencia", "data_fim_vigencia", "prazo_vigencia",
+                    "objeto_contrato", "forma_pagamento", "condicoes_pagamento", "clausula_rescisao",
+                    "multa_rescisao", "garantias", "confidencialidade", "foro", "observacoes", "summarize"]
+
 @app.get("/api/all_data")
 async def get_extract_all_data(pdf: Optional[str] = ""):
     try:
-        response = get_all_pdf_info(pdf)
-        df = response.loc[:, ["tipo_contrato", "nome_contrato", "contratante", "contratado", "valor_total", "moeda", 
-                              "data_assinatura", "data_inicio_vigencia", "data_fim_vigencia", "prazo_vigencia", 
-                              "objeto_contrato", "forma_pagamento", "condicoes_pagamento", "clausula_rescisao", 
-                              "multa_rescisao", "garantias", "confidencialidade", "foro", "observacoes", "summarize"]]
-        df_dict = df.to_dict(orient='records')
-        return df_dict
+        if normalize_pdf_name(pdf) != "":
+            # Documento único: consulta pontual com cache
+            response = await run_blocking("warehouse", get_all_pdf_info, pdf)
+            df = response.loc[:, ALL_DATA_COLUMNS]
+            return df.to_dict(orient='records')
+
+        batches = iterate_blocking("warehouse", query_batches, "all_pdf_info")
+        first = await next_batch(batches)
+        return stream_json_records(first, batches, ALL_DATA_COLUMNS)
     except Exception as e:
         print(f"❌ Erro em /api/all_data: {str(e)}")
         return []
 
 # =======================================================================
+# Grupos de campos aceitos por /api/batch
+BATCH_FIELD_GROUPS = {
+    "metadata": ["tipo_contrato", "nome_contrato", "contratante", "contratado", "valor_total", "moeda",
+                 "data_assinatura", "data_inicio_vigencia", "data_fim_vigencia", "prazo_vigencia",
+                 "objeto_contrato", "file_hash"],
+    "summary":  ["summarize"],
+    "clauses":  ["forma_pagamento", "condicoes_pagamento", "clausula_rescisao", "multa_rescisao",
+                 "garantias", "confidencialidade", "foro", "observacoes"],
+}
+
+@app.post("/api/batch")
+async def get_batch(batch_request: BatchRequest):
+    """
+    Dados de vários documentos em uma única consulta. Resposta em NDJSON, uma linha por
+    documento ({"pdf": ..., campos dos grupos pedidos}); documentos em cache saem primeiro.
+    """
+    unknown = [group for group in batch_request.fields if group not in BATCH_FIELD_GROUPS]
+    if unknown:
+        return JSONResponse({"error": f"unknown field groups: {unknown}"}, status_code=400)
+    names = list(dict.fromkeys(name for name in map(normalize_pdf_name, batch_request.ids) if name))
+    if len(names) > batch_max_documents:
+        return JSONResponse({"error": f"at most {batch_max_documents} documents per request"}, status_code=400)
+
+    fields = [field for group in batch_request.fields for field in BATCH_FIELD_GROUPS[group]]
+    await run_blocking("warehouse", check_track_version)
+
+    cached, misses = [], []
+    for name in names:
+        records = pdf_info_cache.get(name)
+        metrics.record_cache("pdf_info", bool(records))
+        if records:
+            cached.append(records[0])
+        else:
+            misses.append(name)
+
+    def line(record):
+        return (json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8")
+
+    def document(row):
+        return line({"pdf": row["pdf"], **{field: row.get(field) for field in fields}})
+
+    async def body():
+        for row in cached:
+            yield document(row)
+        if not misses:
+            return
+
+        found = set()
+        try:
+            async for rows in iterate_blocking("warehouse", query_batches, "pdf_info_batch",
+                                              paths=[pdf_volume_path(name) for name in misses]):
+                for row in rows:
+                    if row["pdf"] in found:
+                        continue
+                    found.add(row["pdf"])
+                    # Mesmo formato de get_pdf_info, assim o cache serve os dois caminhos
+                    pdf_info_cache.set(row["pdf"], [row])
+                    yield document(row)
+        except Exception as e:
+            print(f"❌ Erro em /api/batch: {str(e)}")
+            for name in misses:
+                if name not in found:
+                    yield line({"pdf": name, "error": "query failed"})
+            return
+
+        for name in misses:
+            if name not in found:
+                yield line({"pdf": name, "error": "not found"})
+
+    return StreamingResponse(body(), media_type="application/x-ndjson")
+
+# =======================================================================
+pdf_disk_cache = PdfDiskCache(pdf_cache_dir, pdf_cache_max_bytes)
+
 @app.get("/api/pdf")
-async def get_pdf(pdf: Optional[str] = ""):
-    # Get token for API requests
-    token = get_sql_token()
-    if not token:
+async def get_pdf(request: Request, pdf: Optional[str] = ""):
+    response = await run_blocking("warehouse", get_all_pdf_info, pdf)
+    if response.empty:
+        return Response(content="PDF not found", status_code=404)
+
+    volume = response["volume"].iloc[0]
+    file_hash = response["file_hash"].iloc[0] if "file_hash" in response.columns else None
+
+    # file_hash (MD5 do conteúdo) é o ETag natural do documento
+    headers = {"Accept-Ranges": "bytes", "Cache-Control": "private, no-cache"}
+    if file_hash:
+        headers["ETag"] = f'"{file_hash}"'
+    if etag_matches(request.headers.get("if-none-match"), headers.get("ETag")):
+        return Response(status_code=304, headers=headers)
+
+    # If-Range com outra versão do arquivo: ignora o Range e envia o documento inteiro
+    range_header = request.headers.get("range")
+    if not if_range_allows(request.headers.get("if-range"), headers.get("ETag")):
+        range_header = None
+    key = PdfDiskCache.key_for(volume, file_hash)
+    cached = pdf_disk_cache.get(key)
+    metrics.record_cache("pdf_disk", cached is not None)
+    if cached is not None:
+        return serve_cached_pdf(cached, range_header, headers)
+
+    r = await run_blocking("files", open_files_api_stream, volume, range_header)
+    if r is None:
         return Response(content="Authentication token not available", status_code=401)
-    
-    headers = {"Authorization": "Bearer " + token}    
 
-    response = get_all_pdf_info(pdf)
-    df = response.loc[:, ["volume"]]
-    df_dict = df.to_dict(orient='records')
+    if r.status_code not in (200, 206):
+        r.close()
+        return Response(status_code=r.status_code)
 
-    url = f"{server_hostname}/api/2.0/fs/files{df_dict[0]['volume']}"
-    print(url)
-    r = requests.get(url, headers=headers)
+    for name in ("Content-Length", "Content-Range"):
+        if name in r.headers:
+            headers[name] = r.headers[name]
 
+    # Download completo: repassa os blocos ao cliente e grava no cache ao mesmo tempo
     if r.status_code == 200:
-        return Response(r.content, media_type="application/pdf")
+        body = stream_and_cache_pdf(r, key)
+    else:
+        body = stream_upstream(r)
+    return StreamingResponse(body, status_code=r.status_code, media_type="application/pdf", headers=headers)
+
+def open_files_api_stream(volume, range_header=None):
+    """GET em streaming na Files API usando a sessão compartilhada; renova o token uma vez em caso de 401"""
+    url = f"{server_hostname}/api/2.0/fs/files{volume}"
+    print(url)
+    for attempt in range(2):
+        # Get token for API requests
+        token = get_sql_token()
+        if not token:
+            return None
+
+        headers = {"Authorization": "Bearer " + token}
+        if range_header:
+            headers["Range"] = range_header
+
+        with metrics.span("files_download"):
+            r = files_session.get(url, headers=headers, stream=True)
+        if r.status_code != 401 or attempt == 1:
+            return r
+        r.close()
+        sql_token_cache.invalidate()
+
+def serve_cached_pdf(path, range_header, headers):
+    size = path.stat().st_size
+    try:
+        byte_range = parse_range(range_header, size)
+    except ValueError:
+        return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{size}"})
+
+    if byte_range is None:
+        start, end, status_code = 0, size - 1, 200
     else:
-        return r.status_code
+        (start, end), status_code = byte_range, 206
+        headers = {**headers, "Content-Range": f"bytes {start}-{end}/{size}"}
+
+    headers = {**headers, "Content-Length": str(end - start + 1)}
+    return StreamingResponse(iter_file(path, start, end), status_code=status_code,
+                             media_type="application/pdf", headers=headers)
+
+def stream_upstream(r):
+    try:
+        for chunk in r.iter_content(CHUNK_SIZE):
+            yield chunk
+    finally:
+        r.close()
+
+def stream_and_cache_pdf(r, key):
+    expected = int(r.headers.get("Content-Length", "-1"))
+    temp_path, f = pdf_disk_cache.open_temp()
+    written = 0
+    completed = False
+    try:
+        for chunk in r.iter_content(CHUNK_SIZE):
+            f.write(chunk)
+            written += len(chunk)
+            yield chunk
+        completed = expected < 0 or written == expected
+    finally:
+        f.close()
+        r.close()
+        if completed:
+            pdf_disk_cache.commit(temp_path, key)
+        else:
+            pdf_disk_cache.discard(temp_path)
     
 
 # =======================================================================
 @app.get("/api/summarize")
 async def get_extract_summary(pdf: Optional[str] = ""):
-    response = get_all_pdf_info(pdf)
+    response = await run_blocking("warehouse", get_all_pdf_info, pdf)
     df = response.loc[:, ["summarize"]]
     summarize_text = df["summarize"].iloc[0] if not df.empty else ""
     return summarize_text
 
 # =======================================================================
-@app.get("/api/extract")
-def start_job(pdf: Optional[str] = ""):
-    run = get_workspace_client().jobs.run_now(
+def run_extract_job():
+    return get_workspace_client().jobs.run_now(
         job_id=extract_job_id,
         notebook_params={
             "catalog": catalog,
@@ -607,11 +1425,78 @@ def start_job(pdf: Optional[str] = ""):
             "trackTableName": "contract_track",
             "parsedTableName": "contract_parsed",
             "extractTableName": "contract_extract",
-            "sourcePDFPath": volume_path+"/"+pdf,
+            "sourcePDFPath": volume_path+"/",
             "limit": "100"
         }
     )
-    return {"run_id": run.run_id}
+
+def get_extract_run(run_id):
+    return get_workspace_client().jobs.get_run(run_id)
+
+def list_active_extract_runs():
+    """Execuções em andamento disparadas fora do app (trigger de chegada de arquivos)"""
+    return list(get_workspace_client().jobs.list_runs(job_id=extract_job_id, active_only=True, limit=25))
+
+def on_extract_run_complete(status):
+    """Execução terminou: força a checagem de contract_track (limpa caches) e atualiza o índice do chat"""
+    with track_version_lock:
+        track_version["checked_at"] = 0.0
+    check_track_version()
+    refresh_contract_index()
+    print(f"✅ Execução {status['run_id']} finalizada ({status['result_state']}), caches atualizados")
+
+# Entre workers, apenas um inicia a execução; os outros acompanham a mesma (lock em /dev/shm)
+extract_start_lock = RunStartLock(
+    Path(shared_directory() or tempfile.gettempdir()) / "contract-app-extract.lock",
+    shared_cache.namespace("extract_run", ttl=24 * 3600),
+    get_extract_run,
+)
+
+extract_runs = RunCoordinator(
+    start_run=lambda: extract_start_lock.start(run_extract_job),
+    get_run=get_extract_run,
+    list_active_runs=list_active_extract_runs,
+    on_complete=on_extract_run_complete,
+    poll_interval=extract_poll_seconds,
+    coalesce_window=extract_coalesce_seconds,
+)
+
+@app.get("/api/extract")
+async def start_job(pdf: Optional[str] = ""):
+    """
+    Pede uma execução do job de extração. O job processa todos os arquivos pendentes do
+    volume, então pedidos próximos são agrupados em uma execução (ver RunCoordinator).
+    """
+    try:
+        return await extract_runs.request()
+    except Exception as e:
+        return JSONResponse({"error": f"failed to start extract job: {e}"}, status_code=502)
+
+@app.get("/api/extract/status")
+async def extract_status():
+    return extract_runs.status()
+
+@app.get("/api/extract/events")
+async def extract_events(request: Request):
+    """Server-sent events com o estado das execuções (started, state, completed, error)"""
+    queue = extract_runs.subscribe()
+
+    async def events():
+        try:
+            yield sse_event(extract_runs.status(), event="status")
+            while not await request.is_disconnected():
+                try:
+                    event, data = await asyncio.wait_for(queue.get(), timeout=15)
+                except asyncio.TimeoutError:
+                    # Mantém a conexão aberta através de proxies
+                    yield ": keep-alive\n\n"
+                    continue
+                yield sse_event(data, event=event)
+        finally:
+            extract_runs.unsubscribe(queue)
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
 
 # =======================================================================
 # Catch-all route for React Router (SPA routing)
@@ -631,4 +1516,5 @@ async def serve_spa(full_path: str):
     return {"error": "Frontend not found", "static_dir": str(static_dir) if static_dir else "None"}
 
 # =======================================================================
-print("🚀 FastAPI app initialized with static file serving")
\ No newline at end of file
+record("module_import", time.perf_counter() - module_load_started)
+print(f"🚀 FastAPI app initialized with static file serving ({TIMINGS['module_import']:.3f}s)")
\ No newline at end of file
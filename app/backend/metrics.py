@@ -0,0 +1,271 @@
+"""
+Métricas do backend em formato Prometheus (texto), sem dependências externas.
+Contadores, gauges e histogramas com labels; span() mede chamadas externas e, quando
+o cliente envia o header X-Profile, os tempos da requisição voltam em Server-Timing.
+"""
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+PROFILE_HEADER = b"x-profile"
+
+_metrics = []
+_profile = contextvars.ContextVar("metrics_profile", default=None)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+        _metrics.append(self)
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, "")) for name in self.label_names)
+
+    @staticmethod
+    def _copy(value):
+        return value
+
+    @staticmethod
+    def _add(total, value):
+        return value if total is None else total + value
+
+    def snapshot(self):
+        with self._lock:
+            return {key: self._copy(value) for key, value in self._values.items()}
+
+    def _combine(self, snapshots):
+        """(labels, valores) somando os snapshots de todos os workers"""
+        combined = {}
+        for values in snapshots.values():
+            for key, value in values.items():
+                combined[key] = self._add(combined.get(key), value)
+        return self.label_names, combined
+
+    def _samples(self, label_names, key, value):
+        return [f"{self.name}{_labels(label_names, key)} {value}"]
+
+    def render(self, snapshots=None):
+        if snapshots is None:
+            label_names, values = self.label_names, self.snapshot()
+        else:
+            label_names, values = self._combine(snapshots)
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for key, value in sorted(values.items()):
+            lines.extend(self._samples(label_names, key, value))
+        return lines
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def _combine(self, snapshots):
+        # Gauges não se somam entre processos (ex.: tempos de inicialização): um label por worker
+        combined = {key + (str(worker),): value
+                    for worker, values in snapshots.items() for key, value in values.items()}
+        return self.label_names + ("worker",), combined
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry[0][i] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    @staticmethod
+    def _copy(value):
+        counts, total, count = value
+        return [list(counts), total, count]
+
+    @staticmethod
+    def _add(total, value):
+        if total is None:
+            return Histogram._copy(value)
+        return [[a + b for a, b in zip(total[0], value[0])], total[1] + value[1], total[2] + value[2]]
+
+    def _samples(self, label_names, key, value):
+        counts, total, count = value
+        lines = [f"{self.name}_bucket{_labels(label_names, key, [('le', bound)])} {bucket_count}"
+                 for bound, bucket_count in zip(self.buckets, counts)]
+        lines.append(f"{self.name}_bucket{_labels(label_names, key, [('le', '+Inf')])} {count}")
+        lines.append(f"{self.name}_sum{_labels(label_names, key)} {total}")
+        lines.append(f"{self.name}_count{_labels(label_names, key)} {count}")
+        return lines
+
+
+def snapshot():
+    """Valores atuais das métricas deste processo (publicados para os outros workers)"""
+    return {metric.name: metric.snapshot() for metric in _metrics}
+
+
+def render(snapshots=None):
+    """
+    Texto no formato de exposição do Prometheus. Com 'snapshots' ({worker: snapshot()} de
+    todos os workers) contadores e histogramas são somados e gauges ganham o label 'worker'.
+    """
+    lines = []
+    for metric in _metrics:
+        if snapshots is None:
+            lines.extend(metric.render())
+        else:
+            lines.extend(metric.render({worker: values.get(metric.name, {}) for worker, values in snapshots.items()}))
+    return "\n".join(lines) + "\n"
+
+
+# =======================================================================
+# Métricas do app
+# =======================================================================
+HTTP_REQUESTS = Counter("contract_app_http_requests_total", "HTTP requests by route and status",
+                        ("method", "route", "status"))
+HTTP_LATENCY = Histogram("contract_app_http_request_duration_seconds",
+                         "HTTP request latency until the response body is sent", ("method", "route"))
+HTTP_IN_FLIGHT = Gauge("contract_app_http_requests_in_flight", "HTTP requests being processed")
+
+EXTERNAL_LATENCY = Histogram("contract_app_external_call_seconds",
+                             "Latency of calls to Databricks services", ("call",))
+EXTERNAL_ERRORS = Counter("contract_app_external_call_errors_total",
+                          "Failed calls to Databricks services", ("call",))
+
+QUERY_LATENCY = Histogram("contract_app_query_seconds",
+                          "Latency of named SQL statements, including all result chunks", ("query",))
+
+DEPENDENCY_WAIT = Histogram("contract_app_dependency_wait_seconds",
+                            "Time waiting for a concurrency slot of an external dependency", ("dependency",))
+DEPENDENCY_LATENCY = Histogram("contract_app_dependency_seconds",
+                               "Time a blocking call held its dependency slot (includes local processing)",
+                               ("dependency",))
+DEPENDENCY_IN_FLIGHT = Gauge("contract_app_dependency_in_flight",
+                             "Blocking calls running per external dependency", ("dependency",))
+
+CACHE_REQUESTS = Counter("contract_app_cache_requests_total", "Cache lookups by cache and result",
+                         ("cache", "result"))
+
+
+def record_cache(cache, hit):
+    CACHE_REQUESTS.inc(cache=cache, result="hit" if hit else "miss")
+
+
+# =======================================================================
+# Spans e profiling por requisição
+# =======================================================================
+@contextmanager
+def span(call):
+    """Mede uma chamada externa (histograma + Server-Timing se a requisição pediu profiling)"""
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        EXTERNAL_ERRORS.inc(call=call)
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        EXTERNAL_LATENCY.observe(elapsed, call=call)
+        add_timing(call, elapsed)
+
+
+def add_timing(name, seconds):
+    profile = _profile.get()
+    if profile is not None:
+        # A lista é compartilhada com as threads de run_blocking (contexto copiado)
+        profile.append((name, seconds))
+
+
+def server_timing(profile, total):
+    summary = {}
+    for name, seconds in profile:
+        count, elapsed = summary.get(name, (0, 0.0))
+        summary[name] = (count + 1, elapsed + seconds)
+    parts = [f'{name};desc="{count}x";dur={elapsed * 1000:.1f}' for name, (count, elapsed) in summary.items()]
+    parts.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(parts)
+
+
+class MetricsMiddleware:
+    """
+    Middleware ASGI: latência por rota (até o fim do corpo, inclusive em streaming),
+    requisições em andamento e, com o header X-Profile, Server-Timing na resposta.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        start = time.perf_counter()
+        profiling = any(name == PROFILE_HEADER for name, _ in scope.get("headers", []))
+        profile = [] if profiling else None
+        token = _profile.set(profile)
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+                if profiling:
+                    timing = server_timing(profile, time.perf_counter() - start)
+                    message = dict(message)
+                    message["headers"] = list(message.get("headers", [])) + [(b"server-timing", timing.encode())]
+            await send(message)
+
+        HTTP_IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            HTTP_IN_FLIGHT.dec()
+            _profile.reset(token)
+            route = getattr(scope.get("route"), "path", None) or "unmatched"
+            HTTP_LATENCY.observe(time.perf_counter() - start, method=scope["method"], route=route)
+            HTTP_REQUESTS.inc(method=scope["method"], route=route, status=status["code"])
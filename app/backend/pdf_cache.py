@@ -0,0 +1,144 @@
+"""
+Cache em disco (LRU por bytes) dos PDFs baixados da Files API e utilitários
+para responder requisições HTTP Range.
+"""
+import hashlib
+import os
+import re
+import tempfile
+import threading
+import uuid
+from pathlib import Path
+
+CHUNK_SIZE = 256 * 1024
+
+RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def parse_range(header, size):
+    """
+    Converte um header 'Range: bytes=a-b' em (start, end) inclusivos.
+    Retorna None quando não há range utilizável (múltiplos ranges ou sintaxe inválida,
+    como 'bytes=5-3': o header é ignorado e a resposta é 200) e levanta ValueError
+    quando o range não pode ser satisfeito (início além do fim do arquivo).
+    """
+    if not header:
+        return None
+    match = RANGE_RE.match(header.strip())
+    if not match:
+        return None
+    start, end = match.groups()
+    if start == "" and end == "":
+        return None
+    if start == "":
+        # Sufixo: últimos N bytes
+        length = int(end)
+        if length == 0:
+            raise ValueError("empty suffix range")
+        return max(size - length, 0), size - 1
+    start = int(start)
+    if end and int(end) < start:
+        return None
+    if start >= size:
+        raise ValueError("range not satisfiable")
+    end = min(int(end), size - 1) if end else size - 1
+    return start, end
+
+
+def _opaque_tag(tag):
+    tag = tag.strip()
+    return tag[2:] if tag.startswith("W/") else tag
+
+
+def etag_matches(if_none_match, etag):
+    """If-None-Match: '*' ou alguma das tags, com comparação fraca (W/"x" equivale a "x")"""
+    if not if_none_match:
+        return False
+    # '*': qualquer representação existente do documento
+    if if_none_match.strip() == "*":
+        return True
+    if not etag:
+        return False
+    return _opaque_tag(etag) in [_opaque_tag(tag) for tag in if_none_match.split(",")]
+
+
+def if_range_allows(if_range, etag):
+    """
+    If-Range: o Range só vale se a tag for igual (comparação forte) ao ETag atual. Tags fracas
+    e datas (não há Last-Modified) não validam, e a resposta é o arquivo inteiro.
+    """
+    if not if_range:
+        return True
+    if_range = if_range.strip()
+    return bool(etag) and not if_range.startswith("W/") and not etag.startswith("W/") and if_range == etag
+
+
+def iter_file(path, start, end, chunk_size=CHUNK_SIZE):
+    """Lê [start, end] de um arquivo em blocos"""
+    with open(path, "rb") as f:
+        f.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = f.read(min(chunk_size, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+class PdfDiskCache:
+    """Arquivos completos em um diretório local, removidos do menos usado para o mais usado"""
+
+    def __init__(self, directory=None, max_bytes=512 * 1024 * 1024):
+        self.directory = Path(directory or os.path.join(tempfile.gettempdir(), "contract-pdf-cache"))
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key_for(volume, file_hash=None):
+        return hashlib.sha1(f"{volume}:{file_hash or ''}".encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        """Caminho do arquivo em cache (atualizando o uso) ou None"""
+        path = self.directory / f"{key}.pdf"
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return path
+
+    def open_temp(self):
+        """Arquivo temporário no mesmo diretório, para depois publicar com rename atômico"""
+        path = self.directory / f".{uuid.uuid4().hex}.part"
+        return path, open(path, "wb")
+
+    def commit(self, temp_path, key):
+        os.replace(temp_path, self.directory / f"{key}.pdf")
+        self.evict()
+
+    def discard(self, temp_path):
+        try:
+            os.remove(temp_path)
+        except FileNotFoundError:
+            pass
+
+    def evict(self):
+        with self._lock:
+            entries = []
+            total = 0
+            for path in self.directory.glob("*.pdf"):
+                try:
+                    stat = path.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+                total += stat.st_size
+            for _, size, path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                try:
+                    path.unlink()
+                    total -= size
+                except FileNotFoundError:
+                    pass
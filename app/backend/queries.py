@@ -0,0 +1,148 @@
+"""
+Statements SQL nomeadas e parametrizadas. O texto de cada statement é fixo (catálogo e
+schema são resolvidos uma única vez), assim execuções repetidas têm o mesmo texto e
+aproveitam o cache de resultados do warehouse; os valores seguem como parâmetros
+(:nome). Listas (:nome[]) viram um IN com um parâmetro por item, completado até um
+tamanho fixo (IN_LIST_BUCKETS): poucos textos distintos e, ao contrário de
+array_contains, um predicado que o Delta usa para pular arquivos (clustering).
+"""
+import json
+import re
+
+from backend.startup import lazy_import
+
+sql_service = lazy_import("databricks.sdk.service.sql")
+
+LIST_PARAMETER_RE = re.compile(r":(\w+)\[\]")
+IN_LIST_BUCKETS = (8, 32, 128, 512)
+
+PDF_INFO_COLUMNS = """path,
+                      REPLACE(path, 'dbfs:', '') as volume,
+                      SUBSTRING_INDEX(path, '/', -1) as pdf,
+                      tipo_contrato,
+                      nome_contrato,
+                      contratante,
+                      contratado,
+                      FORMAT_NUMBER(valor_total, 2) as valor_total,
+                      moeda,
+                      DATE_FORMAT(data_assinatura, 'dd/MM/yyyy') as data_assinatura,
+                      DATE_FORMAT(data_inicio_vigencia, 'dd/MM/yyyy') as data_inicio_vigencia,
+                      DATE_FORMAT(data_fim_vigencia, 'dd/MM/yyyy') as data_fim_vigencia,
+                      prazo_vigencia,
+                      objeto_contrato,
+                      forma_pagamento,
+                      condicoes_pagamento,
+                      clausula_rescisao,
+                      FORMAT_NUMBER(multa_rescisao, 2) as multa_rescisao,
+                      garantias,
+                      confidencialidade,
+                      foro,
+                      observacoes,
+                      summarize"""
+
+STATEMENTS = {
+    # Aquecimento do warehouse na inicialização do app
+    "ping": """SELECT 1""",
+
+    # Versão de contract_track usada para invalidar caches
+    "track_version": """SELECT CAST(MAX(processed_time) AS STRING) AS version
+                          FROM {catalog}.{schema}.contract_track""",
+
+    "track_history": """DESCRIBE HISTORY {catalog}.{schema}.contract_track LIMIT 1""",
+
+    # Documentos alterados em contract_track a partir de :start_version (Change Data Feed)
+    "track_changes": """SELECT file_path, processed, _change_type, _commit_version
+                          FROM table_changes('{catalog}.{schema}.contract_track', :start_version)""",
+
+    "known_hashes": """SELECT file_hash, file_name
+                         FROM {catalog}.{schema}.contract_track
+                        WHERE file_hash IN (:hashes[])""",
+
+    "pdf_info": f"""SELECT {PDF_INFO_COLUMNS},
+                          t.file_hash
+                     FROM {{catalog}}.{{schema}}.contract_extract e
+                     LEFT JOIN {{catalog}}.{{schema}}.contract_track t ON t.file_path = e.path
+                    WHERE e.path = :path""",
+
+    "pdf_info_batch": f"""SELECT {PDF_INFO_COLUMNS},
+                                t.file_hash
+                           FROM {{catalog}}.{{schema}}.contract_extract e
+                           LEFT JOIN {{catalog}}.{{schema}}.contract_track t ON t.file_path = e.path
+                          WHERE e.path IN (:paths[])""",
+
+    "all_pdf_info": f"""SELECT {PDF_INFO_COLUMNS}
+                         FROM {{catalog}}.{{schema}}.contract_extract""",
+
+    "contract_contexts": """SELECT path, context FROM {catalog}.{schema}.contract_context""",
+
+    "contract_contexts_by_path": """SELECT path, context
+                                      FROM {catalog}.{schema}.contract_context
+                                     WHERE path IN (:paths[])""",
+
+    # databricks-sql-connector (parâmetros nativos)
+    "chat_genie": """SELECT {catalog}.{schema}.chat_genie(:message, 'no relevant history') AS genie_result""",
+}
+
+
+def to_parameter(name, value):
+    """Valor Python -> StatementParameterListItem (listas viram JSON, inteiros são tipados)"""
+    if isinstance(value, (list, tuple, set)):
+        return sql_service.StatementParameterListItem(name=name, value=json.dumps(list(value)))
+    if isinstance(value, bool):
+        return sql_service.StatementParameterListItem(name=name, value="true" if value else "false", type="BOOLEAN")
+    if isinstance(value, int):
+        return sql_service.StatementParameterListItem(name=name, value=str(value), type="INT")
+    return sql_service.StatementParameterListItem(name=name, value=None if value is None else str(value))
+
+
+def in_list_size(count):
+    """Menor bucket que comporta 'count' itens (acima do maior, múltiplos dele)"""
+    for size in IN_LIST_BUCKETS:
+        if count <= size:
+            return size
+    largest = IN_LIST_BUCKETS[-1]
+    return -(-count // largest) * largest
+
+
+def expand_list(name, values):
+    """Nomes e valores dos parâmetros de uma lista, completada repetindo o primeiro item"""
+    values = list(values)
+    size = in_list_size(len(values))
+    # Lista vazia: IN (NULL) não seleciona nada
+    padded = values + [values[0] if values else None] * (size - len(values))
+    return [(f"{name}_{i}", value) for i, value in enumerate(padded)]
+
+
+class QueryRegistry:
+
+    def __init__(self, catalog, schema, statements=None):
+        self._sql = {name: text.format(catalog=catalog, schema=schema)
+                     for name, text in (statements or STATEMENTS).items()}
+
+    def __contains__(self, name):
+        return name in self._sql
+
+    def names(self):
+        return list(self._sql)
+
+    def sql(self, name):
+        return self._sql[name]
+
+    def parameters(self, **values):
+        return [to_parameter(name, value) for name, value in values.items()] or None
+
+    def bind(self, name, **values):
+        """(texto, parâmetros) da statement, com as listas :nome[] expandidas em IN"""
+        text = self._sql[name]
+        parameters = []
+        for key, value in values.items():
+            if f":{key}[]" not in text:
+                parameters.append(to_parameter(key, value))
+                continue
+            items = expand_list(key, value)
+            text = text.replace(f":{key}[]", ", ".join(f":{item}" for item, _ in items))
+            parameters.extend(to_parameter(item, item_value) for item, item_value in items)
+        missing = LIST_PARAMETER_RE.findall(text)
+        if missing:
+            raise ValueError(f"missing list parameters for {name}: {missing}")
+        return text, parameters or None
@@ -0,0 +1,124 @@
+"""
+Índice BM25 em memória usado pelo /chat/ para escolher apenas os contratos
+relevantes para cada pergunta, respeitando um orçamento de tokens.
+"""
+import math
+import re
+import threading
+import unicodedata
+from collections import Counter, OrderedDict
+
+# Palavras muito frequentes em português que não ajudam a diferenciar contratos
+STOPWORDS = {
+    "a", "ao", "aos", "as", "com", "como", "da", "das", "de", "do", "dos", "e", "em",
+    "entre", "era", "essa", "esse", "esta", "este", "eu", "foi", "ha", "isso", "isto",
+    "ja", "mais", "mas", "me", "na", "nas", "no", "nos", "o", "os", "ou", "para", "pela",
+    "pelas", "pelo", "pelos", "por", "qual", "quais", "quando", "que", "quem", "se",
+    "ser", "sao", "seu", "sua", "seus", "suas", "tem", "um", "uma", "umas", "uns",
+    "the", "of", "and", "to", "in", "is", "what", "which",
+}
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text):
+    """Minúsculas, sem acentos, sem stopwords"""
+    if not text:
+        return []
+    text = unicodedata.normalize("NFKD", str(text).lower())
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    return [tok for tok in TOKEN_RE.findall(text) if len(tok) > 1 and tok not in STOPWORDS]
+
+
+def estimate_tokens(text):
+    """Estimativa barata de tokens (~4 caracteres por token)"""
+    return max(1, len(text) // 4) if text else 0
+
+
+class BM25Index:
+    """
+    Índice BM25 incremental. Cada documento tem um texto indexado e um
+    'payload' (o bloco de contexto que vai para o LLM).
+    """
+
+    def __init__(self, k1=1.5, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self._postings = {}            # termo -> {doc_id: tf}
+        self._doc_len = {}             # doc_id -> nº de termos
+        self._payloads = OrderedDict()  # doc_id -> payload (ordem = mais recente por último)
+        self._total_len = 0
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._doc_len)
+
+    def __contains__(self, doc_id):
+        return doc_id in self._doc_len
+
+    def upsert(self, doc_id, text, payload):
+        with self._lock:
+            self._remove(doc_id)
+            terms = Counter(tokenize(text))
+            for term, tf in terms.items():
+                self._postings.setdefault(term, {})[doc_id] = tf
+            length = sum(terms.values())
+            self._doc_len[doc_id] = length
+            self._total_len += length
+            self._payloads[doc_id] = payload
+
+    def remove(self, doc_id):
+        with self._lock:
+            self._remove(doc_id)
+
+    def _remove(self, doc_id):
+        if doc_id not in self._doc_len:
+            return
+        for term in list(self._postings):
+            docs = self._postings[term]
+            if docs.pop(doc_id, None) is not None and not docs:
+                del self._postings[term]
+        self._total_len -= self._doc_len.pop(doc_id)
+        self._payloads.pop(doc_id, None)
+
+    def search(self, query, top_k=5):
+        """Retorna [(doc_id, score)] ordenado por relevância"""
+        with self._lock:
+            n_docs = len(self._doc_len)
+            if n_docs == 0:
+                return []
+            avg_len = self._total_len / n_docs or 1.0
+            scores = {}
+            for term in set(tokenize(query)):
+                docs = self._postings.get(term)
+                if not docs:
+                    continue
+                idf = math.log(1 + (n_docs - len(docs) + 0.5) / (len(docs) + 0.5))
+                for doc_id, tf in docs.items():
+                    norm = self.k1 * (1 - self.b + self.b * self._doc_len[doc_id] / avg_len)
+                    scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+            ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+            return ranked[:top_k]
+
+    def select_context(self, query, top_k=5, token_budget=6000):
+        """
+        Escolhe até top_k payloads relevantes cabendo em token_budget.
+        Sem nenhum termo em comum, usa os documentos indexados mais recentemente.
+        """
+        with self._lock:
+            ranked = [doc_id for doc_id, _ in self.search(query, top_k)]
+            if not ranked:
+                ranked = list(reversed(self._payloads))[:top_k]
+
+            selected, used = [], 0
+            for doc_id in ranked:
+                payload = self._payloads[doc_id]
+                cost = estimate_tokens(payload)
+                if used + cost > token_budget:
+                    if not selected:
+                        # Garante ao menos o documento mais relevante, truncado ao orçamento
+                        selected.append(payload[:token_budget * 4])
+                    break
+                selected.append(payload)
+                used += cost
+            return selected
@@ -0,0 +1,227 @@
+"""
+Coordenação das execuções do job de extração. Pedidos que chegam dentro de uma janela
+viram uma única execução e no máximo uma fica na fila atrás da que está rodando (o job
+processa todos os arquivos pendentes do volume, então uma execução atende vários pedidos).
+Um único poller acompanha o estado das execuções e publica as mudanças aos assinantes.
+Com vários workers, RunStartLock garante que só um deles inicia a execução.
+"""
+import asyncio
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: lock apenas entre as threads do processo
+    fcntl = None
+
+from backend.concurrency import run_blocking
+
+TERMINAL_STATES = ("TERMINATED", "SKIPPED", "INTERNAL_ERROR")
+
+
+def state_name(state):
+    return getattr(state, "value", state)
+
+
+class RunStartLock:
+    """
+    Início de execuções entre workers (processos): o início acontece sob um lock de arquivo
+    (fcntl) e o run_id fica em 'store' (cache compartilhado). Um worker que encontra uma
+    execução ainda ativa iniciada por outro não inicia outra: passa a acompanhar essa.
+    """
+
+    def __init__(self, path, store, get_run):
+        self.path = str(path)
+        self.store = store        # namespace do cache compartilhado (backend/shared_cache.py)
+        self.get_run = get_run    # (run_id) -> Run (jobs.get_run)
+        self._thread_lock = threading.Lock()
+
+    @contextmanager
+    def _locked(self):
+        with self._thread_lock:
+            if fcntl is None:
+                yield
+                return
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+                yield
+            finally:
+                os.close(fd)
+
+    def start(self, start_run):
+        """Run iniciado por start_run, ou o Run ainda ativo iniciado por outro worker"""
+        with self._locked():
+            last_run_id = self.store.get("last")
+            if last_run_id is not None:
+                run = self.get_run(last_run_id)
+                if run.state is None or state_name(run.state.life_cycle_state) not in TERMINAL_STATES:
+                    return run
+            run = start_run()
+            self.store.set("last", run.run_id)
+            return run
+
+
+class RunCoordinator:
+
+    def __init__(self, start_run, get_run, list_active_runs=None, on_complete=None,
+                 poll_interval=10, coalesce_window=2, history_size=20):
+        self.start_run = start_run                  # () -> Run (jobs.run_now)
+        self.get_run = get_run                      # (run_id) -> Run (jobs.get_run)
+        self.list_active_runs = list_active_runs    # () -> [Run] (execuções disparadas fora do app)
+        self.on_complete = on_complete              # (status) chamado quando uma execução termina
+        self.poll_interval = poll_interval
+        self.coalesce_window = coalesce_window
+        self.active = {}                            # run_id -> status
+        self.pending = None
+        self.finished = deque(maxlen=history_size)
+        self.subscribers = set()
+        self._poller = None
+        self._wake = None
+
+    # -------------------------------------------------------------------
+    def status(self):
+        return {
+            "active": list(self.active.values()),
+            "pending": {"requests": self.pending["requests"], "requested_at": self.pending["requested_at"]}
+                       if self.pending else None,
+            "finished": list(self.finished),
+        }
+
+    async def request(self):
+        """
+        Registra um pedido de extração. Sem execução ativa, espera a janela de agrupamento
+        e retorna o run_id iniciado; com execução ativa (inclusive uma disparada fora do app,
+        descoberta pelo poller durante a janela), o pedido fica na fila (run_id None).
+        """
+        coalesced = self.pending is not None
+        if coalesced:
+            self.pending["requests"] += 1
+        else:
+            self.pending = {"requests": 1, "requested_at": time.time(),
+                            "future": asyncio.get_running_loop().create_future()}
+            self._publish("queued", {"requests": 1})
+            self._ensure_poller()
+            if not self.active:
+                # Poller pode estar dormindo por poll_interval: passa a contar a janela de agrupamento
+                self._wake.set()
+        pending = self.pending
+
+        if not self.active:
+            # Resolvido com o run_id iniciado ou com None se o poller encontrou uma execução ativa
+            run_id = await asyncio.shield(pending["future"])
+            if run_id is not None:
+                return {"run_id": run_id, "state": "PENDING", "coalesced": coalesced}
+        return {"run_id": None, "state": "QUEUED", "coalesced": coalesced,
+                "active_run_ids": list(self.active)}
+
+    def subscribe(self):
+        """Fila de eventos para um cliente (SSE); chamar unsubscribe ao terminar"""
+        queue = asyncio.Queue(maxsize=100)
+        self.subscribers.add(queue)
+        self._ensure_poller()
+        return queue
+
+    def unsubscribe(self, queue):
+        self.subscribers.discard(queue)
+
+    # -------------------------------------------------------------------
+    def _publish(self, event, data):
+        for queue in list(self.subscribers):
+            try:
+                queue.put_nowait((event, data))
+            except asyncio.QueueFull:
+                # Cliente lento: descarta o evento mais antigo
+                queue.get_nowait()
+                queue.put_nowait((event, data))
+
+    def _ensure_poller(self):
+        if self._wake is None:
+            self._wake = asyncio.Event()
+        if self._poller is None or self._poller.done():
+            self._poller = asyncio.create_task(self._poll_loop())
+
+    def _track(self, run_id, state, started_by, requests=0):
+        status = {
+            "run_id": run_id,
+            "state": state,
+            "result_state": None,
+            "started_by": started_by,
+            "requests": requests,
+            "started_at": time.time(),
+        }
+        self.active[run_id] = status
+        self._publish("started", status)
+        return status
+
+    async def _refresh(self):
+        if self.list_active_runs is not None:
+            for run in await run_blocking("jobs", self.list_active_runs):
+                if run.run_id not in self.active:
+                    self._track(run.run_id, state_name(run.state.life_cycle_state), "trigger")
+
+        for run_id, status in list(self.active.items()):
+            run = await run_blocking("jobs", self.get_run, run_id)
+            life_cycle = state_name(run.state.life_cycle_state) if run.state else status["state"]
+            if life_cycle not in TERMINAL_STATES:
+                if life_cycle != status["state"]:
+                    status["state"] = life_cycle
+                    self._publish("state", status)
+                continue
+
+            del self.active[run_id]
+            status.update(state=life_cycle, result_state=state_name(run.state.result_state),
+                          finished_at=time.time())
+            self.finished.appendleft(status)
+            if self.on_complete is not None:
+                try:
+                    await run_blocking("warehouse", self.on_complete, status)
+                except Exception as e:
+                    print(f"⚠️ Erro ao atualizar caches após a execução {run_id}: {e}")
+            self._publish("completed", status)
+
+    async def _start_pending(self):
+        pending, self.pending = self.pending, None
+        try:
+            run = await run_blocking("jobs", self.start_run)
+        except Exception as e:
+            print(f"❌ Erro ao iniciar o job de extração: {e}")
+            if not pending["future"].done():
+                pending["future"].set_exception(e)
+            self._publish("error", {"error": str(e)})
+            return
+        # jobs.run_now retorna só o run_id; o estado vem no próximo get_run
+        self._track(run.run_id, "PENDING", "app", pending["requests"])
+        if not pending["future"].done():
+            pending["future"].set_result(run.run_id)
+
+    async def _poll_loop(self):
+        while True:
+            self._wake.clear()
+            try:
+                await self._refresh()
+            except Exception as e:
+                print(f"⚠️ Erro ao consultar execuções do job: {e}")
+
+            if self.pending is not None and self.active and not self.pending["future"].done():
+                # Execução ativa (ex.: disparada pelo file arrival do próprio upload): responde que o
+                # pedido ficou na fila em vez de prender a requisição até essa execução terminar
+                self.pending["future"].set_result(None)
+
+            timeout = self.poll_interval
+            if self.pending is not None and not self.active:
+                remaining = self.pending["requested_at"] + self.coalesce_window - time.time()
+                if remaining <= 0:
+                    await self._start_pending()
+                else:
+                    timeout = remaining
+
+            if not (self.active or self.pending or self.subscribers):
+                return
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
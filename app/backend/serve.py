@@ -0,0 +1,42 @@
+"""
+Ponto de entrada do app com vários workers do uvicorn (processos), para usar todos os
+núcleos do container (ver app.yaml):
+
+    python -m backend.serve
+
+APP_WORKERS define a quantidade de processos ('auto' = núcleos disponíveis). Estado
+compartilhado entre os processos: resultados de consultas, tokens, snapshots das métricas e
+a execução do extract em andamento em SHARED_CACHE (backend/shared_cache.py), com um lock
+de arquivo para iniciar o job (RunStartLock); áudios e PDFs em /dev/shm e no disco
+(BlobStore, PdfDiskCache).
+"""
+import os
+
+import uvicorn
+
+from backend.shared_cache import make_shared_cache
+
+
+def worker_count(value):
+    if value == "auto":
+        if hasattr(os, "sched_getaffinity"):
+            return len(os.sched_getaffinity(0))
+        return os.cpu_count() or 1
+    return max(1, int(value))
+
+
+def main():
+    workers = worker_count(os.getenv("APP_WORKERS", "1"))
+    # Databricks Apps informa a porta em DATABRICKS_APP_PORT; UVICORN_* segue a convenção do CLI
+    port = int(os.getenv("UVICORN_PORT") or os.getenv("DATABRICKS_APP_PORT") or "8000")
+    host = os.getenv("UVICORN_HOST") or ("0.0.0.0" if os.getenv("DATABRICKS_APP_PORT") else "127.0.0.1")
+
+    # Entradas de uma execução anterior podem ter sido gravadas por outra versão do app
+    make_shared_cache(os.getenv("SHARED_CACHE", "auto")).clear()
+
+    print(f"🚀 Iniciando uvicorn com {workers} worker(s) em {host}:{port}")
+    uvicorn.run("backend.main:app", host=host, port=port, workers=workers)
+
+
+if __name__ == "__main__":
+    main()
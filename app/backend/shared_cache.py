@@ -0,0 +1,243 @@
+"""
+Cache compartilhado entre os workers do uvicorn (processos) para resultados de consultas
+e tokens. Usa um arquivo SQLite (WAL) em /dev/shm, portanto em memória e visível a todos
+os processos do container; sem /dev/shm (ex.: desenvolvimento local) cai para um cache
+em processo com a mesma interface. Os blobs (áudios) já são compartilhados por BlobStore.
+"""
+import os
+import pickle
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+
+def _usable_dir(path):
+    try:
+        path.mkdir(parents=True, exist_ok=True)
+        return os.access(path, os.W_OK)
+    except OSError:
+        return False
+
+
+class LocalCache:
+    """Cache LRU em memória com expiração por entrada (thread-safe, apenas neste processo)"""
+
+    shared = False
+
+    def __init__(self, maxsize=10000):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return default
+            expires_at, value = item
+            if expires_at < time.time():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl, namespace=None, maxsize=None):
+        # Em processo o limite por namespace já é o maxsize da instância (ver namespace())
+        with self._lock:
+            self._data[key] = (time.time() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self, prefix=""):
+        with self._lock:
+            for key in [key for key in self._data if key.startswith(prefix)]:
+                del self._data[key]
+
+    def count(self, prefix=""):
+        with self._lock:
+            return sum(1 for key in self._data if key.startswith(prefix))
+
+    def items(self, prefix=""):
+        now = time.time()
+        with self._lock:
+            return [(key, value) for key, (expires_at, value) in self._data.items()
+                    if key.startswith(prefix) and expires_at >= now]
+
+    def namespace(self, name, ttl, maxsize=None):
+        # Em processo cada namespace tem o seu próprio limite de entradas
+        return CacheNamespace(LocalCache(maxsize or self.maxsize), name, ttl)
+
+
+class SqliteCache:
+    """
+    Cache chave/valor em um arquivo SQLite compartilhado pelos processos. Valores são
+    serializados com pickle; entradas expiradas são ignoradas na leitura e removidas
+    periodicamente. Cada namespace pode ter o seu limite de entradas, aplicado por LRU
+    (a leitura atualiza accessed_at); acima de 'maxsize' no arquivo inteiro saem primeiro
+    as menos usadas.
+    """
+
+    shared = True
+
+    def __init__(self, path, maxsize=10000, evict_every=200):
+        self.path = str(path)
+        self.maxsize = maxsize
+        self.evict_every = evict_every
+        self._local = threading.local()
+        self._writes = 0
+        # Guarda tokens: somente o usuário do app lê o arquivo. Criado com 0600 antes do WAL,
+        # pois o SQLite cria -wal e -shm com as permissões do banco
+        os.close(os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600))
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(self.path + suffix):
+                os.chmod(self.path + suffix, 0o600)
+        conn = self._conn()
+        columns = [row[1] for row in conn.execute("PRAGMA table_info(cache)")]
+        if columns and "accessed_at" not in columns:
+            # Arquivo de uma versão anterior (sem LRU): as entradas são descartáveis
+            conn.execute("DROP TABLE cache")
+        conn.execute("""CREATE TABLE IF NOT EXISTS cache (
+                            key TEXT PRIMARY KEY,
+                            value BLOB,
+                            expires_at REAL,
+                            namespace TEXT,
+                            accessed_at REAL
+                        )""")
+        conn.execute("CREATE INDEX IF NOT EXISTS cache_lru ON cache (namespace, accessed_at)")
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=OFF")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key, default=None):
+        conn = self._conn()
+        now = time.time()
+        row = conn.execute("SELECT value, expires_at FROM cache WHERE key = ?", (key,)).fetchone()
+        if row is None or row[1] < now:
+            return default
+        try:
+            value = pickle.loads(row[0])
+        except Exception:
+            # Gravado por outra versão do app (ex.: classe alterada): trata como ausente
+            return default
+        conn.execute("UPDATE cache SET accessed_at = ? WHERE key = ?", (now, key))
+        return value
+
+    def set(self, key, value, ttl, namespace=None, maxsize=None):
+        data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        now = time.time()
+        conn = self._conn()
+        conn.execute("""INSERT OR REPLACE INTO cache (key, value, expires_at, namespace, accessed_at)
+                        VALUES (?, ?, ?, ?, ?)""", (key, data, now + ttl, namespace or "", now))
+        if maxsize:
+            # Menos usadas do namespace além do limite (o índice cache_lru evita ordenar a tabela)
+            conn.execute("""DELETE FROM cache WHERE key IN (
+                                SELECT key FROM cache WHERE namespace = ? ORDER BY accessed_at DESC
+                                 LIMIT -1 OFFSET ?)""", (namespace or "", maxsize))
+        self._writes += 1
+        if self._writes % self.evict_every == 0:
+            self.evict()
+
+    def pop(self, key):
+        self._conn().execute("DELETE FROM cache WHERE key = ?", (key,))
+
+    def clear(self, prefix=""):
+        self._conn().execute("DELETE FROM cache WHERE substr(key, 1, ?) = ?", (len(prefix), prefix))
+
+    def count(self, prefix=""):
+        return self._conn().execute("SELECT COUNT(*) FROM cache WHERE substr(key, 1, ?) = ? AND expires_at >= ?",
+                                    (len(prefix), prefix, time.time())).fetchone()[0]
+
+    def items(self, prefix=""):
+        rows = self._conn().execute("SELECT key, value FROM cache WHERE substr(key, 1, ?) = ? AND expires_at >= ?",
+                                    (len(prefix), prefix, time.time())).fetchall()
+        result = []
+        for key, data in rows:
+            try:
+                result.append((key, pickle.loads(data)))
+            except Exception:
+                continue
+        return result
+
+    def evict(self):
+        conn = self._conn()
+        conn.execute("DELETE FROM cache WHERE expires_at < ?", (time.time(),))
+        conn.execute("""DELETE FROM cache WHERE key IN (
+                            SELECT key FROM cache ORDER BY accessed_at
+                             LIMIT MAX(0, (SELECT COUNT(*) FROM cache) - ?))""", (self.maxsize,))
+
+    def namespace(self, name, ttl, maxsize=None):
+        # Compartilhado: o limite do namespace é aplicado no próprio arquivo
+        return CacheNamespace(self, name, ttl, maxsize)
+
+
+class CacheNamespace:
+    """Visão de um cache com prefixo de chave, TTL e limite de entradas (mesma interface do TTLCache antigo)"""
+
+    def __init__(self, cache, name, ttl, maxsize=None):
+        self.cache = cache
+        self.name = name
+        self.prefix = f"{name}:"
+        self.ttl = ttl
+        self.maxsize = maxsize
+
+    def get(self, key, default=None):
+        return self.cache.get(self.prefix + key, default)
+
+    def set(self, key, value, ttl=None):
+        self.cache.set(self.prefix + key, value, self.ttl if ttl is None else ttl,
+                       namespace=self.name, maxsize=self.maxsize)
+
+    def pop(self, key):
+        self.cache.pop(self.prefix + key)
+
+    def clear(self):
+        self.cache.clear(self.prefix)
+
+    def items(self):
+        return [(key[len(self.prefix):], value) for key, value in self.cache.items(self.prefix)]
+
+    def __len__(self):
+        return self.cache.count(self.prefix)
+
+
+def shared_directory():
+    """/dev/shm (memória, visível a todos os processos do container) ou None se indisponível"""
+    shm = Path("/dev/shm")
+    return shm if shm.is_dir() and _usable_dir(shm) else None
+
+
+def make_shared_cache(backend="auto", name="contract-app-cache", maxsize=10000):
+    """
+    'sqlite': arquivo em /dev/shm (ou no diretório temporário); 'local': em processo;
+    'auto': SQLite se /dev/shm existir, senão em processo.
+    """
+    if backend == "local":
+        return LocalCache(maxsize)
+
+    directory = shared_directory()
+    if directory is None:
+        if backend != "sqlite":
+            return LocalCache(maxsize)
+        directory = Path(tempfile.gettempdir())
+
+    try:
+        return SqliteCache(directory / f"{name}.sqlite3", maxsize=maxsize)
+    except (sqlite3.Error, OSError) as e:
+        if backend == "sqlite":
+            raise
+        print(f"⚠️ Cache compartilhado indisponível ({e}), usando cache em processo")
+        return LocalCache(maxsize)
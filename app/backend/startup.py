@@ -0,0 +1,68 @@
+"""
+Inicialização rápida do app: módulos pesados (SDK Databricks, mlflow, pandas, pyarrow)
+são importados só no primeiro uso, e o aquecimento dos clientes roda em segundo plano
+enquanto o uvicorn já atende. Os tempos de import e de cada etapa ficam em TIMINGS.
+"""
+import importlib
+import importlib.util
+import threading
+import time
+from contextlib import contextmanager
+
+from backend import metrics
+
+STARTUP_SECONDS = metrics.Gauge("contract_app_startup_seconds",
+                                "Seconds spent importing modules and warming up clients at startup", ("step",))
+
+TIMINGS = {}
+_import_lock = threading.RLock()
+
+
+def record(step, seconds):
+    TIMINGS[step] = round(seconds, 4)
+    STARTUP_SECONDS.set(seconds, step=step)
+
+
+@contextmanager
+def timed(step):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(step, time.perf_counter() - start)
+
+
+class LazyModule:
+    """Proxy de um módulo: o import acontece no primeiro acesso a um atributo"""
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def _load(self):
+        if self._module is None:
+            with _import_lock:
+                if self._module is None:
+                    with timed(f"import {self._name}"):
+                        self._module = importlib.import_module(self._name)
+        return self._module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __repr__(self):
+        return f"<lazy module '{self._name}' ({'loaded' if self._module is not None else 'not loaded'})>"
+
+
+def lazy_import(name, optional=False):
+    """LazyModule para 'name'; com optional=True retorna None se o pacote não estiver instalado"""
+    if optional and importlib.util.find_spec(name.split(".")[0]) is None:
+        return None
+    return LazyModule(name)
+
+
+def preload(*modules):
+    """Força o import (usado pelo aquecimento em segundo plano)"""
+    for module in modules:
+        if isinstance(module, LazyModule):
+            module._load()
@@ -0,0 +1,173 @@
+"""
+Transcrição de áudio em segmentos. O áudio é dividido em trechos decodificáveis
+de forma independente (quadros MP3 ou blocos PCM de WAV) conforme chega, e cada
+trecho é transcrito por um backend plugável: o serving endpoint configurado em
+AUDIO_ENDPOINT ou um modelo local em CPU (faster-whisper), útil offline e em testes.
+"""
+import base64
+import struct
+
+from backend import metrics
+
+
+# =======================================================================
+# Segmentação
+# =======================================================================
+class Segmenter:
+    """Sem conhecimento do formato: entrega o áudio inteiro ao final"""
+
+    def __init__(self, segment_bytes):
+        self.segment_bytes = segment_bytes
+        self._buffer = bytearray()
+
+    def feed(self, chunk):
+        self._buffer += chunk
+        return []
+
+    def flush(self):
+        data, self._buffer = bytes(self._buffer), bytearray()
+        return [data] if data else []
+
+
+class Mp3Segmenter(Segmenter):
+    """Corta em sincronismo de quadro MP3 (0xFFE) depois de segment_bytes"""
+
+    def feed(self, chunk):
+        self._buffer += chunk
+        segments = []
+        while len(self._buffer) > self.segment_bytes:
+            cut = self._find_frame_sync(self.segment_bytes)
+            if cut is None:
+                break
+            segments.append(bytes(self._buffer[:cut]))
+            del self._buffer[:cut]
+        return segments
+
+    def _find_frame_sync(self, start):
+        buf = self._buffer
+        pos = buf.find(b"\xff", start)
+        while pos != -1 and pos + 1 < len(buf):
+            if buf[pos + 1] & 0xE0 == 0xE0:
+                return pos
+            pos = buf.find(b"\xff", pos + 1)
+        return None
+
+
+class WavSegmenter(Segmenter):
+    """Divide os dados PCM em blocos alinhados e recria o cabeçalho RIFF de cada segmento"""
+
+    def __init__(self, segment_bytes):
+        super().__init__(segment_bytes)
+        self._fmt = None
+        self._block_align = 1
+
+    def _parse_header(self):
+        buf = bytes(self._buffer)
+        if len(buf) < 12 or buf[:4] != b"RIFF" or buf[8:12] != b"WAVE":
+            return False
+        pos = 12
+        while pos + 8 <= len(buf):
+            chunk_id, size = buf[pos:pos + 4], struct.unpack("<I", buf[pos + 4:pos + 8])[0]
+            if chunk_id == b"fmt ":
+                if pos + 8 + size > len(buf):
+                    return False
+                self._fmt = buf[pos + 8:pos + 8 + size]
+                self._block_align = max(struct.unpack("<H", self._fmt[12:14])[0], 1)
+            elif chunk_id == b"data":
+                if self._fmt is None:
+                    return False
+                del self._buffer[:pos + 8]
+                return True
+            pos += 8 + size + (size & 1)
+        return False
+
+    def _wrap(self, pcm):
+        fmt_chunk = b"fmt " + struct.pack("<I", len(self._fmt)) + self._fmt
+        data_chunk = b"data" + struct.pack("<I", len(pcm)) + pcm
+        return b"RIFF" + struct.pack("<I", 4 + len(fmt_chunk) + len(data_chunk)) + b"WAVE" + fmt_chunk + data_chunk
+
+    def feed(self, chunk):
+        self._buffer += chunk
+        if self._fmt is None and not self._parse_header():
+            return []
+        size = self.segment_bytes - self.segment_bytes % self._block_align
+        segments = []
+        while len(self._buffer) >= size:
+            segments.append(self._wrap(bytes(self._buffer[:size])))
+            del self._buffer[:size]
+        return segments
+
+    def flush(self):
+        if self._fmt is None:
+            return super().flush()
+        pcm, self._buffer = bytes(self._buffer), bytearray()
+        pcm = pcm[:len(pcm) - len(pcm) % self._block_align]
+        return [self._wrap(pcm)] if pcm else []
+
+
+def make_segmenter(content_type, segment_bytes=256 * 1024):
+    content_type = (content_type or "").split(";")[0].strip().lower()
+    if content_type in ("audio/mpeg", "audio/mp3"):
+        return Mp3Segmenter(segment_bytes)
+    if content_type in ("audio/wav", "audio/x-wav", "audio/wave"):
+        return WavSegmenter(segment_bytes)
+    return Segmenter(segment_bytes)
+
+
+# =======================================================================
+# Backends de transcrição
+# =======================================================================
+class ServingEndpointTranscriber:
+    """Whisper (ou compatível) publicado como serving endpoint"""
+
+    def __init__(self, endpoint, get_client):
+        self.endpoint = endpoint
+        self.get_client = get_client
+
+    def transcribe(self, audio, content_type=None):
+        encoded = base64.b64encode(audio).decode("ascii")
+        with metrics.span("serving_query_audio"):
+            response = self.get_client().serving_endpoints.query(name=self.endpoint, inputs=[encoded])
+        predictions = response.predictions or []
+        if not predictions:
+            return ""
+        first = predictions[0]
+        return first.get("text", "") if isinstance(first, dict) else str(first)
+
+
+class LocalTranscriber:
+    """Modelo faster-whisper em CPU, carregado na primeira chamada"""
+
+    def __init__(self, model_size="tiny", language="pt"):
+        self.model_size = model_size
+        self.language = language
+        self._model = None
+
+    @staticmethod
+    def available():
+        try:
+            import faster_whisper  # noqa: F401
+            return True
+        except ImportError:
+            return False
+
+    def transcribe(self, audio, content_type=None):
+        import io
+        if self._model is None:
+            from faster_whisper import WhisperModel
+            self._model = WhisperModel(self.model_size, device="cpu", compute_type="int8")
+        with metrics.span("local_whisper"):
+            segments, _ = self._model.transcribe(io.BytesIO(audio), language=self.language)
+            return " ".join(segment.text.strip() for segment in segments)
+
+
+def make_transcriber(backend, audio_endpoint, get_client, local_model="tiny"):
+    """
+    backend: 'endpoint', 'local' ou 'auto' (endpoint se AUDIO_ENDPOINT estiver
+    configurado, senão modelo local se instalado). Retorna None se nenhum estiver disponível.
+    """
+    if backend in ("endpoint", "auto") and audio_endpoint:
+        return ServingEndpointTranscriber(audio_endpoint, get_client)
+    if backend in ("local", "auto") and LocalTranscriber.available():
+        return LocalTranscriber(local_model)
+    return None
@@ -0,0 +1,117 @@
+"""
+Leitura em streaming de uploads multipart: cada arquivo é gravado em disco local
+em blocos enquanto o MD5 é calculado, sem manter o arquivo inteiro em memória.
+"""
+import hashlib
+import os
+import tempfile
+
+try:
+    from python_multipart.multipart import MultipartParser, parse_options_header
+except ImportError:  # python-multipart < 0.0.13
+    from multipart.multipart import MultipartParser, parse_options_header
+
+
+class UploadedPart:
+    """Um arquivo recebido: nome, caminho temporário, MD5 e tamanho"""
+
+    def __init__(self, filename, spool_dir=None):
+        self.filename = filename
+        fd, self.temp_path = tempfile.mkstemp(prefix="upload-", suffix=".part", dir=spool_dir)
+        self._file = os.fdopen(fd, "wb")
+        self._md5 = hashlib.md5()
+        self.size = 0
+        self.md5 = None
+
+    def write(self, data):
+        self._file.write(data)
+        self._md5.update(data)
+        self.size += len(data)
+
+    def close(self):
+        self._file.close()
+        self.md5 = self._md5.hexdigest()
+
+    def open(self):
+        return open(self.temp_path, "rb")
+
+    def discard(self):
+        if not self._file.closed:
+            self._file.close()
+        try:
+            os.remove(self.temp_path)
+        except FileNotFoundError:
+            pass
+
+
+def safe_filename(filename):
+    """Somente o nome do arquivo, sem diretórios vindos do cliente"""
+    name = os.path.basename((filename or "").replace("\\", "/")).strip()
+    return name if name not in ("", ".", "..") else None
+
+
+async def receive_uploads(request, spool_dir=None):
+    """
+    Consome o corpo multipart da requisição em streaming e retorna a lista de
+    UploadedPart (um por arquivo enviado, qualquer que seja o nome do campo).
+    """
+    _, params = parse_options_header(request.headers.get("content-type", ""))
+    boundary = params.get(b"boundary")
+    if not boundary:
+        raise ValueError("multipart boundary not found")
+
+    parts = []
+    state = {"part": None, "field": b"", "value": b"", "headers": {}}
+
+    def on_part_begin():
+        state["part"] = None
+        state["headers"] = {}
+
+    def on_header_field(data, start, end):
+        state["field"] += data[start:end]
+
+    def on_header_value(data, start, end):
+        state["value"] += data[start:end]
+
+    def on_header_end():
+        state["headers"][state["field"].lower()] = state["value"]
+        state["field"], state["value"] = b"", b""
+
+    def on_headers_finished():
+        _, options = parse_options_header(state["headers"].get(b"content-disposition", b""))
+        filename = options.get(b"filename")
+        if filename is not None:
+            name = safe_filename(filename.decode("utf-8", errors="replace"))
+            if name:
+                state["part"] = UploadedPart(name, spool_dir)
+                parts.append(state["part"])
+
+    def on_part_data(data, start, end):
+        if state["part"] is not None:
+            state["part"].write(data[start:end])
+
+    def on_part_end():
+        if state["part"] is not None:
+            state["part"].close()
+            state["part"] = None
+
+    parser = MultipartParser(boundary, {
+        "on_part_begin": on_part_begin,
+        "on_header_field": on_header_field,
+        "on_header_value": on_header_value,
+        "on_header_end": on_header_end,
+        "on_headers_finished": on_headers_finished,
+        "on_part_data": on_part_data,
+        "on_part_end": on_part_end,
+    })
+
+    try:
+        async for chunk in request.stream():
+            parser.write(chunk)
+        parser.finalize()
+    except Exception:
+        for part in parts:
+            part.discard()
+        raise
+
+    return parts
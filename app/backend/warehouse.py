@@ -0,0 +1,131 @@
+"""
+Leitura de resultados do SQL Warehouse (Statement Execution API) bloco a bloco.
+Com pyarrow instalado o resultado vem em Arrow por EXTERNAL_LINKS e cada link é
+baixado e convertido em lotes; sem pyarrow usa JSON inline. Nos dois casos todos os
+blocos são seguidos via next_chunk_index e a memória depende do bloco, não do resultado.
+"""
+import time
+from datetime import date, datetime
+
+import requests
+
+from backend import metrics
+from backend.startup import lazy_import
+
+# Importar o SDK carrega todos os serviços (~1s): adiado até a primeira statement
+sql_service = lazy_import("databricks.sdk.service.sql")
+arrow_ipc = lazy_import("pyarrow.ipc", optional=True)
+
+RUNNING_STATES = ("PENDING", "RUNNING")
+
+
+def to_text(value):
+    """Mesma representação do formato JSON_ARRAY (tudo texto), para o frontend não perceber a troca"""
+    if value is None or isinstance(value, str):
+        return value
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return str(value)
+
+
+class StatementResult:
+    """Resultado de uma statement já concluída; batches() percorre todos os blocos"""
+
+    def __init__(self, reader, response):
+        self.reader = reader
+        self.statement_id = response.statement_id
+        self.columns = [col.name for col in response.manifest.schema.columns] if response.manifest else []
+        self.total_rows = response.manifest.total_row_count if response.manifest else None
+        self._first = response.result
+
+    def batches(self):
+        """Gera listas de registros (dict coluna -> texto), um lote por bloco / record batch"""
+        result = self._first
+        while result is not None:
+            links = result.external_links or []
+            if links:
+                for link in links:
+                    yield from self.reader.read_arrow_link(link.external_link, self.columns)
+                next_index = links[-1].next_chunk_index
+            else:
+                rows = result.data_array or []
+                if rows:
+                    yield [dict(zip(self.columns, row)) for row in rows]
+                next_index = result.next_chunk_index
+            if next_index is None:
+                break
+            with metrics.span("get_statement_result_chunk"):
+                result = self.reader.client().statement_execution.get_statement_result_chunk_n(
+                    self.statement_id, next_index
+                )
+
+    def rows(self):
+        for batch in self.batches():
+            yield from batch
+
+    def fetch_all(self):
+        return list(self.rows())
+
+
+class StatementReader:
+
+    def __init__(self, get_client, warehouse_id, catalog, schema, http_session=None,
+                 use_arrow=None, poll_interval=0.5, download_timeout=60):
+        self.client = get_client
+        self.warehouse_id = warehouse_id
+        self.catalog = catalog
+        self.schema = schema
+        self.http_session = http_session
+        self.use_arrow = arrow_ipc is not None if use_arrow is None else use_arrow
+        self.poll_interval = poll_interval
+        self.download_timeout = download_timeout
+
+    def execute(self, statement, parameters=None):
+        """Executa a statement, espera terminar e retorna um StatementResult"""
+        if self.use_arrow:
+            disposition, result_format = sql_service.Disposition.EXTERNAL_LINKS, sql_service.Format.ARROW_STREAM
+        else:
+            disposition, result_format = sql_service.Disposition.INLINE, sql_service.Format.JSON_ARRAY
+
+        statement_execution = self.client().statement_execution
+        with metrics.span("execute_statement"):
+            response = statement_execution.execute_statement(
+                warehouse_id=self.warehouse_id,
+                statement=statement,
+                catalog=self.catalog,
+                schema=self.schema,
+                parameters=parameters,
+                disposition=disposition,
+                format=result_format,
+                wait_timeout="30s",
+            )
+            while response.status and response.status.state and response.status.state.value in RUNNING_STATES:
+                time.sleep(self.poll_interval)
+                response = statement_execution.get_statement(response.statement_id)
+
+        state = response.status.state if response.status else None
+        if state is not None and state != sql_service.StatementState.SUCCEEDED:
+            error = response.status.error
+            raise RuntimeError(f"Statement {state.value}: {error.message if error else 'sem detalhes'}")
+        return StatementResult(self, response)
+
+    def read_arrow_link(self, url, columns):
+        """Baixa um link pré-assinado (sem header de autenticação) e lê o stream Arrow lote a lote"""
+        session = self.http_session or requests
+        with metrics.span("external_link_download"):
+            response = session.get(url, stream=True, timeout=self.download_timeout)
+        try:
+            response.raise_for_status()
+            response.raw.decode_content = True
+            reader = arrow_ipc.open_stream(response.raw)
+            for record_batch in reader:
+                names = columns or record_batch.schema.names
+                values = [record_batch.column(i).to_pylist() for i in range(record_batch.num_columns)]
+                yield [
+                    {name: to_text(column[row]) for name, column in zip(names, values)}
+                    for row in range(record_batch.num_rows)
+                ]
+        finally:
+            response.close()
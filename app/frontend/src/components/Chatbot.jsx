@@ -330,6 +330,12 @@ function Chatbot({ open, onClose }) {
   const [isResizing, setIsResizing] = useState(false);
   const resizeStartX = useRef(0);
   const startWidth = useRef(chatWidth);
+  const streamAbortRef = useRef(null);
+
+  // Fechar o chat interrompe a resposta em streaming
+  useEffect(() => () => {
+    if (streamAbortRef.current) streamAbortRef.current.abort();
+  }, []);
 
   if (conversationId && conversationId.length === 0) {
     setConversationId("0")
@@ -439,41 +445,49 @@ function Chatbot({ open, onClose }) {
       }
     };
 
+    // Envia o MP3 binário para /chat_audio/stream: o backend transcreve enquanto recebe
+    // e responde a pergunta transcrita, que entra no chat como mensagem do usuário
     const stopRecording = async () => {
-      if (recorder) {
-        try {
-          const [buffer, blob] = await recorder.stop().getMp3();
-          const reader = new FileReader();
-          
-          reader.onloadend = async () => {
-            const base64Audio = reader.result;
-            try {
-              setLoading(true);
-              const response = await axios.post(`${process.env.REACT_APP_API_URL}/chat_audio/`, {
-                audio: base64Audio,
-                chat_history: messages.map((msg) => [msg.text, msg.fromUser ? "user" : "bot"])
-              });
-              
-              const transcription = response.data.response;
-              setMessages((prevMessages) => [
-                ...prevMessages,
-                { text: "", fromUser: true },
-              ]);
-              simulateStreamingResponse(transcription, true);
-              
-            } catch (error) {
-              console.error("Error with audio:", error);
-              setLoading(false);
-            }
-          };
-          
-          reader.readAsDataURL(blob);
-          setIsRecording(false);
-        } catch (e) {
-          console.error("Failed to stop recording", e);
-          setIsRecording(false);
-        }
+      if (!recorder) return;
+      setIsRecording(false);
+
+      let blob;
+      try {
+        [, blob] = await recorder.stop().getMp3();
+      } catch (e) {
+        console.error("Failed to stop recording", e);
+        return;
       }
+
+      setMessages((prevMessages) => [
+        ...prevMessages,
+        { text: "🎤 ...", fromUser: true },
+        { text: "", fromUser: false },
+      ]);
+      setLoading(true);
+
+      try {
+        const response = await fetch(`${process.env.REACT_APP_API_URL}/chat_audio/stream`, {
+          method: "POST",
+          headers: { "Content-Type": blob.type || "audio/mpeg" },
+          body: blob,
+        });
+        if (!response.ok) throw new Error(`HTTP ${response.status}`);
+        const data = await response.json();
+
+        // Sem transcrição, fica apenas o aviso do backend
+        setMessages((prevMessages) => [
+          ...prevMessages.slice(0, -2),
+          ...(data.transcription ? [{ text: "🎤 " + data.transcription, fromUser: true }] : []),
+          { text: "", fromUser: false },
+        ]);
+        simulateStreamingResponse(data.response || "", false);
+        return;
+      } catch (error) {
+        console.error("Error with audio:", error);
+        showBotAnswer("⚠️ Não foi possível enviar o áudio. Tente novamente ou use o chat de texto.");
+      }
+      setLoading(false);
     };
 
     return (
@@ -488,35 +502,109 @@ function Chatbot({ open, onClose }) {
     );
   };
 
+  // Substitui o texto da última mensagem (resposta do bot sendo gerada)
+  const showBotAnswer = (text) => {
+    setMessages((prevMessages) => [
+      ...prevMessages.slice(0, -1),
+      { text, fromUser: false },
+    ]);
+  };
+
+  // Lê a resposta de /chat/stream (server-sent events) e mostra cada trecho assim que chega.
+  // Retorna false se o streaming não pôde ser aberto (o chamador usa /chat/).
+  const streamChatAnswer = async (text, chatHistory) => {
+    const controller = new AbortController();
+    streamAbortRef.current = controller;
+
+    let response;
+    try {
+      response = await fetch(`${process.env.REACT_APP_API_URL}/chat/stream`, {
+        method: "POST",
+        headers: { "Content-Type": "application/json", Accept: "text/event-stream" },
+        body: JSON.stringify({ text, chat_history: chatHistory }),
+        signal: controller.signal,
+      });
+    } catch (error) {
+      if (error.name === "AbortError") return true;
+      throw error;
+    }
+    if (!response.ok || !response.body) return false;
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = "";
+    let answer = "";
+
+    try {
+      while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+
+        let boundary;
+        while ((boundary = buffer.indexOf("\n\n")) !== -1) {
+          const rawEvent = buffer.slice(0, boundary);
+          buffer = buffer.slice(boundary + 2);
+
+          let eventName = "message";
+          let data = "";
+          rawEvent.split("\n").forEach((line) => {
+            if (line.startsWith("event:")) eventName = line.slice(6).trim();
+            else if (line.startsWith("data:")) data += line.slice(5).trim();
+          });
+          if (!data) continue;
+
+          const payload = JSON.parse(data);
+          if (eventName === "error") {
+            showBotAnswer(payload.error);
+            return true;
+          }
+          if (eventName === "done") {
+            showBotAnswer(payload.response);
+            scrollToBottom();
+            return true;
+          }
+          if (payload.delta) {
+            answer += payload.delta;
+            showBotAnswer(answer);
+            scrollToBottom();
+          }
+        }
+      }
+    } catch (error) {
+      if (error.name !== "AbortError") throw error;
+    }
+    return true;
+  };
+
   const handleSend = async () => {
     if (input.trim() === "") return;
     
-    const newMessages = [...messages, { text: input, fromUser: true }];
-    setMessages(newMessages);
+    const text = input;
+    const chatHistory = messages.map((msg) => [msg.text, msg.fromUser ? "user" : "bot"]);
+    setMessages([...messages, { text, fromUser: true }, { text: "", fromUser: false }]);
     setInput("");
     setLoading(true);
 
     try {
-      const response = await axios.post(`${process.env.REACT_APP_API_URL}/chat/`, {
-        text: input,
-        chat_history: messages.map((msg) => [msg.text, msg.fromUser ? "user" : "bot"])
-      });
-  
-      const botResponse = response.data.response;
-      setMessages((prevMessages) => [
-        ...prevMessages,
-        { text: "", fromUser: false },
-      ]);
-  
-      simulateStreamingResponse(botResponse, false);
-    
+      const streamed = await streamChatAnswer(text, chatHistory);
+      if (!streamed) {
+        const response = await axios.post(`${process.env.REACT_APP_API_URL}/chat/`, {
+          text,
+          chat_history: chatHistory
+        });
+        simulateStreamingResponse(response.data.response, false);
+        return;
+      }
     } catch (error) {
       console.error("Error sending message:", error);
-      setLoading(false);
     }
+    setLoading(false);
   };
 
   const handleClear = () => {
+    // Interrompe a geração em andamento (o backend cancela a chamada ao endpoint)
+    if (streamAbortRef.current) streamAbortRef.current.abort();
     setMessages([]);
     setSuggestion(null);
   };
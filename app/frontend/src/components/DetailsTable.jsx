@@ -123,10 +123,15 @@ function DetailsTable() {
     formData.append('file', selectedFile);
 
     try {
-      await api.post("/api/upload", formData, {
+      const response = await api.post("/api/upload", formData, {
         headers: { 'Content-Type': 'multipart/form-data' }
       });
-      showNotification('✅ PDF carregado com sucesso! O processamento pode levar de 2 a 5 minutos.', 'success');
+      const files = response.data?.files || [];
+      if (files.length > 0 && files.every((file) => file.status === 'duplicate')) {
+        showNotification(`ℹ️ Este arquivo já foi carregado (${files[0].duplicate_of}).`, 'info');
+      } else {
+        showNotification('✅ PDF carregado com sucesso! O processamento pode levar de 2 a 5 minutos.', 'success');
+      }
       setSelectedFile(null);
       
       // Reload data after 2 seconds
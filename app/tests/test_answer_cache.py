@@ -0,0 +1,67 @@
+from backend.answer_cache import AnswerCache, cosine, fingerprint, local_embedding
+
+VECTORS = {"valor total": [3.0, 4.0], "quanto custa": [4.0, 3.0], "multa": [0.0, 1.0]}
+
+
+def dense_cache(**kwargs):
+    return AnswerCache(embed=lambda question: VECTORS[question], **kwargs)
+
+
+def test_same_question_after_normalization_hits():
+    cache = AnswerCache()
+    cache.store("Qual é o valor do contrato?", "ctx", "R$ 10.000")
+    assert cache.lookup("qual o VALOR do contrato", "ctx") == "R$ 10.000"
+    assert (cache.hits, cache.misses) == (1, 0)
+
+
+def test_paraphrase_hits_at_threshold_and_misses_above_it():
+    # cos([3, 4], [4, 3]) = 24/25 = 0.96
+    cache = dense_cache(threshold=0.96)
+    cache.store("valor total", "ctx", "R$ 10.000")
+    assert cache.lookup("quanto custa", "ctx") == "R$ 10.000"
+
+    strict = dense_cache(threshold=0.961)
+    strict.store("valor total", "ctx", "R$ 10.000")
+    assert strict.lookup("quanto custa", "ctx") is None
+    assert strict.misses == 1
+
+
+def test_entries_are_keyed_by_context_fingerprint():
+    cache = dense_cache(threshold=0.5)
+    cache.store("valor total", fingerprint("contrato A", 1), "R$ 10.000")
+    assert cache.lookup("valor total", fingerprint("contrato A", 2)) is None
+    assert cache.lookup("quanto custa", fingerprint("contrato B", 1)) is None
+    assert cache.lookup("valor total", fingerprint("contrato A", 1)) == "R$ 10.000"
+
+
+def test_expired_entries_are_not_returned():
+    cache = dense_cache(ttl=-1, threshold=0.5)
+    cache.store("valor total", "ctx", "R$ 10.000")
+    assert cache.lookup("valor total", "ctx") is None
+    assert cache.lookup("quanto custa", "ctx") is None
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = dense_cache(maxsize=2, threshold=0.99)
+    cache.store("valor total", "ctx", "a")
+    cache.store("multa", "ctx", "b")
+    assert cache.lookup("valor total", "ctx") == "a"
+    cache.store("quanto custa", "ctx", "c")
+    assert len(cache) == 2
+    assert cache.lookup("multa", "ctx") is None
+    assert cache.lookup("valor total", "ctx") == "a"
+
+
+def test_embedding_errors_fall_back_to_local_vectors():
+    def broken(question):
+        raise RuntimeError("endpoint down")
+
+    cache = AnswerCache(embed=broken, threshold=0.5)
+    cache.store("valor do contrato", "ctx", "R$ 10.000")
+    assert cache.lookup("valor contrato", "ctx") == "R$ 10.000"
+
+
+def test_cosine_sparse_and_dense():
+    assert cosine(local_embedding("valor contrato"), local_embedding("valor contrato")) > 0.999
+    assert cosine([1.0, 0.0], [0.0, 1.0]) == 0.0
+    assert cosine({}, {"a": 1}) == 0.0
@@ -0,0 +1,82 @@
+import os
+import time
+
+import pytest
+
+from backend.blob_store import BlobStore, BlobTooLarge
+
+
+@pytest.fixture
+def store(tmp_path):
+    return BlobStore(memory_max_bytes=100, disk_max_bytes=1000, spill_bytes=50, ttl=60,
+                     disk_dir=tmp_path / "disk", memory_dir=tmp_path / "memory")
+
+
+def age(store, blob_id, seconds):
+    path = store.path(blob_id)
+    old = time.time() - seconds
+    os.utime(path, (old, old))
+
+
+def test_small_blobs_stay_in_memory_and_large_ones_spill_to_disk(store):
+    small = store.put(b"x" * 50)
+    large = store.put(b"y" * 51)
+    assert store.path(small).parent == store.memory_dir
+    assert store.path(large).parent == store.disk_dir
+    assert store.get(small) == b"x" * 50
+    assert store.get(large) == b"y" * 51
+
+
+def test_blobs_expire_after_ttl(store):
+    blob_id = store.put(b"audio")
+    age(store, blob_id, 61)
+    assert store.path(blob_id) is None
+    assert store.get(blob_id) is None
+
+
+def test_each_area_keeps_its_own_budget(store):
+    memory = [store.put(b"m" * 40) for _ in range(2)]
+    age(store, memory[0], 20)
+    age(store, memory[1], 10)
+    # 120 bytes em memória com orçamento de 100: sai o mais antigo
+    memory.append(store.put(b"m" * 40))
+    assert store.get(memory[0]) is None
+    assert [store.get(blob_id) for blob_id in memory[1:]] == [b"m" * 40] * 2
+
+    disk = [store.put(b"d" * 400) for _ in range(2)]
+    age(store, disk[0], 20)
+    age(store, disk[1], 10)
+    disk.append(store.put(b"d" * 400))
+    assert store.get(disk[0]) is None
+    assert [store.get(blob_id) for blob_id in disk[1:]] == [b"d" * 400] * 2
+    # O disco cheio não remove nada da memória
+    assert [store.get(blob_id) for blob_id in memory[1:]] == [b"m" * 40] * 2
+
+
+def test_writer_publishes_only_complete_blobs(store):
+    with store.writer() as (blob_id, f):
+        f.write(b"abc")
+        assert store.get(blob_id) is None
+    assert store.get(blob_id) == b"abc"
+
+    with pytest.raises(RuntimeError):
+        with store.writer() as (failed_id, f):
+            f.write(b"abc")
+            raise RuntimeError("client disconnected")
+    assert store.get(failed_id) is None
+    assert os.listdir(store.disk_dir) == [blob_id]
+
+
+def test_writer_rejects_bodies_over_the_limit(store):
+    with pytest.raises(BlobTooLarge):
+        with store.writer() as (blob_id, f):
+            for _ in range(11):
+                f.write(b"z" * 100)
+    assert store.get(blob_id) is None
+    assert os.listdir(store.disk_dir) == []
+
+
+def test_invalid_ids_are_rejected(store):
+    with pytest.raises(ValueError):
+        store.put(b"x", blob_id="../etc/passwd")
+    assert store.path("../etc/passwd") is None
@@ -0,0 +1,72 @@
+import os
+
+import pytest
+
+# Cache em processo: os testes não criam arquivos em /dev/shm
+os.environ.setdefault("SHARED_CACHE", "local")
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+from backend import main  # noqa: E402
+
+
+class FailingTranscriber:
+    def transcribe(self, audio, content_type=None):
+        raise RuntimeError("endpoint does not accept audio")
+
+
+class EchoTranscriber:
+    def transcribe(self, audio, content_type=None):
+        return "qual o valor do contrato"
+
+
+@pytest.fixture
+def client():
+    return TestClient(main.app)
+
+
+def test_chat_audio_transcriber_error_returns_message(client, monkeypatch):
+    monkeypatch.setattr(main, "transcriber", FailingTranscriber())
+    response = client.post("/chat_audio/", json={"audio": "data:audio/mpeg;base64,AAAA", "chat_history": []})
+    assert response.status_code == 200
+    assert response.json()["response"] == main.AUDIO_FAILED_MESSAGE
+
+
+def test_chat_audio_stream_transcriber_error_returns_message(client, monkeypatch):
+    monkeypatch.setattr(main, "transcriber", FailingTranscriber())
+    monkeypatch.setattr(main, "refresh_contract_index", lambda: None)
+    response = client.post("/chat_audio/stream", content=b"\xff\xfb" + bytes(500),
+                           headers={"content-type": "audio/mpeg"})
+    assert response.status_code == 200
+    assert response.json()["transcription"] == ""
+    assert response.json()["response"] == main.AUDIO_FAILED_MESSAGE
+
+
+def test_chat_audio_stream_answers_transcribed_question(client, monkeypatch):
+    async def answer_question(message):
+        return f"resposta para: {message}"
+
+    monkeypatch.setattr(main, "transcriber", EchoTranscriber())
+    monkeypatch.setattr(main, "refresh_contract_index", lambda: None)
+    monkeypatch.setattr(main, "answer_question", answer_question)
+    response = client.post("/chat_audio/stream", content=b"\xff\xfb" + bytes(500),
+                           headers={"content-type": "audio/mpeg"})
+    body = response.json()
+    assert body["transcription"] == "qual o valor do contrato"
+    assert body["response"] == "resposta para: qual o valor do contrato"
+
+
+def test_chat_audio_stream_rejects_oversized_body(client, monkeypatch):
+    monkeypatch.setattr(main, "transcriber", EchoTranscriber())
+    monkeypatch.setattr(main, "refresh_contract_index", lambda: None)
+    monkeypatch.setattr(main, "audio_disk_max_bytes", 1000)
+
+    def body():
+        for _ in range(5):
+            yield b"\xff\xfb" + bytes(398)
+
+    # Sem Content-Length (chunked): o limite vale durante a leitura
+    response = client.post("/chat_audio/stream", content=body(), headers={"content-type": "audio/mpeg"})
+    assert response.status_code == 413
+    response = client.post("/chat_audio/stream", content=bytes(2000), headers={"content-type": "audio/mpeg"})
+    assert response.status_code == 413
@@ -0,0 +1,67 @@
+import asyncio
+import threading
+import time
+
+import anyio
+
+from backend import metrics
+from backend.concurrency import iterate_blocking, run_blocking
+
+
+def in_flight(dependency):
+    return metrics.DEPENDENCY_IN_FLIGHT._values.get((dependency,), 0)
+
+
+class SlowStream:
+    """Gerador bloqueante como o predict_stream: cada item demora 'delay' segundos"""
+
+    def __init__(self, items=100, delay=0.05):
+        self.items = items
+        self.delay = delay
+        self.closed = threading.Event()
+
+    def __call__(self):
+        try:
+            for i in range(self.items):
+                time.sleep(self.delay)
+                yield i
+        finally:
+            self.closed.set()
+
+
+def test_run_blocking_returns_result():
+    assert asyncio.run(run_blocking("test", sum, [1, 2, 3])) == 6
+    assert in_flight("test") == 0
+
+
+def test_iterate_blocking_consumes_all_items():
+    stream = SlowStream(items=3, delay=0)
+
+    async def scenario():
+        return [item async for item in iterate_blocking("test-all", stream)]
+
+    assert asyncio.run(scenario()) == [0, 1, 2]
+    assert stream.closed.wait(1)
+    assert in_flight("test-all") == 0
+
+
+def test_cancelled_consumer_closes_stream_and_releases_gauge():
+    stream = SlowStream()
+    received = []
+
+    async def consume():
+        async for item in iterate_blocking("test-cancel", stream):
+            received.append(item)
+
+    async def scenario():
+        # Mesmo mecanismo do Starlette na desconexão do cliente: cancelamento do task group
+        async with anyio.create_task_group() as group:
+            group.start_soon(consume)
+            while not received:
+                await anyio.sleep(0.01)
+            group.cancel_scope.cancel()
+
+    asyncio.run(scenario())
+    assert in_flight("test-cancel") == 0
+    assert stream.closed.wait(1)
+    assert len(received) < stream.items
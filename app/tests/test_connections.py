@@ -0,0 +1,75 @@
+import time
+
+from backend.connections import ConnectionPool, TokenCache
+from backend.shared_cache import LocalCache
+
+
+class Minter:
+    def __init__(self, *results):
+        self.results = list(results)
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        return self.results.pop(0)
+
+
+def test_plain_token_is_reused_for_ttl():
+    mint = Minter("a", "b")
+    cache = TokenCache(mint, ttl=60)
+    assert cache.get() == "a"
+    assert cache.get() == "a"
+    assert mint.calls == 1
+    assert 0 < cache.remaining() <= 60
+
+
+def test_expiry_from_mint_caps_the_ttl():
+    mint = Minter(("a", time.time() + 120), ("b", time.time() + 3600))
+    cache = TokenCache(mint, ttl=2700, margin=60)
+    assert cache.get() == "a"
+    assert cache.remaining() <= 60
+
+
+def test_token_about_to_expire_is_not_cached():
+    mint = Minter(("a", time.time() + 30), ("b", time.time() + 3600))
+    cache = TokenCache(mint, ttl=2700, margin=60)
+    assert cache.get() == "a"
+    assert cache.get() == "b"
+    assert mint.calls == 2
+
+
+def test_shared_store_keeps_remaining_lifetime():
+    store = LocalCache().namespace("token", 2700)
+    TokenCache(Minter(("a", time.time() + 160)), ttl=2700, store=store, margin=60).get()
+    other = TokenCache(Minter("unused"), ttl=2700, store=store, margin=60)
+    assert other.get() == "a"
+    assert other.remaining() <= 100
+
+
+def test_invalidate_drops_shared_token():
+    store = LocalCache().namespace("token", 2700)
+    mint = Minter("a", "b")
+    cache = TokenCache(mint, ttl=60, store=store)
+    cache.get()
+    cache.invalidate()
+    assert cache.get() == "b"
+
+
+class Conn:
+    closed = False
+
+    def close(self):
+        self.closed = True
+
+
+def test_pool_recycles_connections_after_callable_max_age():
+    ages = [0, 60]
+    pool = ConnectionPool(Conn, max_size=1, max_age=lambda: ages.pop(0))
+    with pool.connection() as first:
+        pass
+    with pool.connection() as second:
+        pass
+    assert second is not first and first.closed
+    with pool.connection() as third:
+        pass
+    assert third is second
@@ -0,0 +1,41 @@
+from backend import metrics
+
+
+def sample(text, line_start):
+    return [line for line in text.splitlines() if line.startswith(line_start)]
+
+
+def test_render_combines_worker_snapshots():
+    counter = metrics.Counter("test_requests_total", "test", ("route",))
+    gauge = metrics.Gauge("test_in_flight", "test")
+    histogram = metrics.Histogram("test_seconds", "test", buckets=(0.1, 1.0))
+    try:
+        counter.inc(route="/a")
+        gauge.set(2)
+        histogram.observe(0.05)
+        first = metrics.snapshot()
+        counter.inc(2, route="/a")
+        gauge.set(5)
+        histogram.observe(0.5)
+        second = metrics.snapshot()
+
+        text = metrics.render({"101": first, "102": second})
+        assert sample(text, "test_requests_total{") == ['test_requests_total{route="/a"} 4']
+        assert sample(text, "test_in_flight{") == ['test_in_flight{worker="101"} 2', 'test_in_flight{worker="102"} 5']
+        assert 'test_seconds_bucket{le="0.1"} 2' in text
+        assert 'test_seconds_bucket{le="1.0"} 3' in text
+        assert "test_seconds_count 3" in text
+    finally:
+        for metric in (counter, gauge, histogram):
+            metrics._metrics.remove(metric)
+
+
+def test_snapshot_is_a_copy():
+    histogram = metrics.Histogram("test_copy_seconds", "test", buckets=(1.0,))
+    try:
+        histogram.observe(0.5)
+        values = metrics.snapshot()["test_copy_seconds"]
+        histogram.observe(0.5)
+        assert values[()][2] == 1
+    finally:
+        metrics._metrics.remove(histogram)
@@ -0,0 +1,63 @@
+import pytest
+
+from backend.pdf_cache import PdfDiskCache, etag_matches, if_range_allows, iter_file, parse_range
+
+
+@pytest.mark.parametrize("header, expected", [
+    (None, None),
+    ("bytes=0-99", (0, 99)),
+    ("bytes=10-", (10, 999)),
+    ("bytes=-100", (900, 999)),
+    ("bytes=-5000", (0, 999)),
+    ("bytes=900-5000", (900, 999)),
+    ("bytes=5-3", None),
+    ("bytes=0-1,5-9", None),
+    ("items=0-1", None),
+    ("bytes=-", None),
+])
+def test_parse_range(header, expected):
+    assert parse_range(header, 1000) == expected
+
+
+@pytest.mark.parametrize("header", ["bytes=1000-", "bytes=2000-3000", "bytes=-0"])
+def test_parse_range_not_satisfiable(header):
+    with pytest.raises(ValueError):
+        parse_range(header, 1000)
+
+
+@pytest.mark.parametrize("header, etag, expected", [
+    ('"abc"', '"abc"', True),
+    ('"x", "abc"', '"abc"', True),
+    ('W/"abc"', '"abc"', True),
+    ("*", '"abc"', True),
+    ("*", None, True),
+    ('"x"', '"abc"', False),
+    ("", '"abc"', False),
+    ('"abc"', None, False),
+])
+def test_etag_matches(header, etag, expected):
+    assert etag_matches(header, etag) is expected
+
+
+@pytest.mark.parametrize("header, etag, expected", [
+    (None, '"abc"', True),
+    ('"abc"', '"abc"', True),
+    ('"old"', '"abc"', False),
+    ('W/"abc"', '"abc"', False),
+    ("Wed, 21 Oct 2015 07:28:00 GMT", '"abc"', False),
+    ('"abc"', None, False),
+])
+def test_if_range_allows(header, etag, expected):
+    assert if_range_allows(header, etag) is expected
+
+
+def test_disk_cache_round_trip_and_eviction(tmp_path):
+    cache = PdfDiskCache(tmp_path, max_bytes=15)
+    for name in ("a", "b"):
+        temp_path, f = cache.open_temp()
+        with f:
+            f.write(b"0123456789")
+        cache.commit(temp_path, name)
+    assert cache.get("a") is None
+    path = cache.get("b")
+    assert b"".join(iter_file(path, 2, 5, chunk_size=3)) == b"2345"
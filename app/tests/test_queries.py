@@ -0,0 +1,44 @@
+import pytest
+
+from backend.queries import QueryRegistry, expand_list, in_list_size
+
+
+@pytest.fixture
+def queries():
+    return QueryRegistry("cat", "sch")
+
+
+@pytest.mark.parametrize("count, size", [(0, 8), (1, 8), (8, 8), (9, 32), (128, 128), (129, 512), (513, 1024)])
+def test_in_list_size_uses_fixed_buckets(count, size):
+    assert in_list_size(count) == size
+
+
+def test_expand_list_pads_with_first_value():
+    items = expand_list("paths", ["a", "b"])
+    assert len(items) == 8
+    assert items[:2] == [("paths_0", "a"), ("paths_1", "b")]
+    assert {value for _, value in items[2:]} == {"a"}
+
+
+def test_expand_empty_list_matches_nothing():
+    assert {value for _, value in expand_list("paths", [])} == {None}
+
+
+def test_bind_expands_in_list_and_keeps_text_stable(queries):
+    text_3, params_3 = queries.bind("pdf_info_batch", paths=["a", "b", "c"])
+    text_5, params_5 = queries.bind("pdf_info_batch", paths=["a", "b", "c", "d", "e"])
+    assert text_3 == text_5
+    assert "e.path IN (:paths_0, :paths_1" in text_3 and ":paths_7)" in text_3
+    assert [p.value for p in params_5][:5] == ["a", "b", "c", "d", "e"]
+    assert "cat.sch.contract_extract" in text_3
+
+
+def test_bind_scalar_parameters(queries):
+    text, params = queries.bind("track_changes", start_version=3)
+    assert ":start_version" in text
+    assert (params[0].name, params[0].value, params[0].type) == ("start_version", "3", "INT")
+
+
+def test_bind_without_list_value_fails(queries):
+    with pytest.raises(ValueError):
+        queries.bind("known_hashes")
@@ -0,0 +1,63 @@
+from backend.retrieval import BM25Index, estimate_tokens, tokenize
+
+
+def index_with(*docs):
+    index = BM25Index()
+    for doc_id, text in docs:
+        index.upsert(doc_id, text, f"[{doc_id}] {text}")
+    return index
+
+
+def test_tokenize_removes_accents_and_stopwords():
+    assert tokenize("Qual é a Rescisão do contrato de Locação?") == ["rescisao", "contrato", "locacao"]
+
+
+def test_bm25_ranks_by_term_relevance():
+    index = index_with(
+        ("locacao", "contrato de locacao de imovel aluguel mensal imovel"),
+        ("servicos", "contrato de prestacao de servicos de limpeza"),
+        ("compra", "contrato de compra e venda de imovel"),
+    )
+    ranked = [doc_id for doc_id, _ in index.search("aluguel do imovel")]
+    assert ranked[0] == "locacao"
+    assert ranked[1] == "compra"
+    assert "servicos" not in ranked
+
+
+def test_rare_terms_weigh_more_than_common_ones():
+    index = index_with(("a", "contrato multa"), ("b", "contrato garantia"), ("c", "contrato"))
+    (best, best_score), *_ = index.search("contrato garantia")
+    assert best == "b"
+    assert dict(index.search("contrato"))["c"] < best_score
+
+
+def test_upsert_replaces_and_remove_deletes():
+    index = index_with(("a", "multa rescisoria"))
+    index.upsert("a", "garantia bancaria", "novo")
+    assert index.search("multa") == []
+    assert index.search("garantia")[0][0] == "a"
+    index.remove("a")
+    assert len(index) == 0 and index.search("garantia") == []
+
+
+def test_select_context_respects_token_budget():
+    index = BM25Index()
+    index.upsert("a", "multa rescisao multa", "A" * 400)   # ~100 tokens
+    index.upsert("b", "multa garantia", "B" * 400)
+    index.upsert("c", "multa", "C" * 400)
+    selected = index.select_context("multa", top_k=3, token_budget=250)
+    assert len(selected) == 2
+    assert sum(estimate_tokens(payload) for payload in selected) <= 250
+
+
+def test_select_context_truncates_oversized_top_document():
+    index = BM25Index()
+    index.upsert("big", "multa", "X" * 10000)
+    index.upsert("other", "garantia", "Y" * 40)
+    selected = index.select_context("multa", token_budget=100)
+    assert selected == ["X" * 400]
+
+
+def test_select_context_without_matches_uses_most_recent():
+    index = index_with(("old", "locacao"), ("new", "servicos"))
+    assert index.select_context("assunto desconhecido", top_k=1) == ["[new] servicos"]
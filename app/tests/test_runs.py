@@ -0,0 +1,146 @@
+import asyncio
+import multiprocessing
+import time
+from types import SimpleNamespace
+
+from backend.runs import RunCoordinator, RunStartLock
+from backend.shared_cache import SqliteCache
+
+
+class FakeJobs:
+    """Execuções que terminam run_seconds após iniciar; 'trigger' simula o file arrival"""
+
+    def __init__(self, run_seconds=0.5):
+        self.run_seconds = run_seconds
+        self.runs = {}
+        self.started = []
+
+    def add_trigger_run(self, run_id=100):
+        self.runs[run_id] = time.time()
+
+    def run_now(self):
+        run_id = len(self.started) + 1
+        self.started.append(run_id)
+        self.runs[run_id] = time.time()
+        return SimpleNamespace(run_id=run_id)
+
+    def get_run(self, run_id):
+        done = time.time() - self.runs[run_id] >= self.run_seconds
+        state = SimpleNamespace(life_cycle_state="TERMINATED" if done else "RUNNING",
+                                result_state="SUCCESS" if done else None)
+        return SimpleNamespace(run_id=run_id, state=state)
+
+    def list_active(self):
+        return [self.get_run(run_id) for run_id in self.runs
+                if self.get_run(run_id).state.life_cycle_state != "TERMINATED"]
+
+
+def coordinator(jobs, **kwargs):
+    return RunCoordinator(jobs.run_now, jobs.get_run, jobs.list_active,
+                          poll_interval=0.05, coalesce_window=0.1, **kwargs)
+
+
+def test_requests_in_window_share_one_run():
+    jobs = FakeJobs()
+
+    async def scenario():
+        runs = coordinator(jobs)
+        return await asyncio.gather(*(runs.request() for _ in range(5)))
+
+    results = asyncio.run(scenario())
+    assert jobs.started == [1]
+    assert {r["run_id"] for r in results} == {1}
+    assert sum(r["coalesced"] for r in results) == 4
+
+
+def test_request_with_trigger_run_active_returns_queued_without_waiting():
+    jobs = FakeJobs(run_seconds=5)
+    jobs.add_trigger_run(100)
+
+    async def scenario():
+        runs = coordinator(jobs)
+        start = time.perf_counter()
+        result = await asyncio.wait_for(runs.request(), 2)
+        return result, time.perf_counter() - start
+
+    result, elapsed = asyncio.run(scenario())
+    assert result["state"] == "QUEUED"
+    assert result["active_run_ids"] == [100]
+    assert elapsed < 1
+    assert jobs.started == []
+
+
+def test_queued_request_starts_after_active_run_completes():
+    jobs = FakeJobs(run_seconds=0.2)
+    completed = []
+
+    async def scenario():
+        runs = coordinator(jobs, on_complete=completed.append)
+        first = await runs.request()
+        second = await runs.request()
+        while len(jobs.started) < 2:
+            await asyncio.sleep(0.05)
+        return first, second
+
+    first, second = asyncio.run(scenario())
+    assert first["run_id"] == 1
+    assert second["state"] == "QUEUED"
+    assert jobs.started == [1, 2]
+    assert completed[0]["run_id"] == 1
+
+
+def test_start_failure_is_raised_to_the_request():
+    jobs = FakeJobs()
+
+    def fail():
+        raise RuntimeError("quota")
+
+    async def scenario():
+        runs = RunCoordinator(fail, jobs.get_run, poll_interval=0.05, coalesce_window=0.05)
+        try:
+            await runs.request()
+        except RuntimeError as e:
+            return str(e)
+
+    assert asyncio.run(scenario()) == "quota"
+
+
+def running_run(run_id):
+    return SimpleNamespace(run_id=run_id, state=SimpleNamespace(life_cycle_state="RUNNING"))
+
+
+def start_from_worker(lock_path, cache_path, started_path, results):
+    """Um 'worker': inicia (ou adota) a execução usando o lock e o cache compartilhados"""
+    def start_run():
+        time.sleep(0.2)  # run_now lento: os outros workers chegam durante o início
+        with open(started_path, "a") as f:
+            f.write("x")
+        return SimpleNamespace(run_id=42)
+
+    lock = RunStartLock(lock_path, SqliteCache(cache_path).namespace("extract_run", 60), running_run)
+    results.put(lock.start(start_run).run_id)
+
+
+def test_start_lock_starts_one_run_across_processes(tmp_path):
+    context = multiprocessing.get_context("fork")
+    results = context.Queue()
+    args = (tmp_path / "extract.lock", tmp_path / "cache.sqlite3", tmp_path / "started", results)
+    SqliteCache(args[1])
+    workers = [context.Process(target=start_from_worker, args=args) for _ in range(4)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join(10)
+    assert [results.get(timeout=1) for _ in workers] == [42] * 4
+    assert (tmp_path / "started").read_text() == "x"
+
+
+def test_start_lock_starts_again_after_the_run_finishes(tmp_path):
+    jobs = FakeJobs(run_seconds=0.1)
+    lock = RunStartLock(tmp_path / "extract.lock", SqliteCache(tmp_path / "c.sqlite3").namespace("r", 60),
+                        jobs.get_run)
+    assert lock.start(jobs.run_now).run_id == 1
+    assert lock.start(jobs.run_now).run_id == 1
+    time.sleep(0.15)
+    assert lock.start(jobs.run_now).run_id == 2
+    assert jobs.started == [1, 2]
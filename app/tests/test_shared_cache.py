@@ -0,0 +1,77 @@
+import os
+import sqlite3
+import stat
+import time
+
+import pytest
+
+from backend.shared_cache import LocalCache, SqliteCache
+
+
+def mode(path):
+    return stat.S_IMODE(os.stat(path).st_mode)
+
+
+def test_sqlite_cache_files_are_private(tmp_path):
+    path = tmp_path / "cache.sqlite3"
+    cache = SqliteCache(path)
+    cache.set("token:sql", ("secret", 0), 60)
+    files = [name for name in os.listdir(tmp_path) if name.startswith("cache.sqlite3")]
+    assert {"cache.sqlite3", "cache.sqlite3-wal", "cache.sqlite3-shm"} <= set(files)
+    assert all(mode(tmp_path / name) == 0o600 for name in files)
+
+
+def test_existing_sidecar_files_are_restricted(tmp_path):
+    path = tmp_path / "cache.sqlite3"
+    SqliteCache(path).set("k", 1, 60)
+    for name in os.listdir(tmp_path):
+        os.chmod(tmp_path / name, 0o644)
+    SqliteCache(path)
+    assert all(mode(tmp_path / name) == 0o600 for name in os.listdir(tmp_path))
+
+
+@pytest.fixture(params=["local", "sqlite"])
+def cache(request, tmp_path):
+    if request.param == "local":
+        return LocalCache()
+    return SqliteCache(tmp_path / "cache.sqlite3")
+
+
+def test_namespace_is_lru_limited(cache):
+    docs = cache.namespace("pdf_info", ttl=60, maxsize=3)
+    for key in "abc":
+        docs.set(key, key.upper())
+        time.sleep(0.002)
+    assert docs.get("a") == "A"  # 'a' passa a ser a mais recente
+    time.sleep(0.002)
+    docs.set("d", "D")
+    assert docs.get("b") is None
+    assert [docs.get(key) for key in "acd"] == ["A", "C", "D"]
+    assert len(docs) == 3
+
+
+def test_namespace_limit_does_not_touch_other_namespaces(cache):
+    tokens = cache.namespace("token", ttl=60)
+    tokens.set("sql", "secret")
+    docs = cache.namespace("pdf_info", ttl=60, maxsize=1)
+    docs.set("a", 1)
+    docs.set("b", 2)
+    assert tokens.get("sql") == "secret"
+    assert len(docs) == 1
+
+
+def test_entries_expire(cache):
+    docs = cache.namespace("pdf_info", ttl=60)
+    docs.set("a", 1, ttl=-1)
+    assert docs.get("a") is None
+
+
+def test_old_schema_is_replaced(tmp_path):
+    path = tmp_path / "cache.sqlite3"
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE cache (key TEXT PRIMARY KEY, value BLOB, expires_at REAL)")
+    conn.commit()
+    conn.close()
+    cache = SqliteCache(path)
+    cache.set("k", 1, 60)
+    assert cache.get("k") == 1
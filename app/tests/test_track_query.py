@@ -0,0 +1,38 @@
+import os
+
+import pytest
+
+# Cache em processo: os testes não criam arquivos em /dev/shm
+os.environ.setdefault("SHARED_CACHE", "local")
+
+from backend.main import build_track_query, decode_cursor, encode_cursor  # noqa: E402
+
+
+def test_cursor_round_trip():
+    cursor = encode_cursor("2024-05-01 10:00:00", "/Volumes/c/s/raw/contrato ação.pdf")
+    assert decode_cursor(cursor) == ("2024-05-01 10:00:00", "/Volumes/c/s/raw/contrato ação.pdf")
+
+
+def test_cursor_keeps_values_as_strings():
+    assert decode_cursor(encode_cursor(1024, "/a.pdf")) == ("1024", "/a.pdf")
+
+
+@pytest.mark.parametrize("cursor", ["not-base64!", encode_cursor("only", "two")[:-4], "WyJhIl0="])
+def test_invalid_cursor(cursor):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor)
+
+
+def test_keyset_condition_follows_order():
+    query, parameters = build_track_query(sort="size", order="asc", limit=10,
+                                          cursor=encode_cursor("2048", "/b.pdf"))
+    assert "> :after_value OR (COALESCE(t.size, 0) = :after_value AND t.file_path > :after_path)" in query
+    assert "ORDER BY COALESCE(t.size, 0) ASC, t.file_path ASC" in query
+    assert "LIMIT 11" in query
+    assert {(p.name, p.value, p.type) for p in parameters} == {("after_value", "2048", "BIGINT"),
+                                                                ("after_path", "/b.pdf", None)}
+
+
+def test_invalid_sort_key():
+    with pytest.raises(ValueError):
+        build_track_query(sort="file_path; DROP TABLE x")
@@ -0,0 +1,57 @@
+import io
+import wave
+
+from backend.transcription import Mp3Segmenter, Segmenter, WavSegmenter, make_segmenter
+
+
+def feed_all(segmenter, data, chunk_size):
+    segments = []
+    for i in range(0, len(data), chunk_size):
+        segments += segmenter.feed(data[i:i + chunk_size])
+    return segments + segmenter.flush()
+
+
+def wav_bytes(frames, channels=2, width=2, rate=8000):
+    out = io.BytesIO()
+    with wave.open(out, "wb") as w:
+        w.setnchannels(channels)
+        w.setsampwidth(width)
+        w.setframerate(rate)
+        w.writeframes(frames)
+    return out.getvalue()
+
+
+def test_make_segmenter_by_content_type():
+    assert isinstance(make_segmenter("audio/mpeg"), Mp3Segmenter)
+    assert isinstance(make_segmenter("audio/wav; codecs=1"), WavSegmenter)
+    assert type(make_segmenter("audio/webm")) is Segmenter
+    assert type(make_segmenter(None)) is Segmenter
+
+
+def test_plain_segmenter_returns_everything_on_flush():
+    assert feed_all(Segmenter(4), b"abcdefghij", 3) == [b"abcdefghij"]
+
+
+def test_mp3_segments_start_at_frame_sync():
+    frame = b"\xff\xfb" + bytes(98)
+    data = frame * 10
+    segments = feed_all(Mp3Segmenter(250), data, 37)
+    assert b"".join(segments) == data
+    assert len(segments) > 1
+    assert all(segment.startswith(b"\xff\xfb") for segment in segments)
+
+
+def test_wav_segments_are_valid_wav_files_with_aligned_pcm():
+    pcm = bytes(range(256)) * 40
+    segments = feed_all(WavSegmenter(1001), wav_bytes(pcm), 333)
+    assert len(segments) > 1
+    decoded = b""
+    for segment in segments:
+        with wave.open(io.BytesIO(segment)) as w:
+            assert (w.getnchannels(), w.getsampwidth(), w.getframerate()) == (2, 2, 8000)
+            decoded += w.readframes(w.getnframes())
+    assert decoded == pcm
+
+
+def test_wav_without_header_falls_back_to_whole_audio():
+    assert feed_all(WavSegmenter(8), b"not a wav file", 5) == [b"not a wav file"]
@@ -0,0 +1,83 @@
+import asyncio
+import hashlib
+import os
+
+import pytest
+
+from backend.uploads import receive_uploads, safe_filename
+
+BOUNDARY = "----test-boundary"
+
+
+def multipart_body(files, fields=()):
+    body = b""
+    for name, value in fields:
+        body += (f"--{BOUNDARY}\r\nContent-Disposition: form-data; name=\"{name}\"\r\n\r\n").encode() + value + b"\r\n"
+    for field, filename, content in files:
+        body += (f"--{BOUNDARY}\r\nContent-Disposition: form-data; name=\"{field}\"; filename=\"{filename}\"\r\n"
+                 "Content-Type: application/pdf\r\n\r\n").encode() + content + b"\r\n"
+    return body + f"--{BOUNDARY}--\r\n".encode()
+
+
+class FakeRequest:
+    def __init__(self, body, content_type=f"multipart/form-data; boundary={BOUNDARY}", chunk_size=7):
+        self.headers = {"content-type": content_type}
+        self._body = body
+        self._chunk_size = chunk_size
+
+    async def stream(self):
+        for i in range(0, len(self._body), self._chunk_size):
+            yield self._body[i:i + self._chunk_size]
+
+
+def test_receives_every_file_with_md5_and_size(tmp_path):
+    first, second = b"%PDF-1.4 first" * 50, b"%PDF-1.4 second"
+    body = multipart_body([("file", "a.pdf", first), ("files", "b.pdf", second)], fields=[("note", b"x")])
+    parts = asyncio.run(receive_uploads(FakeRequest(body), spool_dir=tmp_path))
+    try:
+        assert [p.filename for p in parts] == ["a.pdf", "b.pdf"]
+        assert [p.md5 for p in parts] == [hashlib.md5(first).hexdigest(), hashlib.md5(second).hexdigest()]
+        assert [p.size for p in parts] == [len(first), len(second)]
+        with parts[0].open() as f:
+            assert f.read() == first
+    finally:
+        for part in parts:
+            part.discard()
+    assert os.listdir(tmp_path) == []
+
+
+def test_missing_boundary():
+    with pytest.raises(ValueError):
+        asyncio.run(receive_uploads(FakeRequest(b"", content_type="multipart/form-data")))
+
+
+@pytest.mark.parametrize("filename, expected", [
+    ("contrato.pdf", "contrato.pdf"),
+    ("../../etc/passwd", "passwd"),
+    ("C:\\Users\\x\\contrato.pdf", "contrato.pdf"),
+    ("..", None),
+    ("", None),
+])
+def test_safe_filename(filename, expected):
+    assert safe_filename(filename) == expected
+
+
+def test_upload_endpoint_reports_duplicates_with_200(monkeypatch):
+    os.environ.setdefault("SHARED_CACHE", "local")
+    from fastapi.testclient import TestClient
+    from backend import main
+
+    content = b"%PDF-1.4 contrato"
+    uploaded = []
+    monkeypatch.setattr(main, "find_known_hashes",
+                        lambda hashes: {hashlib.md5(content).hexdigest(): "/Volumes/c/s/raw/antigo.pdf"})
+    monkeypatch.setattr(main, "upload_part_to_volume", lambda part: uploaded.append(part.filename))
+
+    body = multipart_body([("file", "novo.pdf", content)])
+    client = TestClient(main.app)
+    response = client.post("/api/upload", content=body,
+                           headers={"content-type": f"multipart/form-data; boundary={BOUNDARY}"})
+    assert response.status_code == 200
+    assert response.json()["files"][0]["status"] == "duplicate"
+    assert response.json()["files"][0]["duplicate_of"] == "/Volumes/c/s/raw/antigo.pdf"
+    assert uploaded == []
@@ -0,0 +1,127 @@
+import io
+from datetime import date
+from types import SimpleNamespace
+
+import pyarrow as pa
+import pytest
+from databricks.sdk.service import sql
+
+from backend.warehouse import StatementReader, to_text
+
+
+def manifest(*columns):
+    return SimpleNamespace(schema=SimpleNamespace(columns=[SimpleNamespace(name=c) for c in columns]),
+                           total_row_count=None)
+
+
+def response(result, state=sql.StatementState.SUCCEEDED):
+    return SimpleNamespace(statement_id="stmt-1", status=SimpleNamespace(state=state, error=None),
+                           manifest=manifest("path", "size"), result=result)
+
+
+class FakeStatementExecution:
+    """execute_statement devolve o bloco 0; os demais vêm de get_statement_result_chunk_n"""
+
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.requested = []
+        self.executed = []
+
+    def execute_statement(self, **kwargs):
+        self.executed.append(kwargs)
+        return response(self.chunks[0])
+
+    def get_statement_result_chunk_n(self, statement_id, chunk_index):
+        self.requested.append(chunk_index)
+        return self.chunks[chunk_index]
+
+
+def reader_for(chunks, **kwargs):
+    execution = FakeStatementExecution(chunks)
+    client = SimpleNamespace(statement_execution=execution)
+    return StatementReader(lambda: client, "wh", "cat", "sch", **kwargs), execution
+
+
+def inline_chunk(rows, next_index):
+    return SimpleNamespace(external_links=None, data_array=rows, next_chunk_index=next_index)
+
+
+def test_inline_result_follows_every_chunk():
+    chunks = [inline_chunk([["/a.pdf", "1"], ["/b.pdf", "2"]], 1),
+              inline_chunk([["/c.pdf", "3"]], 2),
+              inline_chunk([["/d.pdf", "4"]], None)]
+    reader, execution = reader_for(chunks, use_arrow=False)
+    result = reader.execute("SELECT path, size FROM t")
+    assert [row["path"] for row in result.rows()] == ["/a.pdf", "/b.pdf", "/c.pdf", "/d.pdf"]
+    assert execution.requested == [1, 2]
+    assert execution.executed[0]["disposition"] == sql.Disposition.INLINE
+
+
+def test_inline_batches_are_lazy():
+    chunks = [inline_chunk([["/a.pdf", "1"]], 1), inline_chunk([["/b.pdf", "2"]], None)]
+    reader, execution = reader_for(chunks, use_arrow=False)
+    batches = reader.execute("SELECT 1").batches()
+    assert next(batches) == [{"path": "/a.pdf", "size": "1"}]
+    assert execution.requested == []
+
+
+def test_failed_statement_raises():
+    reader, execution = reader_for([inline_chunk([], None)], use_arrow=False)
+    execution.execute_statement = lambda **kwargs: response(None, state=sql.StatementState.FAILED)
+    with pytest.raises(RuntimeError):
+        reader.execute("SELECT 1")
+
+
+def arrow_stream(paths, sizes, batch_size=2):
+    table = pa.table({"path": paths, "size": pa.array(sizes, pa.int64())})
+    sink = io.BytesIO()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        for batch in table.to_batches(max_chunksize=batch_size):
+            writer.write_batch(batch)
+    return sink.getvalue()
+
+
+class FakeSession:
+    """Links pré-assinados servidos como streams Arrow IPC"""
+
+    def __init__(self, bodies):
+        self.bodies = bodies
+        self.downloaded = []
+
+    def get(self, url, stream=False, timeout=None):
+        self.downloaded.append(url)
+        raw = io.BytesIO(self.bodies[url])
+        return SimpleNamespace(raw=raw, raise_for_status=lambda: None, close=raw.close)
+
+
+def links_chunk(urls, next_index):
+    links = [SimpleNamespace(external_link=url, next_chunk_index=None) for url in urls]
+    links[-1].next_chunk_index = next_index
+    return SimpleNamespace(external_links=links, data_array=None, next_chunk_index=None)
+
+
+def test_external_links_are_downloaded_and_read_as_arrow():
+    session = FakeSession({
+        "https://link/0": arrow_stream(["/a.pdf", "/b.pdf", "/c.pdf"], [10, 20, None]),
+        "https://link/1": arrow_stream(["/d.pdf"], [40]),
+    })
+    chunks = [links_chunk(["https://link/0"], 1), links_chunk(["https://link/1"], None)]
+    reader, execution = reader_for(chunks, use_arrow=True, http_session=session)
+    result = reader.execute("SELECT path, size FROM t")
+    batches = list(result.batches())
+
+    assert execution.executed[0]["disposition"] == sql.Disposition.EXTERNAL_LINKS
+    assert execution.executed[0]["format"] == sql.Format.ARROW_STREAM
+    assert session.downloaded == ["https://link/0", "https://link/1"]
+    assert execution.requested == [1]
+    # Um lote por record batch, com os valores como texto (igual ao JSON_ARRAY)
+    assert batches == [
+        [{"path": "/a.pdf", "size": "10"}, {"path": "/b.pdf", "size": "20"}],
+        [{"path": "/c.pdf", "size": None}],
+        [{"path": "/d.pdf", "size": "40"}],
+    ]
+
+
+def test_to_text_matches_json_array_format():
+    assert [to_text(v) for v in (None, "x", True, 3, 1.5, date(2024, 5, 1))] == \
+        [None, "x", "true", "3", "1.5", "2024-05-01"]
@@ -0,0 +1,283 @@
+"""
+Substitutos locais dos serviços Databricks usados pelo backend (Statement Execution API,
+Files API, serving/agent endpoints e Jobs API), com latência injetada e um corpus
+sintético de contratos. Usados apenas pelo benchmark (bench/run.py).
+"""
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+from databricks.sdk.service.sql import (
+    ColumnInfo, ResultData, ResultManifest, ResultSchema, StatementResponse, StatementState, StatementStatus,
+)
+
+TIPOS = ["Prestação de Serviços", "Locação", "Fornecimento", "Licenciamento", "Consultoria"]
+EMPRESAS = ["Acme Ltda", "Beta S.A.", "Gama Tecnologia", "Delta Engenharia", "Ômega Logística", "Sigma Consultoria"]
+
+EXTRACT_COLUMNS = ["path", "volume", "pdf", "tipo_contrato", "nome_contrato", "contratante", "contratado",
+                   "valor_total", "moeda", "data_assinatura", "data_inicio_vigencia", "data_fim_vigencia",
+                   "prazo_vigencia", "objeto_contrato", "forma_pagamento", "condicoes_pagamento",
+                   "clausula_rescisao", "multa_rescisao", "garantias", "confidencialidade", "foro",
+                   "observacoes", "summarize"]
+TRACK_COLUMNS = ["file_name", "type", "size", "processed", "file_path", "upload_time", "processed_time",
+                 "sort_value"]
+
+
+class Latency:
+    """Latência injetada por serviço (segundos), com variação aleatória de +-jitter"""
+
+    def __init__(self, warehouse=0.05, files=0.02, serving=0.3, jobs=0.05, jitter=0.2):
+        self.values = {"warehouse": warehouse, "files": files, "serving": serving, "jobs": jobs}
+        self.jitter = jitter
+
+    def wait(self, service):
+        base = self.values[service]
+        if base > 0:
+            time.sleep(base * random.uniform(1 - self.jitter, 1 + self.jitter))
+
+
+# =======================================================================
+# Corpus sintético
+# =======================================================================
+class Corpus:
+
+    def __init__(self, size, volume_path, seed=42):
+        rng = random.Random(seed)
+        start = datetime(2023, 1, 1)
+        self.volume_path = volume_path
+        self.track, self.extract = [], []
+        for i in range(size):
+            name = f"contrato-{i:05d}.pdf"
+            path = f"{volume_path}/{name}"
+            uploaded = start + timedelta(hours=i * 7)
+            contratante, contratado = rng.sample(EMPRESAS, 2)
+            tipo = rng.choice(TIPOS)
+            self.track.append({
+                "file_name": name, "type": "pdf", "size": str(rng.randint(50, 5000)),
+                "processed": "✅", "file_path": path,
+                "upload_time": uploaded.strftime("%d/%m/%Y"),
+                "processed_time": (uploaded + timedelta(minutes=30)).strftime("%d/%m/%Y"),
+                "sort_value": uploaded.isoformat(sep=" "),
+                "file_hash": hashlib.md5(name.encode()).hexdigest(),
+            })
+            summary = (f"Contrato de {tipo.lower()} entre {contratante} e {contratado}, "
+                       f"vigência de {rng.randint(6, 48)} meses. " * rng.randint(3, 12))
+            self.extract.append({
+                "path": f"dbfs:{path}", "volume": path, "pdf": name, "tipo_contrato": tipo,
+                "nome_contrato": f"Contrato {i}", "contratante": contratante, "contratado": contratado,
+                "valor_total": f"{rng.uniform(1e4, 5e6):,.2f}", "moeda": "BRL",
+                "data_assinatura": uploaded.strftime("%d/%m/%Y"),
+                "data_inicio_vigencia": uploaded.strftime("%d/%m/%Y"),
+                "data_fim_vigencia": (uploaded + timedelta(days=365)).strftime("%d/%m/%Y"),
+                "prazo_vigencia": "12 meses", "objeto_contrato": f"{tipo} para {contratante}",
+                "forma_pagamento": "Boleto", "condicoes_pagamento": "30 dias após a nota fiscal",
+                "clausula_rescisao": "Aviso prévio de 30 dias", "multa_rescisao": "10.000,00",
+                "garantias": "Seguro garantia", "confidencialidade": "Sim", "foro": "São Paulo/SP",
+                "observacoes": "", "summarize": summary,
+                "file_hash": self.track[-1]["file_hash"],
+            })
+        self.version = start.isoformat()
+
+    def context(self, row):
+        return " | ".join(f"{k}: {row[k]}" for k in ("pdf", "tipo_contrato", "contratante", "contratado",
+                                                       "valor_total", "summarize"))
+
+    @staticmethod
+    def wanted(params):
+        """Valores filtrados: itens da lista expandida em IN (:paths_0, ...) ou parâmetros escalares"""
+        if not params:
+            return None
+        return {value for value in params.values() if value is not None}
+
+    def query(self, statement, params):
+        """Interpreta as statements que o backend emite e retorna (colunas, linhas como texto)"""
+        sql = " ".join(statement.split())
+        limit = re.search(r"LIMIT (\d+)\s*$", sql)
+        limit = int(limit.group(1)) if limit else None
+
+        if "MAX(processed_time)" in sql:
+            return ["version"], [[self.version]]
+        if sql.startswith("DESCRIBE HISTORY"):
+            return ["version"], [["1"]]
+        if "table_changes(" in sql:
+            return ["file_path", "processed", "_change_type", "_commit_version"], []
+        if "SELECT 1" in sql:
+            return ["1"], [["1"]]
+        if "contract_context" in sql:
+            wanted = self.wanted(params)
+            rows = [[e["path"], self.context(e)] for e in self.extract if wanted is None or e["path"] in wanted]
+            return ["path", "context"], rows
+        if "contract_extract" in sql:
+            wanted = self.wanted(params)
+            columns = EXTRACT_COLUMNS + (["file_hash"] if "file_hash" in sql else [])
+            rows = [[e[c] for c in columns] for e in self.extract if wanted is None or e["path"] in wanted]
+            return columns, rows[:limit] if limit else rows
+        if "contract_track" in sql and "SELECT file_hash" in sql:
+            wanted = self.wanted(params)
+            return ["file_hash", "file_name"], [[t["file_hash"], t["file_name"]] for t in self.track
+                                                if t["file_hash"] in wanted]
+        if "contract_track" in sql:
+            # Filtros e cursor não são avaliados: todas as páginas equivalem à primeira
+            rows = [[t[c] for c in TRACK_COLUMNS] for t in reversed(self.track)]
+            return TRACK_COLUMNS, rows[:limit] if limit else rows
+        raise ValueError(f"statement não suportada pelo fake: {sql[:120]}")
+
+
+# =======================================================================
+# Workspace client
+# =======================================================================
+class FakeStatementExecution:
+
+    def __init__(self, corpus, latency, chunk_rows=500):
+        self.corpus = corpus
+        self.latency = latency
+        self.chunk_rows = chunk_rows
+        self._chunks = {}
+        self._lock = threading.Lock()
+
+    def execute_statement(self, warehouse_id=None, statement=None, parameters=None, **kwargs):
+        self.latency.wait("warehouse")
+        params = {p.name: p.value for p in parameters or []}
+        columns, rows = self.corpus.query(statement, params)
+        chunks = [rows[i:i + self.chunk_rows] for i in range(0, len(rows), self.chunk_rows)] or [[]]
+        statement_id = uuid.uuid4().hex
+        with self._lock:
+            self._chunks[statement_id] = chunks
+        return StatementResponse(
+            statement_id=statement_id,
+            status=StatementStatus(state=StatementState.SUCCEEDED),
+            manifest=ResultManifest(schema=ResultSchema(columns=[ColumnInfo(name=c) for c in columns]),
+                                    total_row_count=len(rows), total_chunk_count=len(chunks)),
+            result=self._result(statement_id, 0),
+        )
+
+    def _result(self, statement_id, index):
+        chunks = self._chunks[statement_id]
+        next_index = index + 1 if index + 1 < len(chunks) else None
+        if next_index is None:
+            with self._lock:
+                self._chunks.pop(statement_id, None)
+        return ResultData(chunk_index=index, data_array=chunks[index], next_chunk_index=next_index)
+
+    def get_statement(self, statement_id):
+        raise NotImplementedError("o fake sempre termina a statement de forma síncrona")
+
+    def get_statement_result_chunk_n(self, statement_id, chunk_index):
+        self.latency.wait("warehouse")
+        return self._result(statement_id, chunk_index)
+
+
+class FakeFiles:
+
+    def __init__(self, latency):
+        self.latency = latency
+        self.uploaded = {}
+
+    def upload(self, file_path, contents, overwrite=False):
+        self.latency.wait("files")
+        size = 0
+        while True:
+            chunk = contents.read(1024 * 1024)
+            if not chunk:
+                break
+            size += len(chunk)
+        self.uploaded[file_path] = size
+
+
+class FakeJobs:
+
+    def __init__(self, latency, run_seconds=5.0):
+        self.latency = latency
+        self.run_seconds = run_seconds
+        self._runs = {}
+
+    def run_now(self, job_id=None, **kwargs):
+        self.latency.wait("jobs")
+        run_id = len(self._runs) + 1
+        self._runs[run_id] = time.time()
+        return SimpleNamespace(run_id=run_id)
+
+    def get_run(self, run_id):
+        self.latency.wait("jobs")
+        done = time.time() - self._runs[run_id] >= self.run_seconds
+        state = SimpleNamespace(life_cycle_state="TERMINATED" if done else "RUNNING",
+                                result_state="SUCCESS" if done else None)
+        return SimpleNamespace(run_id=run_id, state=state)
+
+    def list_runs(self, job_id=None, active_only=False, limit=None):
+        return []
+
+
+class FakeServingEndpoints:
+
+    def __init__(self, latency):
+        self.latency = latency
+
+    def query(self, name=None, **kwargs):
+        self.latency.wait("serving")
+        message = SimpleNamespace(content="Resposta formatada do benchmark.")
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)],
+                               predictions=[{"text": "pergunta transcrita"}],
+                               data=[SimpleNamespace(embedding=[0.0] * 8)])
+
+
+class FakeWorkspaceClient:
+
+    def __init__(self, corpus, latency, chunk_rows=500):
+        self.statement_execution = FakeStatementExecution(corpus, latency, chunk_rows)
+        self.files = FakeFiles(latency)
+        self.jobs = FakeJobs(latency)
+        self.serving_endpoints = FakeServingEndpoints(latency)
+        self.config = SimpleNamespace(authenticate=lambda: {"Authorization": "Bearer bench-token"})
+
+
+# =======================================================================
+# Files API (download via requests) e agent endpoint (mlflow deployments)
+# =======================================================================
+class FakeResponse:
+
+    def __init__(self, body, status_code=200):
+        self.body = body
+        self.status_code = status_code
+        self.headers = {"Content-Length": str(len(body))}
+
+    def iter_content(self, chunk_size):
+        for i in range(0, len(self.body), chunk_size):
+            yield self.body[i:i + chunk_size]
+
+    def close(self):
+        pass
+
+
+class FakeFilesSession:
+    """Substitui a requests.Session da Files API: todo PDF tem pdf_bytes bytes"""
+
+    def __init__(self, latency, pdf_bytes):
+        self.latency = latency
+        self.body = b"%PDF-1.4\n" + b"0" * max(pdf_bytes - 9, 0)
+
+    def get(self, url, headers=None, stream=False, **kwargs):
+        self.latency.wait("files")
+        return FakeResponse(self.body)
+
+
+class FakeDeployClient:
+
+    def __init__(self, latency, answer_words=120):
+        self.latency = latency
+        self.answer = " ".join(["cláusula"] * answer_words)
+
+    def predict(self, endpoint=None, inputs=None):
+        self.latency.wait("serving")
+        return {"output": [{"content": [{"text": self.answer}]}]}
+
+    def predict_stream(self, endpoint=None, inputs=None):
+        self.latency.wait("serving")
+        for word in self.answer.split():
+            yield {"type": "response.output_text.delta", "delta": word + " "}
@@ -0,0 +1,200 @@
+"""
+Benchmark do backend contra os fakes de bench/fakes.py: sobe o app FastAPI em processo
+(httpx.ASGITransport, sem rede), dispara os cenários com a concorrência pedida e
+reporta p50/p95/p99 e throughput por cenário.
+
+    pip install -r app/requirements.txt httpx
+    python bench/run.py --requests 300 --concurrency 16 --corpus 2000 --serving-latency 0.5
+    python bench/run.py --scenarios data,pdf --output bench_output.txt
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from contextlib import redirect_stdout
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "app"))
+sys.path.insert(0, str(ROOT / "bench"))
+
+VOLUME_PATH = "/Volumes/bench/contracts/files"
+
+BENCH_ENV = {
+    "DATABRICKS_HOST": "https://bench.local",
+    "DATABRICKS_HTTP_PATH": "/sql/1.0/warehouses/bench",
+    "CATALOG": "bench",
+    "DATABASE": "contracts",
+    "VOLUME_PATH": VOLUME_PATH,
+    "LLM_ENDPOINT": "bench-llm",
+    "AGENT_ENDPOINT": "bench-agent",
+    "EXTRACT_JOB_ID": "1",
+}
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    if not ordered:
+        return float("nan")
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+# =======================================================================
+# Montagem do app com os fakes
+# =======================================================================
+def build_app(args):
+    os.environ.update(BENCH_ENV)
+    os.environ.setdefault("PDF_CACHE_DIR", tempfile.mkdtemp(prefix="bench-pdf-"))
+
+    import mlflow.deployments
+    from fakes import Corpus, FakeDeployClient, FakeFilesSession, FakeWorkspaceClient, Latency
+    from backend import main
+    from backend.connections import TokenCache
+
+    latency = Latency(warehouse=args.warehouse_latency, files=args.files_latency,
+                      serving=args.serving_latency, jobs=args.jobs_latency, jitter=args.jitter)
+    corpus = Corpus(args.corpus, VOLUME_PATH)
+    deploy_client = FakeDeployClient(latency)
+
+    # get_workspace_client() devolve o cliente já inicializado
+    main.workspace_client = FakeWorkspaceClient(corpus, latency, chunk_rows=args.chunk_rows)
+    main.sql_token_cache = TokenCache(lambda: "bench-token", ttl=3600)
+    main.files_session = FakeFilesSession(latency, args.pdf_bytes)
+    main.statement_reader.use_arrow = False
+    mlflow.deployments.get_deploy_client = lambda target=None: deploy_client
+    return main.app, corpus
+
+
+# =======================================================================
+# Cenários
+# =======================================================================
+def scenarios(corpus, args):
+    names = [t["file_name"] for t in corpus.track]
+    questions = [f"Qual o valor total e a multa do contrato {i}?" for i in range(args.question_pool)]
+    pdf_body = b"%PDF-1.4\n" + b"0" * 64 * 1024
+
+    def chat(i):
+        return "POST", "/chat/", {"json": {"text": random.choice(questions), "chat_history": []}}
+
+    def data(i):
+        return "GET", "/api/data", {}
+
+    def data_page(i):
+        return "GET", "/api/data", {"params": {"limit": 50}}
+
+    def all_data(i):
+        return "GET", "/api/all_data", {}
+
+    def all_data_pdf(i):
+        return "GET", "/api/all_data", {"params": {"pdf": random.choice(names)}}
+
+    def pdf(i):
+        return "GET", "/api/pdf", {"params": {"pdf": random.choice(names)}}
+
+    def batch(i):
+        return "POST", "/api/batch", {"json": {"ids": random.sample(names, min(20, len(names)))}}
+
+    def upload(i):
+        # Conteúdo único por requisição para não cair na deduplicação por MD5
+        body = pdf_body + f"{i}-{random.random()}".encode()
+        return "POST", "/api/upload", {"files": {"file": (f"bench-{i}.pdf", body, "application/pdf")}}
+
+    return {"chat": chat, "data": data, "data_page": data_page, "all_data": all_data,
+            "all_data_pdf": all_data_pdf, "pdf": pdf, "batch": batch, "upload": upload}
+
+
+async def run_scenario(client, make_request, total, concurrency):
+    latencies, errors = [], 0
+    counter = iter(range(total))
+
+    async def worker():
+        nonlocal errors
+        for i in counter:
+            method, url, kwargs = make_request(i)
+            start = time.perf_counter()
+            try:
+                response = await client.request(method, url, **kwargs)
+                await response.aread()
+                if response.status_code >= 400:
+                    errors += 1
+            except Exception:
+                errors += 1
+            latencies.append(time.perf_counter() - start)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "p50": percentile(latencies, 50) * 1000,
+        "p95": percentile(latencies, 95) * 1000,
+        "p99": percentile(latencies, 99) * 1000,
+        "mean": statistics.fmean(latencies) * 1000 if latencies else float("nan"),
+        "throughput": len(latencies) / elapsed if elapsed else float("nan"),
+    }
+
+
+async def main(args):
+    import httpx
+
+    # Os prints do backend são descartados (salvo --verbose) para não distorcer os tempos nem o relatório
+    with open(os.devnull, "w") as devnull, redirect_stdout(devnull if args.quiet else sys.stdout):
+        app, corpus = build_app(args)
+    available = scenarios(corpus, args)
+    selected = args.scenarios.split(",") if args.scenarios else list(available)
+    unknown = [name for name in selected if name not in available]
+    if unknown:
+        raise SystemExit(f"cenários desconhecidos: {unknown} (disponíveis: {', '.join(available)})")
+
+    transport = httpx.ASGITransport(app=app)
+    results = {}
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+            for name in selected:
+                with open(os.devnull, "w") as devnull, redirect_stdout(devnull if args.quiet else sys.stdout):
+                    if args.warmup:
+                        await run_scenario(client, available[name], args.warmup, min(args.concurrency, args.warmup))
+                    results[name] = await run_scenario(client, available[name], args.requests, args.concurrency)
+
+    header = (f"corpus={args.corpus} concurrency={args.concurrency} requests={args.requests} "
+              f"latency(s): warehouse={args.warehouse_latency} files={args.files_latency} "
+              f"serving={args.serving_latency} jobs={args.jobs_latency}")
+    lines = [header, "",
+             f"{'scenario':<14}{'reqs':>6}{'errors':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'mean ms':>10}{'req/s':>9}"]
+    for name, r in results.items():
+        lines.append(f"{name:<14}{r['requests']:>6}{r['errors']:>8}{r['p50']:>10.1f}{r['p95']:>10.1f}"
+                     f"{r['p99']:>10.1f}{r['mean']:>10.1f}{r['throughput']:>9.1f}")
+    report = "\n".join(lines)
+    print(report)
+    if args.output:
+        Path(args.output).write_text(report + "\n", encoding="utf-8")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark do backend com serviços Databricks simulados")
+    parser.add_argument("--scenarios", default="", help="lista separada por vírgula (padrão: todos)")
+    parser.add_argument("--requests", type=int, default=200, help="requisições por cenário")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--warmup", type=int, default=10, help="requisições descartadas antes de medir")
+    parser.add_argument("--corpus", type=int, default=500, help="quantidade de contratos simulados")
+    parser.add_argument("--chunk-rows", type=int, default=500, help="linhas por bloco do resultado SQL")
+    parser.add_argument("--pdf-bytes", type=int, default=1024 * 1024, help="tamanho de cada PDF servido")
+    parser.add_argument("--question-pool", type=int, default=50, help="perguntas distintas usadas no chat")
+    parser.add_argument("--warehouse-latency", type=float, default=0.05)
+    parser.add_argument("--files-latency", type=float, default=0.02)
+    parser.add_argument("--serving-latency", type=float, default=0.3)
+    parser.add_argument("--jobs-latency", type=float, default=0.05)
+    parser.add_argument("--jitter", type=float, default=0.2, help="variação relativa da latência injetada")
+    parser.add_argument("--output", help="grava o relatório também neste arquivo")
+    parser.add_argument("--verbose", dest="quiet", action="store_false", help="mostra os logs do backend")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    asyncio.run(main(parse_args()))
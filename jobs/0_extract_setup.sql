@@ -0,0 +1,374 @@
+-- Databricks notebook source
+-- DBTITLE 1,Criar os parametros para o notebook
+-- Create widgets
+CREATE WIDGET TEXT catalog DEFAULT 'main';
+CREATE WIDGET TEXT database DEFAULT 'default';
+CREATE WIDGET TEXT trackTableName DEFAULT 'contract_track';
+CREATE WIDGET TEXT parsedTableName DEFAULT 'contract_parsed';
+CREATE WIDGET TEXT extractTableName DEFAULT 'contract_extract';
+CREATE WIDGET TEXT contextTableName DEFAULT 'contract_context';
+CREATE WIDGET TEXT maxContextChars DEFAULT '8000';
+
+-- COMMAND ----------
+
+-- DBTITLE 1,Set do catalog e schema
+USE catalog IDENTIFIER(:catalog);
+USE database IDENTIFIER(:database);
+
+-- COMMAND ----------
+
+-- DBTITLE 1,Criar tabela delta para armazenar o conteudo do contrato
+-- Create parsed table (uma linha por conteudo: file_hash e o MD5 calculado em contract_track)
+CREATE TABLE IF NOT EXISTS IDENTIFIER(:parsedTableName) (
+  path STRING,
+  raw_parsed VARIANT,
+  text STRING,
+  summarize STRING,
+  error_status STRING,
+  file_hash STRING
+)
+CLUSTER BY (file_hash, path);
+
+-- COMMAND ----------
+
+-- Create contract extraction table 
+CREATE TABLE IF NOT EXISTS IDENTIFIER(:extractTableName) (
+  path STRING,
+  summarize STRING,
+  tipo_contrato STRING,
+  nome_contrato STRING,
+  contratante STRING,
+  contratado STRING,
+  valor_total DOUBLE,
+  moeda STRING,
+  data_assinatura DATE,
+  data_inicio_vigencia DATE,
+  data_fim_vigencia DATE,
+  prazo_vigencia STRING,
+  objeto_contrato STRING,
+  forma_pagamento STRING,
+  condicoes_pagamento STRING,
+  clausula_rescisao STRING,
+  multa_rescisao DOUBLE,
+  garantias STRING,
+  confidencialidade STRING,
+  foro STRING,
+  observacoes STRING,
+  file_hash STRING
+)
+CLUSTER BY (path, file_hash);
+
+-- COMMAND ----------
+
+ALTER TABLE IDENTIFIER(:extractTableName) SET TBLPROPERTIES (delta.enableChangeDataFeed = true)
+
+-- COMMAND ----------
+
+-- MAGIC %python
+-- MAGIC # Tabelas criadas antes da chave por conteudo: adiciona file_hash e preenche a partir de contract_track
+-- MAGIC track_table = dbutils.widgets.get("trackTableName")
+-- MAGIC for table in (dbutils.widgets.get("parsedTableName"), dbutils.widgets.get("extractTableName")):
+-- MAGIC     if "file_hash" in spark.table(table).columns:
+-- MAGIC         continue
+-- MAGIC     spark.sql(f"ALTER TABLE {table} ADD COLUMN file_hash STRING")
+-- MAGIC     if spark.catalog.tableExists(track_table):
+-- MAGIC         spark.sql(f"""
+-- MAGIC             MERGE INTO {table} x
+-- MAGIC             USING (SELECT file_path, MAX(file_hash) AS file_hash FROM {track_table} GROUP BY file_path) t
+-- MAGIC             ON x.path = t.file_path
+-- MAGIC             WHEN MATCHED THEN UPDATE SET x.file_hash = t.file_hash
+-- MAGIC         """)
+
+-- COMMAND ----------
+
+-- MAGIC %python
+-- MAGIC # Execucoes anteriores gravavam com INSERT (append): mantem uma linha por path antes dos MERGE por path
+-- MAGIC for table, order in ((dbutils.widgets.get("parsedTableName"), "error_status IS NULL DESC, summarize IS NOT NULL DESC"),
+-- MAGIC                      (dbutils.widgets.get("extractTableName"), "summarize IS NOT NULL DESC")):
+-- MAGIC     duplicated = spark.sql(f"SELECT 1 FROM {table} GROUP BY path HAVING COUNT(*) > 1 LIMIT 1").count()
+-- MAGIC     if duplicated:
+-- MAGIC         spark.sql(f"""
+-- MAGIC             INSERT OVERWRITE {table}
+-- MAGIC             SELECT * FROM {table}
+-- MAGIC             QUALIFY ROW_NUMBER() OVER (PARTITION BY path ORDER BY {order}) = 1
+-- MAGIC         """)
+
+-- COMMAND ----------
+
+-- DBTITLE 1,Clustering pelas chaves usadas nos MERGE e nas consultas do app (tabelas ja existentes)
+ALTER TABLE IDENTIFIER(:parsedTableName) CLUSTER BY (file_hash, path);
+
+-- COMMAND ----------
+
+ALTER TABLE IDENTIFIER(:extractTableName) CLUSTER BY (path, file_hash);
+
+-- COMMAND ----------
+
+-- DBTITLE 1,Clustering incremental (somente os arquivos gravados desde o ultimo OPTIMIZE)
+OPTIMIZE IDENTIFIER(:parsedTableName);
+
+-- COMMAND ----------
+
+OPTIMIZE IDENTIFIER(:extractTableName);
+
+-- COMMAND ----------
+
+-- DBTITLE 1,Criar tabela com o contexto pre-renderizado de cada contrato
+-- Lida pelo app (em memoria) para montar o contexto do chat sem consultar contract_extract
+CREATE TABLE IF NOT EXISTS IDENTIFIER(:contextTableName) (
+  path STRING,
+  context STRING,
+  token_count INT,
+  updated_at TIMESTAMP
+)
+TBLPROPERTIES (delta.enableChangeDataFeed = true);
+
+-- COMMAND ----------
+
+-- DBTITLE 1,Funcao para realizar o resumo do contrato
+CREATE OR REPLACE FUNCTION SUMMARIZE_CONTRACT_DATA(text STRING)
+RETURNS STRING  
+RETURN AI_QUERY(
+            'databricks-gpt-5',
+            CONCAT(
+            'Você é um assistente de IA especialista em resumir informações de contratos. 
+            Analise o documento e extraia as informações mais relevantes do contrato.
+            
+            Use esse template para dar a resposta ao usuário:
+            
+            **Tipo de Contrato:**
+            **Nome/Identificação do Contrato:**
+            **Partes Envolvidas:**
+            - Contratante:
+            - Contratado:
+            
+            **Valores e Condições Financeiras:**
+            - Valor Total:
+            - Moeda:
+            - Forma de Pagamento:
+            - Condições de Pagamento:
+            
+            **Datas e Prazos:**
+            - Data de Assinatura:
+            - Início da Vigência:
+            - Fim da Vigência:
+            - Prazo de Vigência:
+            
+            **Objeto do Contrato:**
+            - Descrição detalhada do objeto/serviço contratado
+            
+            **Cláusulas Importantes:**
+            - Rescisão: (condições e prazos)
+            - Multas: (valores e condições)
+            - Garantias: (se houver)
+            - Confidencialidade: (se houver)
+            
+            **Aspectos Legais:**
+            - Foro:
+            
+            **Observações Relevantes:**
+            - Outras cláusulas ou informações importantes
+            
+            INSTRUÇÕES PARA INCLUIR PÁGINAS:
+            Sempre inclua [página X] após cada informação importante.
+            Exemplo: "Valor Total: R$ 500.000,00 [página 3]"
+            As páginas vêm marcadas no texto como [página X].
+            Em contratos longos o texto chega como resumos parciais de trechos do contrato
+            (Trecho 1, Trecho 2, ...): consolide-os em um único resumo, mantendo as referências de página.
+            
+            Retorne em formato organizado e legível.
+
+            TEXT: ', text
+            )
+        )
+
+-- COMMAND ----------
+
+-- DBTITLE 1,Funcao para resumir um trecho de um contrato longo (consolidado depois por SUMMARIZE_CONTRACT_DATA)
+CREATE OR REPLACE FUNCTION SUMMARIZE_CONTRACT_CHUNK(text STRING)
+RETURNS STRING
+RETURN AI_QUERY(
+            'databricks-gpt-5',
+            CONCAT(
+            'Você é um assistente de IA especialista em contratos. O texto abaixo é apenas um trecho
+            de um contrato maior, com as páginas marcadas como [página X].
+
+            Liste de forma objetiva todas as informações do trecho que sejam relevantes para o resumo
+            do contrato: tipo e identificação do contrato, partes, valores, moeda, forma e condições de
+            pagamento, datas e prazos, objeto, rescisão, multas, garantias, confidencialidade, foro e
+            outras cláusulas importantes.
+
+            Sempre inclua [página X] após cada informação.
+            Não invente informações que não estejam no trecho e não comente o que estiver ausente.
+
+            TEXT: ', text
+            )
+        )
+
+-- COMMAND ----------
+
+-- DBTITLE 1,Funcao para realizar a extracao de dados estruturados do contrato
+CREATE OR REPLACE FUNCTION EXTRACT_CONTRACT_DATA(text STRING)
+RETURNS STRUCT<
+  tipo_contrato: STRING,
+  nome_contrato: STRING,
+  contratante: STRING,
+  contratado: STRING,
+  valor_total: DOUBLE,
+  moeda: STRING,
+  data_assinatura: STRING,
+  data_inicio_vigencia: STRING,
+  data_fim_vigencia: STRING,
+  prazo_vigencia: STRING,
+  objeto_contrato: STRING,
+  forma_pagamento: STRING,
+  condicoes_pagamento: STRING,
+  clausula_rescisao: STRING,
+  multa_rescisao: DOUBLE,
+  garantias: STRING,
+  confidencialidade: STRING,
+  foro: STRING,
+  observacoes: STRING
+>
+RETURN FROM_JSON(
+  AI_QUERY(
+    'databricks-gpt-5',
+    CONCAT(
+          'Você é um assistente de IA especialista em extrair informações estruturadas de contratos.
+
+          Nunca trazer os caracteres ``` no resultado final.
+
+          Extraia as seguintes informações do contrato:
+            - tipo_contrato: tipo do contrato (ex: Prestação de Serviços, Compra e Venda, Locação, etc.) (string)
+            - nome_contrato: nome ou identificação do contrato (string)
+            - contratante: nome completo da parte contratante (string)
+            - contratado: nome completo da parte contratada (string)
+            - valor_total: valor total do contrato em formato numérico (float)
+            - moeda: moeda do contrato (ex: BRL, USD, EUR) (string)
+            - data_assinatura: data de assinatura no formato YYYY-MM-DD (string)
+            - data_inicio_vigencia: data de início da vigência no formato YYYY-MM-DD (string)
+            - data_fim_vigencia: data de fim da vigência no formato YYYY-MM-DD (string)
+            - prazo_vigencia: prazo de vigência descrito (ex: 12 meses, 2 anos) (string)
+            - objeto_contrato: descrição resumida do objeto do contrato (string, máximo 500 caracteres)
+            - forma_pagamento: forma de pagamento (ex: Boleto, Transferência, Cartão) (string)
+            - condicoes_pagamento: condições de pagamento (ex: 30/60/90 dias, À vista) (string)
+            - clausula_rescisao: resumo da cláusula de rescisão (string)
+            - multa_rescisao: valor ou percentual da multa de rescisão (float)
+            - garantias: descrição das garantias contratuais, se houver (string)
+            - confidencialidade: informações sobre cláusula de confidencialidade (string)
+            - foro: foro ou jurisdição competente (string)
+            - observacoes: outras informações relevantes (string)
+
+          IMPORTANTE:
+          - Para valores monetários, extraia apenas o número (ex: 500000.00)
+          - Para datas, use o formato YYYY-MM-DD (ex: 2024-01-15)
+          - Se alguma informação não estiver disponível, use null
+          - Para strings vazias, use null ao invés de ""
+          
+          Retorne SOMENTE um JSON válido. Nenhum outro texto fora o JSON. 
+          
+          Formato do JSON:
+          {
+            "tipo_contrato": <tipo do contrato>,
+            "nome_contrato": <nome do contrato>,
+            "contratante": <nome do contratante>,
+            "contratado": <nome do contratado>,
+            "valor_total": <valor numérico>,
+            "moeda": <moeda>,
+            "data_assinatura": <data YYYY-MM-DD>,
+            "data_inicio_vigencia": <data YYYY-MM-DD>,
+            "data_fim_vigencia": <data YYYY-MM-DD>,
+            "prazo_vigencia": <prazo>,
+            "objeto_contrato": <descrição do objeto>,
+            "forma_pagamento": <forma de pagamento>,
+            "condicoes_pagamento": <condições>,
+            "clausula_rescisao": <resumo da cláusula>,
+            "multa_rescisao": <valor da multa>,
+            "garantias": <descrição das garantias>,
+            "confidencialidade": <informações de confidencialidade>,
+            "foro": <foro competente>,
+            "observacoes": <observações relevantes>
+          }
+
+          extract_from: ', text
+        )
+  ),
+  "STRUCT<tipo_contrato: STRING, nome_contrato: STRING, contratante: STRING, contratado: STRING, valor_total: DOUBLE, moeda: STRING, data_assinatura: STRING, data_inicio_vigencia: STRING, data_fim_vigencia: STRING, prazo_vigencia: STRING, objeto_contrato: STRING, forma_pagamento: STRING, condicoes_pagamento: STRING, clausula_rescisao: STRING, multa_rescisao: DOUBLE, garantias: STRING, confidencialidade: STRING, foro: STRING, observacoes: STRING>"
+)
+
+-- COMMAND ----------
+
+-- DBTITLE 1,Funcao para renderizar o contexto compacto do contrato usado pelo chat do app
+CREATE OR REPLACE FUNCTION RENDER_CONTRACT_CONTEXT(
+  path STRING,
+  summarize STRING,
+  tipo_contrato STRING,
+  nome_contrato STRING,
+  contratante STRING,
+  contratado STRING,
+  valor_total DOUBLE,
+  moeda STRING,
+  data_assinatura DATE,
+  data_inicio_vigencia DATE,
+  data_fim_vigencia DATE,
+  prazo_vigencia STRING,
+  objeto_contrato STRING,
+  forma_pagamento STRING,
+  condicoes_pagamento STRING,
+  clausula_rescisao STRING,
+  multa_rescisao DOUBLE,
+  garantias STRING,
+  confidencialidade STRING,
+  foro STRING,
+  observacoes STRING,
+  max_chars INT
+)
+RETURNS STRING
+-- CONCAT com NULL retorna NULL e CONCAT_WS ignora NULLs: campos vazios nao geram linhas
+RETURN LEFT(
+  CONCAT_WS('\n',
+    CONCAT('### Documento: ', SUBSTRING_INDEX(path, '/', -1)),
+    CONCAT('Tipo: ', tipo_contrato),
+    CONCAT('Contrato: ', nome_contrato),
+    CONCAT('Contratante: ', contratante),
+    CONCAT('Contratado: ', contratado),
+    CONCAT('Valor total: ', FORMAT_NUMBER(valor_total, 2)),
+    CONCAT('Moeda: ', moeda),
+    CONCAT('Assinatura: ', DATE_FORMAT(data_assinatura, 'dd/MM/yyyy')),
+    CONCAT('Início da vigência: ', DATE_FORMAT(data_inicio_vigencia, 'dd/MM/yyyy')),
+    CONCAT('Fim da vigência: ', DATE_FORMAT(data_fim_vigencia, 'dd/MM/yyyy')),
+    CONCAT('Prazo: ', prazo_vigencia),
+    CONCAT('Objeto: ', objeto_contrato),
+    CONCAT('Forma de pagamento: ', forma_pagamento),
+    CONCAT('Condições de pagamento: ', condicoes_pagamento),
+    CONCAT('Rescisão: ', clausula_rescisao),
+    CONCAT('Multa rescisória: ', FORMAT_NUMBER(multa_rescisao, 2)),
+    CONCAT('Garantias: ', garantias),
+    CONCAT('Confidencialidade: ', confidencialidade),
+    CONCAT('Foro: ', foro),
+    CONCAT('Observações: ', observacoes),
+    summarize
+  ),
+  max_chars
+)
+
+-- COMMAND ----------
+
+-- DBTITLE 1,Gerar o contexto dos contratos extraidos antes da criacao de contract_context
+MERGE INTO IDENTIFIER(:contextTableName) c
+USING (
+  -- Apenas contratos ainda sem contexto: o anti-join vem antes de renderizar (este setup roda a cada upload)
+  SELECT x.path,
+         RENDER_CONTRACT_CONTEXT(x.path, summarize, tipo_contrato, nome_contrato, contratante, contratado,
+                                 valor_total, moeda, data_assinatura, data_inicio_vigencia, data_fim_vigencia,
+                                 prazo_vigencia, objeto_contrato, forma_pagamento, condicoes_pagamento,
+                                 clausula_rescisao, multa_rescisao, garantias, confidencialidade, foro,
+                                 observacoes, INT(:maxContextChars)) AS context
+    FROM IDENTIFIER(:extractTableName) x
+    LEFT ANTI JOIN IDENTIFIER(:contextTableName) existing
+      ON existing.path = x.path
+  QUALIFY ROW_NUMBER() OVER (PARTITION BY x.path ORDER BY x.path) = 1
+) e
+ON c.path = e.path
+WHEN NOT MATCHED THEN INSERT (path, context, token_count, updated_at)
+  VALUES (e.path, e.context, CAST(CEIL(LENGTH(e.context) / 4) AS INT), current_timestamp())
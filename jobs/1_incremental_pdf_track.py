@@ -3,6 +3,7 @@
 dbutils.widgets.text("catalog", "", "")
 dbutils.widgets.text("database", "", "")
 dbutils.widgets.text("volume_path", "", "")
+dbutils.widgets.text("hash_workers", "8", "")
 
 # COMMAND ----------
 
@@ -16,30 +17,78 @@ spark.sql(f"USE {database}")
 
 # COMMAND ----------
 
-# DBTITLE 1,List pdf files in Volume
+# DBTITLE 1,Create table to track which contract pdf files we've already processed
+sql("""
+CREATE TABLE IF NOT EXISTS contract_track (
+  file_name STRING,
+  type STRING,
+  size BIGINT,
+  processed STRING,
+  file_path STRING,
+  upload_time TIMESTAMP,
+  processed_time TIMESTAMP,
+  file_hash STRING,
+  modification_time TIMESTAMP
+)
+CLUSTER BY (file_path)
+tblproperties (delta.enableChangeDataFeed = true)
+""")
+
+# Tabelas criadas antes do rastreamento incremental não têm modification_time
+if "modification_time" not in spark.table("contract_track").columns:
+    sql("ALTER TABLE contract_track ADD COLUMNS (modification_time TIMESTAMP)")
+
+# MERGE, UPDATE do notebook de extração e consultas do app filtram por file_path
+sql("ALTER TABLE contract_track CLUSTER BY (file_path)")
+
+# COMMAND ----------
+
+# DBTITLE 1,List pdf files in Volume (only new or changed files are hashed)
 import os
-from pyspark.sql.functions import substring_index
+from concurrent.futures import ThreadPoolExecutor
 from pyspark.sql.types import StructType, StructField, StringType, LongType, TimestampType
-import re
 from datetime import datetime
 import hashlib
 
 
 # Directory path
 directory_path = dbutils.widgets.get("volume_path")
-
-# List files in directory
-file_paths = [file.path for file in dbutils.fs.ls(directory_path)]
+hash_workers = int(dbutils.widgets.get("hash_workers") or "8")
+
+# List files in directory (single listing)
+files = [file for file in dbutils.fs.ls(directory_path) if not file.name.endswith("/")]
+
+# (size, modification_time) of every file already tracked
+known = {
+    row["file_path"]: (row["size"], row["modification_time"])
+    for row in spark.sql("SELECT file_path, size, modification_time FROM contract_track").collect()
+}
+high_water_mark = max((mtime for _, mtime in known.values() if mtime), default=None)
+
+def modification_time(file):
+    return datetime.fromtimestamp(file.modificationTime / 1000)
+
+# Only files newer than the high-water mark, untracked, or whose (size, mtime) changed need hashing
+candidates = [
+    file for file in files
+    if (high_water_mark is None or modification_time(file) > high_water_mark)
+    or known.get(file.path) != (file.size, modification_time(file))
+]
+print(f"{len(files)} arquivos no volume, {len(candidates)} novos ou alterados (high-water mark: {high_water_mark})")
 
 # Function to extract the file hash
-def get_file_hash(file_path, chunk_size=4096):
+def get_file_hash(file_path, chunk_size=8 * 1024 * 1024):
     path = file_path.replace("dbfs:", "")
     hash_md5 = hashlib.md5()
-    with open(path, "rb") as f:
+    with open(path, "rb", buffering=chunk_size) as f:
         for chunk in iter(lambda: f.read(chunk_size), b""):
             hash_md5.update(chunk)
     return hash_md5.hexdigest()
 
+# Hash candidates in parallel (I/O bound on the volume FUSE mount)
+with ThreadPoolExecutor(max_workers=hash_workers) as pool:
+    hashes = list(pool.map(get_file_hash, [file.path for file in candidates]))
+
 # Extract file names from paths
 file_info = [
     (
@@ -49,10 +98,10 @@ file_info = [
         file.path,
         datetime.now(),
         None,
-        get_file_hash(file.path)
-
+        file_hash,
+        modification_time(file)
     )
-    for file in dbutils.fs.ls(directory_path)
+    for file, file_hash in zip(candidates, hashes)
 ]
 
 schema = StructType([
@@ -62,7 +111,8 @@ schema = StructType([
     StructField("file_path", StringType(), True),
     StructField("upload_time", TimestampType(), True),
     StructField("processed_time", TimestampType(), True),
-    StructField("file_hash", StringType(), True)
+    StructField("file_hash", StringType(), True),
+    StructField("modification_time", TimestampType(), True)
 ])
 
 df = spark.createDataFrame(file_info, schema)
@@ -73,38 +123,36 @@ df.show()
 
 # COMMAND ----------
 
-# DBTITLE 1,Create table to track which contract pdf files we've already processed
-sql("""
-CREATE TABLE IF NOT EXISTS contract_track (
-  file_name STRING,
-  type STRING,
-  size BIGINT,
-  processed STRING,
-  file_path STRING,
-  upload_time TIMESTAMP,
-  processed_time TIMESTAMP,
-  file_hash STRING
-)
-tblproperties (delta.enableChangeDataFeed = true)
-""")
-
-# COMMAND ----------
-
 # DBTITLE 1,Update contract_track table so same files aren't processed again
 df.createOrReplaceTempView("temp_table")
 
-# Insert only the rows that do not exist in the target table
+# Keyed on file_path:
+# - new path -> insert (content already known under another name is not parsed/extracted
+#   again: the extraction notebook reuses the results by file_hash and only maps the path)
+# - known path with new content (overwrite) -> reset to be processed again
+# - known path with same content (only touched) -> refresh size/mtime
 spark.sql("""
-    INSERT INTO contract_track
-    SELECT file_name, type, size, 'N', file_path, upload_time, processed_time, file_hash
-      FROM temp_table
-     WHERE NOT EXISTS (
-         SELECT 1 FROM contract_track
-          WHERE temp_table.file_name = contract_track.file_name
-          OR temp_table.file_hash = contract_track.file_hash
-    )
+    MERGE INTO contract_track t
+    USING temp_table s
+    ON t.file_path = s.file_path
+    WHEN MATCHED AND t.file_hash IS DISTINCT FROM s.file_hash THEN UPDATE SET
+        size = s.size,
+        upload_time = s.upload_time,
+        processed = 'N',
+        processed_time = NULL,
+        file_hash = s.file_hash,
+        modification_time = s.modification_time
+    WHEN MATCHED THEN UPDATE SET
+        size = s.size,
+        modification_time = s.modification_time
+    WHEN NOT MATCHED THEN INSERT
+        (file_name, type, size, processed, file_path, upload_time, processed_time, file_hash, modification_time)
+        VALUES (s.file_name, s.type, s.size, 'N', s.file_path, s.upload_time, s.processed_time, s.file_hash, s.modification_time)
 """)
 
+# Clustering incremental (somente os arquivos gravados desde o último OPTIMIZE)
+sql("OPTIMIZE contract_track")
+
 # COMMAND ----------
 
-sql("SELECT * FROM contract_track").display()
\ No newline at end of file
+sql("SELECT * FROM contract_track").display()
@@ -2,12 +2,16 @@
 dbutils.widgets.text("catalog", "", "")
 dbutils.widgets.text("database", "", "")
 dbutils.widgets.text("table", "", "")
+dbutils.widgets.text("batch_bytes", "104857600", "")
+dbutils.widgets.text("batch_max_files", "25", "")
 
 # COMMAND ----------
 
 catalog = dbutils.widgets.get("catalog")
 database = dbutils.widgets.get("database")
 table = dbutils.widgets.get("table")
+batch_bytes = int(dbutils.widgets.get("batch_bytes") or "104857600")
+batch_max_files = int(dbutils.widgets.get("batch_max_files") or "25")
 
 # COMMAND ----------
 
@@ -18,21 +22,55 @@ spark.sql(f"USE {database}")
 
 # Consulta SQL para obter arquivos não processados
 df = spark.sql(f"""
-SELECT *
+SELECT file_path, size
 FROM {table}
 WHERE processed = 'N'
 """)
 
-# Crie uma lista com os caminhos dos arquivos
-files = [row['file_path'] for row in df.collect()]
+# Crie uma lista com os caminhos (e tamanhos) dos arquivos
+files = [(row['file_path'], row['size'] or 0) for row in df.collect()]
 
 # COMMAND ----------
 
-files
+# DBTITLE 1,Agrupar os arquivos em lotes balanceados por tamanho
+import math
+import os
+import re
+from collections import defaultdict
+
+def glob_escape(name):
+    # Caracteres especiais de glob no nome do arquivo precisam ser escapados
+    return re.sub(r'([\\{}\[\]*?,])', r'\\\1', name)
+
+def make_batches(files):
+    """
+    Distribui os arquivos (por diretório) em lotes de até batch_max_files arquivos e
+    aproximadamente batch_bytes bytes: maior arquivo primeiro, sempre no lote mais leve.
+    """
+    by_dir = defaultdict(list)
+    for path, size in files:
+        by_dir[os.path.dirname(path)].append((path, size))
+
+    globs = []
+    for directory, items in by_dir.items():
+        total = sum(size for _, size in items)
+        n_batches = max(math.ceil(total / batch_bytes), math.ceil(len(items) / batch_max_files), 1)
+        batches = [[0, []] for _ in range(n_batches)]
+        for path, size in sorted(items, key=lambda item: item[1], reverse=True):
+            target = min((b for b in batches if len(b[1]) < batch_max_files), key=lambda b: b[0])
+            target[0] += size
+            target[1].append(os.path.basename(path))
+        for _, names in batches:
+            if names:
+                globs.append(f"{directory}/{{{','.join(glob_escape(name) for name in names)}}}")
+    return globs
+
+batches = make_batches(files)
+batches
 
 # COMMAND ----------
 
 
-# Guarde a lista como Task Value para uso
-dbutils.jobs.taskValues.set(key="arrival_files", value=files)
-print(f"{len(files)} arquivos de chegada encontrados.")
\ No newline at end of file
+# Guarde a lista de lotes (um glob por lote) como Task Value para uso
+dbutils.jobs.taskValues.set(key="arrival_files", value=batches)
+print(f"{len(files)} arquivos de chegada encontrados em {len(batches)} lotes.")
@@ -6,9 +6,14 @@ CREATE WIDGET TEXT database DEFAULT 'default';
 CREATE WIDGET TEXT trackTableName DEFAULT 'contract_track';
 CREATE WIDGET TEXT parsedTableName DEFAULT 'contract_parsed';
 CREATE WIDGET TEXT extractTableName DEFAULT 'contract_extract';
+CREATE WIDGET TEXT contextTableName DEFAULT 'contract_context';
+CREATE WIDGET TEXT maxContextChars DEFAULT '8000';
 CREATE WIDGET TEXT sourcePDFPath DEFAULT '';
 CREATE WIDGET TEXT limit DEFAULT '100';
 CREATE WIDGET TEXT partitionCount DEFAULT '10';
+-- Tamanho maximo (aprox.) de cada trecho enviado ao resumo; documentos maiores sao resumidos por partes
+CREATE WIDGET TEXT summaryChunkChars DEFAULT '40000';
+-- Caminho de um arquivo ou glob com um lote de arquivos (ex.: /Volumes/c/s/v/{a.pdf,b.pdf}) gerado por 2_list_files
 CREATE WIDGET TEXT file_path DEFAULT '';
 
 -- COMMAND ----------
@@ -19,196 +24,26 @@ USE database IDENTIFIER(:database);
 
 -- COMMAND ----------
 
--- DBTITLE 1,Criar tabela delta para armazenar o conteudo do contrato
--- Create parsed table 
-CREATE TABLE IF NOT EXISTS IDENTIFIER(:parsedTableName) (
-  path STRING,
-  raw_parsed VARIANT,
-  text STRING,
-  summarize STRING,
-  error_status STRING
-);
+-- DBTITLE 1,Arquivos do lote (somente o caminho, o conteudo nao e lido aqui)
+-- Tabelas e funcoes sao criadas uma unica vez por execucao em 0_extract_setup.sql
+DECLARE OR REPLACE VARIABLE batch_paths ARRAY<STRING>;
+SET VAR batch_paths = (SELECT collect_list(path) FROM READ_FILES(:file_path, format => 'binaryFile'));
 
 -- COMMAND ----------
 
--- Create contract extraction table 
-CREATE TABLE IF NOT EXISTS IDENTIFIER(:extractTableName) (
-  path STRING,
-  summarize STRING,
-  tipo_contrato STRING,
-  nome_contrato STRING,
-  contratante STRING,
-  contratado STRING,
-  valor_total DOUBLE,
-  moeda STRING,
-  data_assinatura DATE,
-  data_inicio_vigencia DATE,
-  data_fim_vigencia DATE,
-  prazo_vigencia STRING,
-  objeto_contrato STRING,
-  forma_pagamento STRING,
-  condicoes_pagamento STRING,
-  clausula_rescisao STRING,
-  multa_rescisao DOUBLE,
-  garantias STRING,
-  confidencialidade STRING,
-  foro STRING,
-  observacoes STRING
+-- DBTITLE 1,Hash do conteudo de cada arquivo do lote (calculado em contract_track)
+-- Conteudos ja parseados/extraidos nao passam de novo por ai_parse_document nem AI_QUERY
+DECLARE OR REPLACE VARIABLE batch_hashes MAP<STRING, STRING>;
+SET VAR batch_hashes = (
+  SELECT COALESCE(map_from_entries(collect_list(struct(file_path, file_hash))), map())
+    FROM IDENTIFIER(:trackTableName) t
+    JOIN (SELECT explode(batch_paths) AS path) b
+      ON t.file_path = b.path
+   WHERE t.file_hash IS NOT NULL
 );
 
 -- COMMAND ----------
 
-ALTER TABLE IDENTIFIER(:extractTableName) SET TBLPROPERTIES (delta.enableChangeDataFeed = true)
-
--- COMMAND ----------
-
--- DBTITLE 1,Funcao para realizar o resumo do contrato
-CREATE OR REPLACE FUNCTION SUMMARIZE_CONTRACT_DATA(text STRING)
-RETURNS STRING  
-RETURN AI_QUERY(
-            'databricks-gpt-5',
-            CONCAT(
-            'Você é um assistente de IA especialista em resumir informações de contratos. 
-            Analise o documento e extraia as informações mais relevantes do contrato.
-            
-            Use esse template para dar a resposta ao usuário:
-            
-            **Tipo de Contrato:**
-            **Nome/Identificação do Contrato:**
-            **Partes Envolvidas:**
-            - Contratante:
-            - Contratado:
-            
-            **Valores e Condições Financeiras:**
-            - Valor Total:
-            - Moeda:
-            - Forma de Pagamento:
-            - Condições de Pagamento:
-            
-            **Datas e Prazos:**
-            - Data de Assinatura:
-            - Início da Vigência:
-            - Fim da Vigência:
-            - Prazo de Vigência:
-            
-            **Objeto do Contrato:**
-            - Descrição detalhada do objeto/serviço contratado
-            
-            **Cláusulas Importantes:**
-            - Rescisão: (condições e prazos)
-            - Multas: (valores e condições)
-            - Garantias: (se houver)
-            - Confidencialidade: (se houver)
-            
-            **Aspectos Legais:**
-            - Foro:
-            
-            **Observações Relevantes:**
-            - Outras cláusulas ou informações importantes
-            
-            INSTRUÇÕES PARA INCLUIR PÁGINAS:
-            Sempre inclua [página X] após cada informação importante.
-            Exemplo: "Valor Total: R$ 500.000,00 [página 3]"
-            
-            Retorne em formato organizado e legível.
-
-            TEXT: ', text
-            )
-        )
-
--- COMMAND ----------
-
--- DBTITLE 1,Funcao para realizar a extracao de dados estruturados do contrato
-CREATE OR REPLACE FUNCTION EXTRACT_CONTRACT_DATA(text STRING)
-RETURNS STRUCT<
-  tipo_contrato: STRING,
-  nome_contrato: STRING,
-  contratante: STRING,
-  contratado: STRING,
-  valor_total: DOUBLE,
-  moeda: STRING,
-  data_assinatura: STRING,
-  data_inicio_vigencia: STRING,
-  data_fim_vigencia: STRING,
-  prazo_vigencia: STRING,
-  objeto_contrato: STRING,
-  forma_pagamento: STRING,
-  condicoes_pagamento: STRING,
-  clausula_rescisao: STRING,
-  multa_rescisao: DOUBLE,
-  garantias: STRING,
-  confidencialidade: STRING,
-  foro: STRING,
-  observacoes: STRING
->
-RETURN FROM_JSON(
-  AI_QUERY(
-    'databricks-gpt-5',
-    CONCAT(
-          'Você é um assistente de IA especialista em extrair informações estruturadas de contratos.
-
-          Nunca trazer os caracteres ``` no resultado final.
-
-          Extraia as seguintes informações do contrato:
-            - tipo_contrato: tipo do contrato (ex: Prestação de Serviços, Compra e Venda, Locação, etc.) (string)
-            - nome_contrato: nome ou identificação do contrato (string)
-            - contratante: nome completo da parte contratante (string)
-            - contratado: nome completo da parte contratada (string)
-            - valor_total: valor total do contrato em formato numérico (float)
-            - moeda: moeda do contrato (ex: BRL, USD, EUR) (string)
-            - data_assinatura: data de assinatura no formato YYYY-MM-DD (string)
-            - data_inicio_vigencia: data de início da vigência no formato YYYY-MM-DD (string)
-            - data_fim_vigencia: data de fim da vigência no formato YYYY-MM-DD (string)
-            - prazo_vigencia: prazo de vigência descrito (ex: 12 meses, 2 anos) (string)
-            - objeto_contrato: descrição resumida do objeto do contrato (string, máximo 500 caracteres)
-            - forma_pagamento: forma de pagamento (ex: Boleto, Transferência, Cartão) (string)
-            - condicoes_pagamento: condições de pagamento (ex: 30/60/90 dias, À vista) (string)
-            - clausula_rescisao: resumo da cláusula de rescisão (string)
-            - multa_rescisao: valor ou percentual da multa de rescisão (float)
-            - garantias: descrição das garantias contratuais, se houver (string)
-            - confidencialidade: informações sobre cláusula de confidencialidade (string)
-            - foro: foro ou jurisdição competente (string)
-            - observacoes: outras informações relevantes (string)
-
-          IMPORTANTE:
-          - Para valores monetários, extraia apenas o número (ex: 500000.00)
-          - Para datas, use o formato YYYY-MM-DD (ex: 2024-01-15)
-          - Se alguma informação não estiver disponível, use null
-          - Para strings vazias, use null ao invés de ""
-          
-          Retorne SOMENTE um JSON válido. Nenhum outro texto fora o JSON. 
-          
-          Formato do JSON:
-          {
-            "tipo_contrato": <tipo do contrato>,
-            "nome_contrato": <nome do contrato>,
-            "contratante": <nome do contratante>,
-            "contratado": <nome do contratado>,
-            "valor_total": <valor numérico>,
-            "moeda": <moeda>,
-            "data_assinatura": <data YYYY-MM-DD>,
-            "data_inicio_vigencia": <data YYYY-MM-DD>,
-            "data_fim_vigencia": <data YYYY-MM-DD>,
-            "prazo_vigencia": <prazo>,
-            "objeto_contrato": <descrição do objeto>,
-            "forma_pagamento": <forma de pagamento>,
-            "condicoes_pagamento": <condições>,
-            "clausula_rescisao": <resumo da cláusula>,
-            "multa_rescisao": <valor da multa>,
-            "garantias": <descrição das garantias>,
-            "confidencialidade": <informações de confidencialidade>,
-            "foro": <foro competente>,
-            "observacoes": <observações relevantes>
-          }
-
-          extract_from: ', text
-        )
-  ),
-  "STRUCT<tipo_contrato: STRING, nome_contrato: STRING, contratante: STRING, contratado: STRING, valor_total: DOUBLE, moeda: STRING, data_assinatura: STRING, data_inicio_vigencia: STRING, data_fim_vigencia: STRING, prazo_vigencia: STRING, objeto_contrato: STRING, forma_pagamento: STRING, condicoes_pagamento: STRING, clausula_rescisao: STRING, multa_rescisao: DOUBLE, garantias: STRING, confidencialidade: STRING, foro: STRING, observacoes: STRING>"
-)
-
--- COMMAND ----------
-
 -- DBTITLE 1,Remover a variavel temporaria
 DROP TEMPORARY VARIABLE IF EXISTS parse_extensions;
 
@@ -220,15 +55,26 @@ DECLARE parse_extensions ARRAY<STRING> DEFAULT array('.pdf');
 -- COMMAND ----------
 
 -- DBTITLE 1,Rotina para o parse e resumo do pdf
-INSERT INTO IDENTIFIER(:parsedTableName)
+-- Upsert por path: reexecucoes (retry da task, arquivo sobrescrito ou com erro de parse) nao duplicam linhas
+MERGE INTO IDENTIFIER(:parsedTableName) t
+USING (
 
 -- Parse documents with ai_parse
 WITH all_files AS (
   SELECT
     path,
-    content
+    content,
+    batch_hashes[path] AS file_hash
   FROM
     READ_FILES(:file_path, format => 'binaryFile')
+  -- Conteudo ja parseado com sucesso (mesmo arquivo com outro nome, sobrescrito ou reprocessado)
+  WHERE NOT EXISTS (
+    SELECT 1 FROM IDENTIFIER(:parsedTableName) p
+     WHERE p.file_hash = batch_hashes[path]
+       AND p.error_status IS NULL
+  )
+  -- Um unico parse por conteudo dentro do lote
+  QUALIFY ROW_NUMBER() OVER (PARTITION BY COALESCE(batch_hashes[path], path) ORDER BY path) = 1
   ORDER BY
     path ASC
   LIMIT INT(:limit)
@@ -243,6 +89,7 @@ repartitioned_files AS (
 parsed_documents AS (
   SELECT
     path,
+    file_hash,
     ai_parse_document(content) as parsed
   FROM
     repartitioned_files
@@ -254,7 +101,8 @@ raw_documents AS (
     null as raw_parsed,
     decode(content, 'utf-8') as text,
     null as summarize,
-    null as error_status
+    null as error_status,
+    file_hash
   FROM 
     repartitioned_files
   WHERE NOT array_contains(parse_extensions, lower(regexp_extract(path, r'(\.[^.]+)$', 1)))
@@ -266,20 +114,28 @@ error_documents AS (
     parsed as raw_parsed,
     null as text,
     null as summarize,
-    try_cast(parsed:error_status AS STRING) AS error_status
+    try_cast(parsed:error_status AS STRING) AS error_status,
+    file_hash
   FROM
     parsed_documents
   WHERE try_cast(parsed:error_status AS STRING) IS NOT NULL
 ),
 -- Extract content from ai_parse_document output for all successful parses
+-- (v1.0: um elemento por pagina; v2.0: elementos com a pagina em bbox[0].page_id)
 sorted_contents AS (
   SELECT
     path,
-    element:content AS content
+    idx,
+    CASE
+      WHEN version = '1.0' THEN idx + 1
+      ELSE COALESCE(try_cast(element:bbox[0]:page_id AS INT), 0) + 1
+    END AS page,
+    try_cast(element:content AS STRING) AS content
   FROM
     (
       SELECT
         path,
+        try_cast(parsed:metadata:version AS STRING) AS version,
           posexplode(
             CASE
               WHEN try_cast(parsed:metadata:version AS STRING) = '1.0' 
@@ -291,8 +147,53 @@ sorted_contents AS (
         parsed_documents
       WHERE try_cast(parsed:error_status AS STRING) IS NULL
     )
-  ORDER BY
-    idx
+),
+-- Texto limpo de cada pagina (somente o conteudo, sem bounding boxes nem metadados do parser)
+pages AS (
+  SELECT
+    path,
+    page,
+    concat_ws('
+
+', transform(array_sort(collect_list(struct(idx, content))), e -> e.content)) AS content
+  FROM
+    sorted_contents
+  WHERE content IS NOT NULL
+  GROUP BY
+    path, page
+),
+-- Paginas agrupadas em trechos de ~:summaryChunkChars caracteres; o corte e sempre entre paginas
+chunked_pages AS (
+  SELECT
+    path,
+    page,
+    content,
+    INT(floor(
+      (SUM(length(content)) OVER (PARTITION BY path ORDER BY page ROWS BETWEEN UNBOUNDED PRECEDING AND CURRENT ROW)
+        - length(content)) / INT(:summaryChunkChars)
+    )) AS chunk_id
+  FROM
+    pages
+),
+chunks AS (
+  SELECT
+    path,
+    chunk_id,
+    COUNT(*) OVER (PARTITION BY path) AS chunk_count,
+    content
+  FROM (
+    SELECT
+      path,
+      chunk_id,
+      concat_ws('
+
+', transform(array_sort(collect_list(struct(page, content))), p -> concat('[página ', p.page, ']
+', p.content))) AS content
+    FROM
+      chunked_pages
+    GROUP BY
+      path, chunk_id
+  )
 ),
 -- Concatenate so we have 1 row per document
 concatenated AS (
@@ -300,23 +201,59 @@ concatenated AS (
         path,
         concat_ws('
 
-', collect_list(content)) AS full_content
+', transform(array_sort(collect_list(struct(page, content))), p -> p.content)) AS full_content
     FROM
-        sorted_contents
-    WHERE content IS NOT NULL
+        pages
     GROUP BY
         path
 ),
+-- Contratos longos: cada trecho e resumido em paralelo (linhas distribuidas entre as particoes)
+chunk_summaries AS (
+  SELECT
+    path,
+    chunk_id,
+    SUMMARIZE_CONTRACT_CHUNK(content) AS summary
+  FROM
+    chunks
+  WHERE chunk_count > 1
+  DISTRIBUTE BY crc32(concat(path, chunk_id)) % INT(:partitionCount)
+),
+summaries AS (
+  -- Documento com um unico trecho: resumo direto do texto
+  SELECT
+    path,
+    SUMMARIZE_CONTRACT_DATA(content) AS summarize
+  FROM
+    chunks
+  WHERE chunk_count = 1
+  UNION ALL
+  -- Varios trechos: os resumos parciais sao consolidados no template final
+  SELECT
+    path,
+    SUMMARIZE_CONTRACT_DATA(
+      concat_ws('
+
+', transform(array_sort(collect_list(struct(chunk_id, summary))),
+                       c -> concat('Trecho ', c.chunk_id + 1, ':
+', c.summary)))
+    ) AS summarize
+  FROM
+    chunk_summaries
+  GROUP BY
+    path
+),
 -- Bring back the raw parsing since it could be useful for other downstream uses
 with_raw AS (
     SELECT
         a.path,
         b.parsed as raw_parsed,
         a.full_content as text,
-        SUMMARIZE_CONTRACT_DATA(b.parsed) as summarize,
-        null as error_status
+        s.summarize,
+        null as error_status,
+        b.file_hash
     FROM concatenated a
     JOIN parsed_documents b ON a.path = b.path
+    JOIN summaries s ON a.path = s.path
 )
 -- Recombine raw text documents with parsed documents
 SELECT *  FROM with_raw
@@ -325,28 +262,132 @@ SELECT * FROM raw_documents
 UNION ALL
 SELECT * FROM error_documents
 
+) s
+ON t.path = s.path
+WHEN MATCHED THEN UPDATE SET *
+WHEN NOT MATCHED THEN INSERT *
+
 -- COMMAND ----------
 
--- DBTITLE 1,Extrair todas as informacoes necessarias do contrato
-INSERT INTO IDENTIFIER(:extractTableName)
-SELECT path, summarize, extract_info.* 
-  FROM (SELECT path, summarize, EXTRACT_CONTRACT_DATA(summarize) as extract_info
-          FROM IDENTIFIER(:parsedTableName)
-         WHERE path LIKE CONCAT('%', :file_path, '%')
+-- DBTITLE 1,Remover extracoes de arquivos cujo conteudo mudou (sobrescritos)
+-- Filtros do lote por join com os caminhos (e nao array_contains) para a clusterizacao por path podar arquivos
+MERGE INTO IDENTIFIER(:extractTableName) t
+USING (SELECT explode(array_distinct(batch_paths)) AS path) b
+ON t.path = b.path
+WHEN MATCHED AND t.file_hash IS DISTINCT FROM batch_hashes[b.path] THEN DELETE
+
+-- COMMAND ----------
+
+-- DBTITLE 1,Extrair todas as informacoes necessarias do contrato (uma chamada por conteudo novo)
+-- Upsert por path: um retry da task nao duplica linhas em contract_extract
+MERGE INTO IDENTIFIER(:extractTableName) t
+USING (
+WITH batch AS (
+  SELECT path, batch_hashes[path] AS file_hash
+    FROM (SELECT explode(array_distinct(batch_paths)) AS path)
+),
+-- Joins por igualdade separados (hash ou, sem hash, path): um OR no ON vira nested loop sobre a tabela inteira
+batch_parsed AS (
+  SELECT b.path, p.summarize, b.file_hash
+    FROM batch b
+    JOIN IDENTIFIER(:parsedTableName) p
+      ON p.file_hash = b.file_hash
+  UNION ALL
+  SELECT b.path, p.summarize, b.file_hash
+    FROM batch b
+    JOIN IDENTIFIER(:parsedTableName) p
+      ON p.path = b.path
+   WHERE b.file_hash IS NULL
+),
+pending AS (
+  -- Caminhos do lote sem extracao cujo conteudo ainda nao foi extraido (um por hash)
+  SELECT bp.path, bp.summarize, bp.file_hash
+    FROM batch_parsed bp
+    LEFT ANTI JOIN IDENTIFIER(:extractTableName) by_hash
+      ON by_hash.file_hash = bp.file_hash
+    LEFT ANTI JOIN IDENTIFIER(:extractTableName) by_path
+      ON by_path.path = bp.path
+  QUALIFY ROW_NUMBER() OVER (PARTITION BY COALESCE(bp.file_hash, bp.path) ORDER BY bp.path) = 1
+)
+SELECT path, summarize, extract_info.tipo_contrato, extract_info.nome_contrato, extract_info.contratante,
+       extract_info.contratado, extract_info.valor_total, extract_info.moeda,
+       try_cast(extract_info.data_assinatura AS DATE) AS data_assinatura,
+       try_cast(extract_info.data_inicio_vigencia AS DATE) AS data_inicio_vigencia,
+       try_cast(extract_info.data_fim_vigencia AS DATE) AS data_fim_vigencia,
+       extract_info.prazo_vigencia, extract_info.objeto_contrato, extract_info.forma_pagamento,
+       extract_info.condicoes_pagamento, extract_info.clausula_rescisao, extract_info.multa_rescisao,
+       extract_info.garantias, extract_info.confidencialidade, extract_info.foro, extract_info.observacoes,
+       file_hash
+  FROM (SELECT path, summarize, EXTRACT_CONTRACT_DATA(summarize) as extract_info, file_hash
+          FROM pending
   )
+) s
+ON t.path = s.path
+WHEN MATCHED THEN UPDATE SET *
+WHEN NOT MATCHED THEN INSERT *
+
+-- COMMAND ----------
+
+-- DBTITLE 1,Conteudo ja extraido: grava apenas o mapeamento do novo caminho
+MERGE INTO IDENTIFIER(:extractTableName) t
+USING (
+SELECT b.path, e.summarize, e.tipo_contrato, e.nome_contrato, e.contratante, e.contratado, e.valor_total, e.moeda,
+       e.data_assinatura, e.data_inicio_vigencia, e.data_fim_vigencia, e.prazo_vigencia, e.objeto_contrato,
+       e.forma_pagamento, e.condicoes_pagamento, e.clausula_rescisao, e.multa_rescisao, e.garantias,
+       e.confidencialidade, e.foro, e.observacoes, e.file_hash
+  FROM (SELECT explode(array_distinct(batch_paths)) AS path) b
+  -- Apenas as extracoes com hashes do lote entram na janela (semi-join antes do ROW_NUMBER)
+  JOIN (SELECT x.*
+          FROM IDENTIFIER(:extractTableName) x
+          LEFT SEMI JOIN (SELECT explode(map_values(batch_hashes)) AS file_hash) h
+            ON x.file_hash = h.file_hash
+        QUALIFY ROW_NUMBER() OVER (PARTITION BY x.file_hash ORDER BY x.path) = 1) e
+    ON e.file_hash = batch_hashes[b.path]
+) s
+ON t.path = s.path
+WHEN NOT MATCHED THEN INSERT *
 
 -- COMMAND ----------
 
 -- DBTITLE 1,Seleciona os dados extraidos
-SELECT * FROM IDENTIFIER(:extractTableName) WHERE path LIKE CONCAT('%', :file_path, '%')
+SELECT e.*
+  FROM IDENTIFIER(:extractTableName) e
+  JOIN (SELECT explode(array_distinct(batch_paths)) AS path) b
+    ON e.path = b.path
+
+-- COMMAND ----------
+
+-- DBTITLE 1,Atualiza o contexto pre-renderizado (antes do tracking, que sinaliza o app)
+MERGE INTO IDENTIFIER(:contextTableName) c
+USING (
+  SELECT x.path,
+         RENDER_CONTRACT_CONTEXT(x.path, summarize, tipo_contrato, nome_contrato, contratante, contratado,
+                                 valor_total, moeda, data_assinatura, data_inicio_vigencia, data_fim_vigencia,
+                                 prazo_vigencia, objeto_contrato, forma_pagamento, condicoes_pagamento,
+                                 clausula_rescisao, multa_rescisao, garantias, confidencialidade, foro,
+                                 observacoes, INT(:maxContextChars)) AS context
+    FROM IDENTIFIER(:extractTableName) x
+    JOIN (SELECT explode(array_distinct(batch_paths)) AS path) b
+      ON x.path = b.path
+  QUALIFY ROW_NUMBER() OVER (PARTITION BY x.path ORDER BY x.path) = 1
+) e
+ON c.path = e.path
+WHEN MATCHED THEN UPDATE SET
+  context = e.context,
+  token_count = CAST(CEIL(LENGTH(e.context) / 4) AS INT),
+  updated_at = current_timestamp()
+WHEN NOT MATCHED THEN INSERT (path, context, token_count, updated_at)
+  VALUES (e.path, e.context, CAST(CEIL(LENGTH(e.context) / 4) AS INT), current_timestamp())
 
 -- COMMAND ----------
 
 -- DBTITLE 1,Atualiza a tabela de tracking de documentos
-UPDATE IDENTIFIER(:trackTableName)
-SET processed = 'S',
-    processed_time = current_timestamp()
-WHERE file_path LIKE CONCAT('%', :file_path, '%')
+MERGE INTO IDENTIFIER(:trackTableName) t
+USING (SELECT explode(array_distinct(batch_paths)) AS path) b
+ON t.file_path = b.path
+WHEN MATCHED THEN UPDATE SET
+  processed = 'S',
+  processed_time = current_timestamp()
 
 -- COMMAND ----------
 